@@ -0,0 +1,223 @@
+"""
+Analysis job runner with graceful drain and hand-off on shutdown.
+
+POST /analysis commits a pending row and submits its id here; a pool of
+daemon worker threads (analysis_workers) runs the LLM generation. The
+request's background task only awaits the job, so under uvicorn a redeploy
+no longer waits on (or loses track of) generations that are mid-flight:
+
+1. ``stop_accepting``: new analyses are refused with 503 and /readyz
+   reports draining;
+2. ``drain``: wait up to shutdown_drain_seconds for queued and running jobs;
+3. ``hand_off``: analyses still unfinished get ``requeued_at`` set and stay
+   pending. The LLM call is not streamed, so there is no partial output to
+   checkpoint; the generation restarts from the stored input.
+
+``claim_requeued`` is how a live worker (the jobs leader, every
+analysis_resume_interval_seconds) takes handed-off analyses back; the
+conditional UPDATE makes sure only one worker claims each row.
+
+A worker that is killed (SIGKILL, OOM, crash) never gets to hand off. Every
+worker therefore refreshes ``heartbeat_at`` on the analyses it has queued or
+running (``heartbeat``, every analysis_heartbeat_seconds), and
+``claim_stale`` lets the jobs leader take over pending analyses that are not
+handed off and whose heartbeat is older than analysis_stale_seconds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from .models import Analysis
+
+
+class RunnerClosed(RuntimeError):
+  """
+  Raised by AnalysisRunner.submit once shutdown has begun.
+  """
+
+
+class AnalysisRunner:
+  def __init__(self, run: Callable[[int], None], workers: int) -> None:
+    self.run = run
+    self.workers = workers
+    self._queue: "queue.Queue[Tuple[int, Future]]" = queue.Queue()
+    self._threads: List[threading.Thread] = []
+    self._lock = threading.Lock()
+    self._idle = threading.Condition(self._lock)
+    # analysis id -> monotonic time it was submitted (queued or running).
+    self._in_flight: Dict[int, float] = {}
+    self.accepting = True
+
+  def submit(self, analysis_id: int) -> Future:
+    """
+    Queue ``analysis_id``; raises RunnerClosed once shutdown has begun.
+    """
+    future: Future = Future()
+    with self._lock:
+      if not self.accepting:
+        raise RunnerClosed("analysis runner is shutting down")
+      self._ensure_workers()
+      self._in_flight[analysis_id] = time.monotonic()
+    self._queue.put((analysis_id, future))
+    return future
+
+  async def run_async(self, analysis_id: int) -> None:
+    """
+    Submit and wait for the job (used as the request's background task).
+
+    Cancelling the wait, e.g. when uvicorn's graceful-shutdown timeout
+    expires, leaves the job running and tracked for ``drain``.
+    """
+    await asyncio.shield(asyncio.wrap_future(self.submit(analysis_id)))
+
+  def in_flight(self) -> List[int]:
+    with self._lock:
+      return sorted(self._in_flight)
+
+  def start(self) -> None:
+    with self._lock:
+      self.accepting = True
+
+  def stop_accepting(self) -> None:
+    with self._lock:
+      self.accepting = False
+
+  def drain(self, timeout: float) -> List[int]:
+    """
+    Wait up to ``timeout`` seconds for submitted jobs; returns the unfinished ids.
+    """
+    deadline = time.monotonic() + timeout
+    with self._idle:
+      while self._in_flight:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+          break
+        self._idle.wait(remaining)
+      return sorted(self._in_flight)
+
+  def _ensure_workers(self) -> None:
+    # Called with self._lock held.
+    if self._threads:
+      return
+    for i in range(self.workers):
+      # Daemon threads: a generation still running after hand-off must not
+      # keep the process alive past the drain deadline.
+      thread = threading.Thread(target=self._work, name=f"analysis-{i}", daemon=True)
+      thread.start()
+      self._threads.append(thread)
+
+  def _work(self) -> None:
+    while True:
+      analysis_id, future = self._queue.get()
+      if not future.set_running_or_notify_cancel():
+        self._finish(analysis_id)
+        continue
+      try:
+        self.run(analysis_id)
+        future.set_result(None)
+      except Exception as exc:  # noqa: BLE001
+        print(f"[ANALYSIS] Job {analysis_id} crashed: {exc}")
+        future.set_exception(exc)
+      finally:
+        self._finish(analysis_id)
+
+  def _finish(self, analysis_id: int) -> None:
+    with self._idle:
+      self._in_flight.pop(analysis_id, None)
+      if not self._in_flight:
+        self._idle.notify_all()
+
+
+def hand_off(db: Session, analysis_ids: List[int]) -> int:
+  """
+  Return unfinished analyses to the queue; returns how many were still pending.
+  """
+  if not analysis_ids:
+    return 0
+  result = db.execute(
+    update(Analysis)
+    .where(Analysis.id.in_(analysis_ids), Analysis.status == "pending")
+    .values(requeued_at=datetime.utcnow())
+  )
+  db.commit()
+  return result.rowcount
+
+
+def claim_requeued(db: Session, limit: int = 100) -> List[int]:
+  """
+  Claim up to ``limit`` handed-off analyses for this worker, oldest first.
+  """
+  candidates = db.scalars(
+    select(Analysis.id)
+    .where(Analysis.requeued_at.is_not(None), Analysis.status == "pending")
+    .order_by(Analysis.requeued_at, Analysis.id)
+    .limit(limit)
+  ).all()
+  claimed = []
+  for analysis_id in candidates:
+    result = db.execute(
+      update(Analysis)
+      .where(Analysis.id == analysis_id, Analysis.requeued_at.is_not(None), Analysis.status == "pending")
+      .values(requeued_at=None, heartbeat_at=datetime.utcnow())
+    )
+    if result.rowcount == 1:
+      claimed.append(analysis_id)
+  db.commit()
+  return claimed
+
+
+def heartbeat(db: Session, analysis_ids: List[int]) -> int:
+  """
+  Mark ``analysis_ids`` as owned by a live worker; returns how many are still pending.
+  """
+  if not analysis_ids:
+    return 0
+  result = db.execute(
+    update(Analysis)
+    .where(Analysis.id.in_(analysis_ids), Analysis.status == "pending")
+    .values(heartbeat_at=datetime.utcnow())
+  )
+  db.commit()
+  return result.rowcount
+
+
+def _is_stale(stale_before: datetime):
+  # Rows created before heartbeats existed (or never picked up) have none.
+  return and_(
+    Analysis.status == "pending",
+    Analysis.requeued_at.is_(None),
+    or_(
+      Analysis.heartbeat_at < stale_before,
+      and_(Analysis.heartbeat_at.is_(None), Analysis.created_at < stale_before),
+    ),
+  )
+
+
+def claim_stale(db: Session, stale_before: datetime, limit: int = 100) -> List[int]:
+  """
+  Claim up to ``limit`` pending analyses whose worker stopped heartbeating.
+  """
+  candidates = db.scalars(
+    select(Analysis.id).where(_is_stale(stale_before)).order_by(Analysis.id).limit(limit)
+  ).all()
+  claimed = []
+  for analysis_id in candidates:
+    result = db.execute(
+      update(Analysis)
+      .where(Analysis.id == analysis_id, _is_stale(stale_before))
+      .values(heartbeat_at=datetime.utcnow())
+    )
+    if result.rowcount == 1:
+      claimed.append(analysis_id)
+  db.commit()
+  return claimed
@@ -0,0 +1,47 @@
+"""
+Compressed storage for finished LLM documents.
+
+The full analysis output (~20 KB of JSON with 100 chartPoints) is kept out
+of the hot ``analyses`` row: it lives in ``analysis_outputs`` as
+gzip-compressed JSON and is only loaded when GET /analysis/{id} needs it.
+The few scores shown in history listings are copied into the small
+``analyses.summary_json`` column so listing never touches the blob.
+
+``codec`` is stored per row so the format can change later without
+rewriting existing data.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from .encoding import dumps
+
+
+CODEC_GZIP = "gzip"
+
+# Scores surfaced by GET /analysis (history listing).
+SUMMARY_FIELDS = ("summaryScore", "industryScore", "wealthScore", "healthScore")
+
+
+def encode_document(document: Any) -> Tuple[str, bytes, int]:
+  """
+  Serialize and compress a document; returns (codec, data, raw_size).
+  """
+  raw = dumps(document)
+  # Level 6: ~7x smaller on CJK JSON; higher levels cost CPU for little gain.
+  return CODEC_GZIP, gzip.compress(raw, compresslevel=6), len(raw)
+
+
+def decode_document(codec: str, data: bytes) -> Any:
+  if codec != CODEC_GZIP:
+    raise ValueError(f"Unknown analysis output codec: {codec}")
+  return json.loads(gzip.decompress(data))
+
+
+def summarize(document: Any) -> Optional[Dict[str, Any]]:
+  if not isinstance(document, dict):
+    return None
+  return {field: document[field] for field in SUMMARY_FIELDS if field in document}
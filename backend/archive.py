@@ -0,0 +1,189 @@
+"""
+Cold archive for old analyses.
+
+Finished analyses older than ``archive_after_days`` are streamed out of
+``analyses`` / ``analysis_outputs`` into append-only, gzip-compressed JSONL
+files partitioned by creation date::
+
+  <archive_dir>/2025/2025-10-19.jsonl.gz
+
+Each run appends one gzip member per partition per batch (gzip readers
+treat concatenated members as one stream), so existing files are never
+rewritten. A small ``archived_analyses`` stub row keeps the light columns
+for lookups; GET /analysis/{id} reads the full record back from the file.
+
+Batches are bounded (``archive_batch_size`` rows): the file is written and
+fsync'ed first, then the stub insert and row deletes commit in one short
+transaction, so locks are held only for that delete. A crash in between
+only leaves a duplicate line in the archive, which readers ignore.
+
+Command line (e.g. from cron, from the project root):
+
+  python -m backend.archive                  # archive using the configured age
+  python -m backend.archive --days 180       # override the age threshold
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session, joinedload
+
+from .config import get_settings
+from .db import SessionLocal
+from .encoding import dumps
+from .models import Analysis, AnalysisOutput, ArchivedAnalysis
+
+
+settings = get_settings()
+
+
+def partition_name(created_at: datetime) -> str:
+  return f"{created_at:%Y}/{created_at:%Y-%m-%d}.jsonl.gz"
+
+
+def _record(analysis: Analysis) -> Dict[str, Any]:
+  # "id" must stay the first key: read_archived_analysis matches on the prefix.
+  return {
+    "id": analysis.id,
+    "user_id": analysis.user_id,
+    "status": analysis.status,
+    "input": analysis.input_json or {},
+    "output": analysis.output_json,
+    "error_message": analysis.error_message,
+    "created_at": analysis.created_at,
+    "completed_at": analysis.completed_at,
+  }
+
+
+def _append(path: Path, lines: List[bytes]) -> None:
+  path.parent.mkdir(parents=True, exist_ok=True)
+  with open(path, "ab") as fh:
+    fh.write(gzip.compress(b"".join(lines), compresslevel=6))
+    fh.flush()
+    os.fsync(fh.fileno())
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int, archive_dir: Path) -> int:
+  """
+  Archive up to ``batch_size`` finished analyses created before ``cutoff``.
+
+  Returns the number of analyses moved.
+  """
+  analyses = (
+    db.query(Analysis)
+    .options(joinedload(Analysis.output))
+    .filter(Analysis.created_at < cutoff, Analysis.status != "pending")
+    .order_by(Analysis.created_at, Analysis.id)
+    .limit(batch_size)
+    .all()
+  )
+  if not analyses:
+    db.rollback()
+    return 0
+
+  now = datetime.utcnow()
+  by_partition: Dict[str, List[bytes]] = defaultdict(list)
+  stubs: List[ArchivedAnalysis] = []
+  for analysis in analyses:
+    partition = partition_name(analysis.created_at)
+    by_partition[partition].append(dumps(_record(analysis)) + b"\n")
+    stubs.append(
+      ArchivedAnalysis(
+        id=analysis.id,
+        user_id=analysis.user_id,
+        status=analysis.status,
+        created_at=analysis.created_at,
+        completed_at=analysis.completed_at,
+        partition=partition,
+        archived_at=now,
+      )
+    )
+  ids = [stub.id for stub in stubs]
+
+  # End the read transaction before the (slow) file writes.
+  db.rollback()
+  db.expunge_all()
+  for name, lines in by_partition.items():
+    _append(archive_dir / name, lines)
+
+  db.add_all(stubs)
+  db.execute(delete(AnalysisOutput).where(AnalysisOutput.analysis_id.in_(ids)))
+  db.execute(delete(Analysis).where(Analysis.id.in_(ids)))
+  db.commit()
+  return len(ids)
+
+
+def archive_old_analyses(
+  older_than_days: Optional[int] = None,
+  batch_size: Optional[int] = None,
+  archive_dir: Optional[str] = None,
+  max_batches: Optional[int] = None,
+  session_factory: Callable[[], Session] = SessionLocal,
+) -> int:
+  """
+  Run batches until nothing older than the threshold is left.
+
+  Returns the total number of analyses archived.
+  """
+  days = settings.archive_after_days if older_than_days is None else older_than_days
+  size = batch_size or settings.archive_batch_size
+  root = Path(archive_dir or settings.archive_dir)
+  cutoff = datetime.utcnow() - timedelta(days=days)
+
+  total = 0
+  batches = 0
+  while max_batches is None or batches < max_batches:
+    db = session_factory()
+    try:
+      moved = archive_batch(db, cutoff, size, root)
+    finally:
+      db.close()
+    if moved == 0:
+      break
+    total += moved
+    batches += 1
+
+  if total:
+    print(f"[ARCHIVE] Archived {total} analyses created before {cutoff:%Y-%m-%d} in {batches} batches")
+  return total
+
+
+def read_archived_analysis(stub: ArchivedAnalysis, archive_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+  """
+  Load the full record for ``stub`` from its partition file.
+
+  Returns None if the file or line is missing. Only the line whose prefix
+  matches is JSON-decoded, so a day's partition is scanned cheaply.
+  """
+  path = Path(archive_dir or settings.archive_dir) / stub.partition
+  prefix = f'{{"id":{stub.id},'.encode("utf-8")
+  try:
+    with gzip.open(path, "rb") as fh:
+      for line in fh:
+        if line.startswith(prefix):
+          record = json.loads(line)
+          record.pop("user_id", None)
+          return record
+  except FileNotFoundError:
+    pass
+  print(f"[ARCHIVE] Record for analysis {stub.id} not found in {path}")
+  return None
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Move old analyses to the cold archive.")
+  parser.add_argument("--days", type=int, default=None, help="archive analyses older than this many days")
+  parser.add_argument("--batch-size", type=int, default=None)
+  parser.add_argument("--max-batches", type=int, default=None)
+  args = parser.parse_args()
+  moved = archive_old_analyses(args.days, args.batch_size, max_batches=args.max_batches)
+  print(f"[ARCHIVE] Done, {moved} analyses archived")
@@ -1,40 +1,75 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import secrets
-from typing import Dict, Tuple
+import time
+from typing import Dict, Optional, Tuple
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .config import get_settings
-from .db import get_db
+from .db import AsyncSessionLocal, engine, get_async_db, get_db
 from .models import User
+from .otp_store import OTPStore, build_otp_store
+from .ttl_cache import TTLCache
 
 settings = get_settings()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/verify-code")
 
-# Simple in-memory store for one-time codes.
-# This is sufficient for development and local testing.
-_otp_store: Dict[str, Tuple[str, datetime]] = {}
+
+@dataclass(frozen=True)
+class UserClaims:
+  """
+  Immutable snapshot of the caller for handlers that do not need the ORM User.
+  """
+
+  id: int
+  phone: str
+  referral_code: str
+
+
+# token -> user id (skips the JWT signature check) and user id -> UserClaims
+# (skips the users lookup); see get_current_claims.
+_token_cache: TTLCache[str, int] = TTLCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds, name="auth_token")
+_claims_cache: TTLCache[int, UserClaims] = TTLCache(
+  settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds, name="auth_claims"
+)
+
+# One-time codes: in-memory per process by default, or the shared otp_codes
+# table (APP_OTP_STORE=database) for multi-worker deployments.
+_otp_store: OTPStore = build_otp_store(settings, engine)
 
 
 def generate_otp(phone: str) -> str:
   code = f"{secrets.randbelow(1_000_000):06d}"
-  expires_at = datetime.utcnow() + timedelta(minutes=10)
-  _otp_store[phone] = (code, expires_at)
+  expires_at = datetime.utcnow() + timedelta(seconds=settings.otp_ttl_seconds)
+  _otp_store.put(phone, code, expires_at)
   return code
 
 
-def verify_otp(phone: str, code: str) -> bool:
-  stored = _otp_store.get(phone)
-  if not stored:
-    return False
-  real_code, expires_at = stored
-  if datetime.utcnow() > expires_at:
-    return False
-  return secrets.compare_digest(real_code, code)
+def check_otp(phone: str, code: str) -> bool:
+  """
+  Check a code without consuming it (see verify_otp).
+  """
+  return _otp_store.check(phone, code)
+
+
+def verify_otp(phone: str, code: str, db: Optional[Session] = None) -> bool:
+  """
+  Check and consume a code: a successful verification cannot be replayed.
+
+  Pass the request's session to consume within its transaction.
+  """
+  return _otp_store.consume(phone, code, db)
+
+
+def purge_expired_otps() -> int:
+  return _otp_store.purge_expired()
 
 
 def create_access_token(user_id: int) -> str:
@@ -45,6 +80,91 @@ def create_access_token(user_id: int) -> str:
 
 
 def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+  return get_user_from_token(db, token)
+
+
+async def get_current_user_async(
+  db: AsyncSession = Depends(get_async_db),
+  token: str = Depends(oauth2_scheme),
+) -> User:
+  """
+  Async variant of get_current_user for handlers using the AsyncSession path.
+  """
+  return await get_user_from_token_async(db, token)
+
+
+async def get_current_claims(token: str = Depends(oauth2_scheme)) -> UserClaims:
+  """
+  Lightweight auth dependency: returns the caller's UserClaims.
+
+  On a cache hit this needs neither a JWT decode nor a database session, so
+  polling endpoints that only need the user id should prefer it over
+  get_current_user.
+  """
+  return await get_claims_from_token(token)
+
+
+async def get_claims_from_token(token: str) -> UserClaims:
+  user_id = decode_access_token(token)
+  claims = _claims_cache.get(user_id)
+  if claims is not None:
+    return claims
+
+  async with AsyncSessionLocal() as db:
+    user = await db.get(User, user_id)
+  if not user:
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+  return remember_user(user)
+
+
+def remember_user(user: User) -> UserClaims:
+  claims = UserClaims(id=user.id, phone=user.phone, referral_code=user.referral_code)
+  _claims_cache.set(user.id, claims)
+  return claims
+
+
+def invalidate_user(user_id: int) -> None:
+  """
+  Forget the cached snapshot of a user (called whenever the row changes).
+  """
+  _claims_cache.pop(user_id)
+
+
+_CHANGED_USERS = "changed_user_ids"
+
+
+# Evict after commit, not at flush: between the two, a concurrent request
+# would still read (and re-cache for a full TTL) the old committed row.
+# Session-class listeners also cover AsyncSession, which wraps a Session.
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context) -> None:  # noqa: ARG001
+  changed = {obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)}
+  if changed:
+    session.info.setdefault(_CHANGED_USERS, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+  for user_id in session.info.pop(_CHANGED_USERS, ()):
+    invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session: Session) -> None:
+  session.info.pop(_CHANGED_USERS, None)
+
+
+def clear_auth_cache() -> None:
+  _token_cache.clear()
+  _claims_cache.clear()
+
+
+def decode_access_token(token: str) -> int:
+  """
+  Validate a bearer token and return its user id (raises 401 otherwise).
+
+  Successfully decoded tokens are cached (never beyond their own expiry).
+  """
   if not token:
     raise HTTPException(
       status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,12 +172,18 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
       headers={"WWW-Authenticate": "Bearer"},
     )
 
+  cached = _token_cache.get(token)
+  if cached is not None:
+    return cached
+
   try:
     payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     sub = payload.get("sub")
     if sub is None:
       raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
     user_id = int(sub)
+    _token_cache.set(token, user_id, ttl=payload.get("exp", 0) - time.time())
+    return user_id
   except (jwt.PyJWTError, ValueError):
     raise HTTPException(
       status_code=status.HTTP_401_UNAUTHORIZED,
@@ -65,9 +191,26 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
       headers={"WWW-Authenticate": "Bearer"},
     )
 
-  user = db.get(User, user_id)
+
+def get_user_from_token(db: Session, token: str) -> User:
+  """
+  Resolve a bearer token to its User.
+
+  Shared by get_current_user and endpoints that receive the token out of band
+  (e.g. the SSE stream, where EventSource cannot set an Authorization header).
+  """
+  user = db.get(User, decode_access_token(token))
+  if not user:
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+  remember_user(user)
+  return user
+
+
+async def get_user_from_token_async(db: AsyncSession, token: str) -> User:
+  user = await db.get(User, decode_access_token(token))
   if not user:
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+  remember_user(user)
   return user
 
 
@@ -75,5 +218,5 @@ def get_otp_store_snapshot() -> Dict[str, Tuple[str, datetime]]:
   """
   Helper for tests: returns a shallow copy of the current OTP store.
   """
-  return dict(_otp_store)
+  return _otp_store.snapshot()
 
@@ -44,14 +44,41 @@ def _extract_php_array(name: str) -> List[Any]:
   return eval(cleaned, {"__builtins__": None}, {})  # type: ignore[arg-type]
 
 
-# Static tables ported from CalendarController::_initialize
-LUNAR_INFO: List[int] = _extract_php_array("lunarInfo")
-SOLAR_MONTH: List[int] = _extract_php_array("solarMonth")
-GAN: List[str] = _extract_php_array("Gan")
-ZHI: List[str] = _extract_php_array("Zhi")
-ANIMALS: List[str] = _extract_php_array("Animals")
-SOLAR_TERM: List[str] = _extract_php_array("solarTerm")
-S_TERM_INFO: List[str] = _extract_php_array("sTermInfo")
+# Static tables ported from CalendarController::_initialize. Parsed from the
+# PHP source on first use (load_calendar_tables), not at import time.
+LUNAR_INFO: List[int]
+SOLAR_MONTH: List[int]
+GAN: List[str]
+ZHI: List[str]
+ANIMALS: List[str]
+SOLAR_TERM: List[str]
+S_TERM_INFO: List[str]
+
+_CALENDAR_TABLES = {
+  "LUNAR_INFO": "lunarInfo",
+  "SOLAR_MONTH": "solarMonth",
+  "GAN": "Gan",
+  "ZHI": "Zhi",
+  "ANIMALS": "Animals",
+  "SOLAR_TERM": "solarTerm",
+  "S_TERM_INFO": "sTermInfo",
+}
+_tables_loaded = False
+
+
+def load_calendar_tables() -> None:
+  """
+  Parse the calendar tables into module globals (idempotent).
+
+  Called by the public entry points below; the API lifespan also calls it
+  so the first request does not pay for the parse.
+  """
+  global _tables_loaded
+  if _tables_loaded:
+    return
+  tables = {attr: _extract_php_array(name) for attr, name in _CALENDAR_TABLES.items()}
+  globals().update(tables)
+  _tables_loaded = True
 
 # Hour branches table from BaziController::_initialize
 HOUR_BRANCHES: List[str] = [
@@ -218,6 +245,7 @@ def solar_to_lunar_with_ganzhi(y: int, m: int, d: int) -> Dict[str, Any]:
   Port of CalendarController::solar2lunar.
   Returns a dict with lunar Y/M/D and GanZhi info.
   """
+  load_calendar_tables()
   if y < 1900 or y > 2100:
     raise ValueError("Year out of supported range 1900-2100")
   if m < 1 or m > 12:
@@ -323,6 +351,7 @@ def get_hour_gz(hour: int, day_gan: str) -> Tuple[str, str]:
   Hour pillar based on day stem, using 日上起时法.
   Port of BaziController::getHourGZ.
   """
+  load_calendar_tables()
   if hour < 0 or hour > 23:
     raise ValueError("Hour must be in 0-23")
   hour_branch = HOUR_BRANCHES[int(hour)]
@@ -400,6 +429,7 @@ def calculate_bazi_from_basic_profile(user_input: Dict[str, Any]) -> Dict[str, A
   Input schema matches backend.schemas.BaziUserInput.
   Returns a dict compatible with backend.schemas.BaziResult.
   """
+  load_calendar_tables()
   birth_date = user_input.get("birthDate")
   birth_time = user_input.get("birthTime")
   birth_location = user_input.get("birthLocation")
@@ -16,9 +16,92 @@ class Settings:
   """
 
   database_url: str = "sqlite:///./backend.db"
+
+  # Deployment (backend/serve.py). The launcher migrates once and sets
+  # run_migrations_on_startup=false for its workers; periodic jobs run only
+  # in the worker holding jobs_lock_file (backend/leader.py).
+  web_workers: int = 1
+  run_migrations_on_startup: bool = True
+  jobs_lock_file: str = "./backend-jobs.lock"
+  # Lifespan warm-up (backend/warmup.py): pooled connections opened per
+  # engine, and the time limit for each warm-up / readiness check.
+  warmup_db_connections: int = 2
+  warmup_timeout_seconds: int = 10
+  # Graceful shutdown (backend/analysis_jobs.py). uvicorn gives open HTTP
+  # requests shutdown_request_grace_seconds (timeout_graceful_shutdown, set by
+  # backend/serve.py); in-flight analyses then get shutdown_drain_seconds
+  # before they are handed back to the queue. Keep the sum below the
+  # orchestrator's kill timeout (Kubernetes default: 30 s).
+  shutdown_request_grace_seconds: int = 5
+  shutdown_drain_seconds: int = 20
+  # Concurrent LLM generations per worker process, and how often the jobs
+  # leader resumes analyses handed off by stopped workers (0 = never).
+  analysis_workers: int = 16
+  analysis_resume_interval_seconds: int = 30
+  # Workers refresh heartbeat_at on their queued / running analyses every
+  # analysis_heartbeat_seconds; the leader also resumes pending analyses whose
+  # heartbeat is older than analysis_stale_seconds (their worker was killed
+  # without handing off). Keep it several heartbeats long; 0 disables it.
+  analysis_heartbeat_seconds: int = 30
+  analysis_stale_seconds: int = 300
+
+  # Debug mode: adds a Server-Timing header with per-request DB time and
+  # query count (backend/query_stats.py). Statements taking at least
+  # slow_query_ms are logged with redacted parameters (0 = off); a request
+  # running one statement query_repeat_warn times is flagged as a likely N+1.
+  debug: bool = False
+  slow_query_ms: int = 200
+  query_repeat_warn: int = 10
+
+  # Database engine profile (see backend/db.py).
+  # SQLite pragmas applied on every new connection (0 skips the numeric
+  # ones; journal_mode=delete / synchronous=full restore SQLite's
+  # defaults). WAL lets readers proceed while the
+  # background task writes; busy_timeout makes writers wait instead of
+  # failing immediately with "database is locked".
+  sqlite_journal_mode: str = "wal"
+  sqlite_synchronous: str = "normal"
+  sqlite_busy_timeout_ms: int = 5000
+  sqlite_mmap_size: int = 256 * 1024 * 1024
+  # Page cache per connection in KiB (PRAGMA cache_size = -N).
+  sqlite_cache_size_kib: int = 64 * 1024
+  # Connection pool (PostgreSQL and file-based SQLite).
+  db_pool_size: int = 10
+  db_max_overflow: int = 20
+  db_pool_timeout_seconds: int = 30
+  db_pool_recycle_seconds: int = 1800
+  db_pool_pre_ping: bool = True
+  # PostgreSQL only: server-side statement_timeout per connection (0 = off).
+  db_statement_timeout_ms: int = 15000
   secret_key: str = "dev-secret"
   algorithm: str = "HS256"
   access_token_expires_minutes: int = 60 * 24 * 7
+  # Per-process cache of decoded tokens and user snapshots (backend/auth.py).
+  # Entries are dropped on local user updates; other workers see changes
+  # after at most auth_cache_ttl_seconds. 0 disables the cache.
+  auth_cache_ttl_seconds: int = 30
+  auth_cache_max_entries: int = 10000
+
+  # One-time login codes (backend/otp_store.py). "memory" is per-process;
+  # use "database" when running more than one worker.
+  otp_store: str = "memory"
+  otp_ttl_seconds: int = 600
+  otp_max_entries: int = 100000
+  # How often expired codes are purged in the background (0 = never).
+  otp_cleanup_interval_seconds: int = 300
+
+  # Token-bucket limits for /auth/send-code and /auth/verify-code
+  # (backend/rate_limit.py), as "<burst>/<seconds>"; "" disables a limit.
+  # "database" shares buckets across workers, "memory" is per-process.
+  rate_limit_backend: str = "memory"
+  rate_limit_max_keys: int = 100000
+  rate_limit_send_code_phone: str = "5/300"
+  rate_limit_send_code_ip: str = "30/60"
+  rate_limit_verify_code_phone: str = "10/300"
+  rate_limit_verify_code_ip: str = "60/60"
+  # How often buckets that have refilled to capacity are deleted (0 = never);
+  # with the database backend only the jobs leader runs it.
+  rate_limit_purge_interval_seconds: int = 600
   # Optional public base URL for generating links (e.g. referral URLs).
   # When left empty, the application will derive the base URL from the
   # incoming HTTP request (request.base_url), so you usually do not need
@@ -50,6 +133,55 @@ class Settings:
   # Template for `template_param`, where `##code##` will be replaced
   # with the generated verification code.
   sms_template_param_template: str = '{"code":"##code##","min":"5"}'
+  # Outbound SMS queue (backend/sms_outbox.py): worker threads (= max
+  # concurrent provider calls), queue bound, per-call timeout and retries.
+  sms_queue_workers: int = 4
+  sms_queue_max_size: int = 1000
+  sms_timeout_seconds: int = 5
+  sms_max_attempts: int = 3
+  sms_retry_backoff_seconds: int = 1
+  # sms_provider=stub accepts every message after sms_stub_latency_ms without
+  # contacting Alibaba Cloud (local load tests, benchmarks/load_test.py).
+  sms_provider: str = "aliyun"
+  sms_stub_latency_ms: int = 50
+
+  # Push-based result delivery (long-poll / SSE on analysis status).
+  # analysis_wait_max_seconds caps `?wait=` and the SSE stream lifetime;
+  # analysis_wait_recheck_seconds 是每个进程批量检查被等待 id 状态的间隔
+  # （PostgreSQL 上改用 LISTEN/NOTIFY，见 backend/events.py）。
+  analysis_wait_max_seconds: int = 60
+  analysis_wait_recheck_seconds: int = 2
+
+  # Responses at least this many bytes are gzip/brotli compressed when the
+  # client advertises support via Accept-Encoding.
+  compression_min_size: int = 1024
+
+  # Cold archive (backend/archive.py): finished analyses older than
+  # archive_after_days move to gzip JSONL files under archive_dir, in batches
+  # of archive_batch_size rows. archive_interval_seconds > 0 also runs the job
+  # inside the API process; 0 means it only runs via cron / the CLI.
+  archive_dir: str = "./archive"
+  archive_after_days: int = 365
+  archive_batch_size: int = 500
+  archive_interval_seconds: int = 0
+
+  # GET /metrics (backend/metrics.py). A non-empty metrics_token requires
+  # "Authorization: Bearer <token>". metrics_multiproc_dir is where worker
+  # processes share samples when backend.serve runs several workers
+  # (default: a fresh temporary directory).
+  metrics_token: str = ""
+  metrics_multiproc_dir: str = ""
+
+  # On-demand request profiling (backend/profiling.py). A request is profiled
+  # when it carries "X-Profile: <profiling_token>" (or ?__profile=<token>),
+  # or at random for 1 in profiling_sample_every requests (0 = never).
+  # Profiles go to profiling_dir, keeping the newest profiling_max_files.
+  # With neither set the middleware is not installed at all.
+  profiling_token: str = ""
+  profiling_sample_every: int = 0
+  profiling_interval_ms: int = 5
+  profiling_dir: str = "./profiles"
+  profiling_max_files: int = 50
 
 
 def _apply_local_config(settings: Settings) -> None:
@@ -101,15 +233,103 @@ def _apply_local_config(settings: Settings) -> None:
         setattr(settings, field, str(value))
 
 
+_INT_FIELDS = (
+  "web_workers",
+  "warmup_db_connections",
+  "warmup_timeout_seconds",
+  "shutdown_request_grace_seconds",
+  "shutdown_drain_seconds",
+  "analysis_workers",
+  "analysis_resume_interval_seconds",
+  "analysis_heartbeat_seconds",
+  "analysis_stale_seconds",
+  "slow_query_ms",
+  "query_repeat_warn",
+  "sqlite_busy_timeout_ms",
+  "sqlite_mmap_size",
+  "sqlite_cache_size_kib",
+  "db_pool_size",
+  "db_max_overflow",
+  "db_pool_timeout_seconds",
+  "db_pool_recycle_seconds",
+  "db_statement_timeout_ms",
+  "access_token_expires_minutes",
+  "auth_cache_ttl_seconds",
+  "auth_cache_max_entries",
+  "otp_ttl_seconds",
+  "otp_max_entries",
+  "otp_cleanup_interval_seconds",
+  "rate_limit_max_keys",
+  "rate_limit_purge_interval_seconds",
+  "sms_queue_workers",
+  "sms_queue_max_size",
+  "sms_timeout_seconds",
+  "sms_max_attempts",
+  "sms_retry_backoff_seconds",
+  "sms_stub_latency_ms",
+  "llm_max_tokens",
+  "analysis_wait_max_seconds",
+  "analysis_wait_recheck_seconds",
+  "compression_min_size",
+  "archive_after_days",
+  "archive_batch_size",
+  "archive_interval_seconds",
+  "profiling_sample_every",
+  "profiling_interval_ms",
+  "profiling_max_files",
+)
+
+
+_BOOL_FIELDS = ("db_pool_pre_ping", "run_migrations_on_startup", "debug")
+
+
 def _apply_env_overrides(settings: Settings) -> None:
   """
   Apply environment variables with APP_ prefix on top.
   """
   mapping = {
     "database_url": "APP_DATABASE_URL",
+    "web_workers": "APP_WEB_WORKERS",
+    "run_migrations_on_startup": "APP_RUN_MIGRATIONS_ON_STARTUP",
+    "jobs_lock_file": "APP_JOBS_LOCK_FILE",
+    "warmup_db_connections": "APP_WARMUP_DB_CONNECTIONS",
+    "warmup_timeout_seconds": "APP_WARMUP_TIMEOUT_SECONDS",
+    "shutdown_request_grace_seconds": "APP_SHUTDOWN_REQUEST_GRACE_SECONDS",
+    "shutdown_drain_seconds": "APP_SHUTDOWN_DRAIN_SECONDS",
+    "analysis_workers": "APP_ANALYSIS_WORKERS",
+    "analysis_resume_interval_seconds": "APP_ANALYSIS_RESUME_INTERVAL_SECONDS",
+    "analysis_heartbeat_seconds": "APP_ANALYSIS_HEARTBEAT_SECONDS",
+    "analysis_stale_seconds": "APP_ANALYSIS_STALE_SECONDS",
+    "debug": "APP_DEBUG",
+    "slow_query_ms": "APP_SLOW_QUERY_MS",
+    "query_repeat_warn": "APP_QUERY_REPEAT_WARN",
+    "sqlite_journal_mode": "APP_SQLITE_JOURNAL_MODE",
+    "sqlite_synchronous": "APP_SQLITE_SYNCHRONOUS",
+    "sqlite_busy_timeout_ms": "APP_SQLITE_BUSY_TIMEOUT_MS",
+    "sqlite_mmap_size": "APP_SQLITE_MMAP_SIZE",
+    "sqlite_cache_size_kib": "APP_SQLITE_CACHE_SIZE_KIB",
+    "db_pool_size": "APP_DB_POOL_SIZE",
+    "db_max_overflow": "APP_DB_MAX_OVERFLOW",
+    "db_pool_timeout_seconds": "APP_DB_POOL_TIMEOUT_SECONDS",
+    "db_pool_recycle_seconds": "APP_DB_POOL_RECYCLE_SECONDS",
+    "db_pool_pre_ping": "APP_DB_POOL_PRE_PING",
+    "db_statement_timeout_ms": "APP_DB_STATEMENT_TIMEOUT_MS",
     "secret_key": "APP_SECRET_KEY",
     "algorithm": "APP_ALGORITHM",
     "access_token_expires_minutes": "APP_ACCESS_TOKEN_EXPIRES_MINUTES",
+    "auth_cache_ttl_seconds": "APP_AUTH_CACHE_TTL_SECONDS",
+    "auth_cache_max_entries": "APP_AUTH_CACHE_MAX_ENTRIES",
+    "otp_store": "APP_OTP_STORE",
+    "otp_ttl_seconds": "APP_OTP_TTL_SECONDS",
+    "otp_max_entries": "APP_OTP_MAX_ENTRIES",
+    "otp_cleanup_interval_seconds": "APP_OTP_CLEANUP_INTERVAL_SECONDS",
+    "rate_limit_backend": "APP_RATE_LIMIT_BACKEND",
+    "rate_limit_max_keys": "APP_RATE_LIMIT_MAX_KEYS",
+    "rate_limit_send_code_phone": "APP_RATE_LIMIT_SEND_CODE_PHONE",
+    "rate_limit_send_code_ip": "APP_RATE_LIMIT_SEND_CODE_IP",
+    "rate_limit_verify_code_phone": "APP_RATE_LIMIT_VERIFY_CODE_PHONE",
+    "rate_limit_verify_code_ip": "APP_RATE_LIMIT_VERIFY_CODE_IP",
+    "rate_limit_purge_interval_seconds": "APP_RATE_LIMIT_PURGE_INTERVAL_SECONDS",
     "base_url": "APP_BASE_URL",
     "llm_api_base": "APP_LLM_API_BASE",
     "llm_api_key": "APP_LLM_API_KEY",
@@ -120,13 +340,36 @@ def _apply_env_overrides(settings: Settings) -> None:
     "sms_sign_name": "APP_SMS_SIGN_NAME",
     "sms_template_code": "APP_SMS_TEMPLATE_CODE",
     "sms_template_param_template": "APP_SMS_TEMPLATE_PARAM_TEMPLATE",
+    "sms_queue_workers": "APP_SMS_QUEUE_WORKERS",
+    "sms_queue_max_size": "APP_SMS_QUEUE_MAX_SIZE",
+    "sms_timeout_seconds": "APP_SMS_TIMEOUT_SECONDS",
+    "sms_max_attempts": "APP_SMS_MAX_ATTEMPTS",
+    "sms_retry_backoff_seconds": "APP_SMS_RETRY_BACKOFF_SECONDS",
+    "sms_provider": "APP_SMS_PROVIDER",
+    "sms_stub_latency_ms": "APP_SMS_STUB_LATENCY_MS",
+    "analysis_wait_max_seconds": "APP_ANALYSIS_WAIT_MAX_SECONDS",
+    "analysis_wait_recheck_seconds": "APP_ANALYSIS_WAIT_RECHECK_SECONDS",
+    "compression_min_size": "APP_COMPRESSION_MIN_SIZE",
+    "archive_dir": "APP_ARCHIVE_DIR",
+    "archive_after_days": "APP_ARCHIVE_AFTER_DAYS",
+    "archive_batch_size": "APP_ARCHIVE_BATCH_SIZE",
+    "archive_interval_seconds": "APP_ARCHIVE_INTERVAL_SECONDS",
+    "metrics_token": "APP_METRICS_TOKEN",
+    "metrics_multiproc_dir": "APP_METRICS_MULTIPROC_DIR",
+    "profiling_token": "APP_PROFILING_TOKEN",
+    "profiling_sample_every": "APP_PROFILING_SAMPLE_EVERY",
+    "profiling_interval_ms": "APP_PROFILING_INTERVAL_MS",
+    "profiling_dir": "APP_PROFILING_DIR",
+    "profiling_max_files": "APP_PROFILING_MAX_FILES",
   }
 
   for attr, env_name in mapping.items():
     value = os.getenv(env_name)
     if value is None or value == "":
       continue
-    if attr in ("access_token_expires_minutes", "llm_max_tokens"):
+    if attr in _BOOL_FIELDS:
+      setattr(settings, attr, value.strip().lower() in ("1", "true", "yes", "on"))
+    elif attr in _INT_FIELDS:
       try:
         setattr(settings, attr, int(value))
       except ValueError:
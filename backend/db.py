@@ -1,22 +1,138 @@
-from typing import Generator, Dict, Any
+from typing import AsyncGenerator, Generator, Dict, Any
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from .config import get_settings
+from .config import Settings, get_settings
+from .query_stats import instrument_engine
 
 
 settings = get_settings()
 
-connect_args: Dict[str, Any] = {}
-if settings.database_url.startswith("sqlite"):
-  # Needed for SQLite to allow usage in different threads (e.g. TestClient)
-  connect_args = {"check_same_thread": False}
 
-engine = create_engine(settings.database_url, connect_args=connect_args)
+def _is_memory_sqlite(url: str) -> bool:
+  database = make_url(url).database
+  return not database or database == ":memory:" or "mode=memory" in url
+
+
+def _install_sqlite_pragmas(engine: Engine, settings: Settings) -> None:
+  pragmas = []
+  if settings.sqlite_journal_mode and not _is_memory_sqlite(str(engine.url)):
+    pragmas.append(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+  if settings.sqlite_synchronous:
+    pragmas.append(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+  if settings.sqlite_busy_timeout_ms:
+    pragmas.append(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+  if settings.sqlite_mmap_size:
+    pragmas.append(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+  if settings.sqlite_cache_size_kib:
+    pragmas.append(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}")
+
+  @event.listens_for(engine, "connect")
+  def _apply_pragmas(dbapi_connection, connection_record) -> None:  # noqa: ANN001
+    cursor = dbapi_connection.cursor()
+    try:
+      for pragma in pragmas:
+        cursor.execute(pragma)
+    finally:
+      cursor.close()
+
+
+def build_engine(database_url: str, settings: Settings) -> Engine:
+  """
+  Create the SQLAlchemy engine using the tuning profile from Settings.
+
+  - SQLite: WAL / synchronous / busy_timeout / mmap / cache pragmas on connect.
+  - Other backends (PostgreSQL): pool sizing, pre-ping, recycle and a
+    server-side statement_timeout.
+  """
+  connect_args: Dict[str, Any] = {}
+  engine_kwargs: Dict[str, Any] = {}
+  is_sqlite = database_url.startswith("sqlite")
+
+  if is_sqlite:
+    # Needed for SQLite to allow usage in different threads (e.g. TestClient)
+    connect_args = {"check_same_thread": False}
+  elif database_url.startswith("postgresql") and settings.db_statement_timeout_ms:
+    connect_args = {"options": f"-c statement_timeout={int(settings.db_statement_timeout_ms)}"}
+
+  if not (is_sqlite and _is_memory_sqlite(database_url)):
+    engine_kwargs.update(
+      pool_size=settings.db_pool_size,
+      max_overflow=settings.db_max_overflow,
+      pool_timeout=settings.db_pool_timeout_seconds,
+      pool_recycle=settings.db_pool_recycle_seconds,
+      pool_pre_ping=settings.db_pool_pre_ping and not is_sqlite,
+    )
+
+  engine = create_engine(database_url, connect_args=connect_args, **engine_kwargs)
+  if is_sqlite:
+    _install_sqlite_pragmas(engine, settings)
+  return engine
+
+
+# Async drivers for the async session path (request handlers on the event loop).
+_ASYNC_DRIVERS = {
+  "sqlite": "sqlite+aiosqlite",
+  "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_url(database_url: str) -> str:
+  """
+  Map a sync database URL onto its async driver (aiosqlite / asyncpg).
+  """
+  url = make_url(database_url)
+  backend = url.get_backend_name()
+  if backend not in _ASYNC_DRIVERS:
+    raise RuntimeError(f"No async driver configured for database backend: {backend}")
+  return url.set(drivername=_ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def build_async_engine(database_url: str, settings: Settings) -> AsyncEngine:
+  """
+  Async counterpart of build_engine with the same tuning profile.
+  """
+  async_url = async_database_url(database_url)
+  connect_args: Dict[str, Any] = {}
+  engine_kwargs: Dict[str, Any] = {}
+  is_sqlite = database_url.startswith("sqlite")
+
+  if async_url.startswith("postgresql+asyncpg") and settings.db_statement_timeout_ms:
+    connect_args = {"server_settings": {"statement_timeout": str(int(settings.db_statement_timeout_ms))}}
+
+  if not (is_sqlite and _is_memory_sqlite(database_url)):
+    engine_kwargs.update(
+      # aiosqlite defaults to NullPool (a new thread + connection per checkout).
+      poolclass=AsyncAdaptedQueuePool,
+      pool_size=settings.db_pool_size,
+      max_overflow=settings.db_max_overflow,
+      pool_timeout=settings.db_pool_timeout_seconds,
+      pool_recycle=settings.db_pool_recycle_seconds,
+      pool_pre_ping=settings.db_pool_pre_ping and not is_sqlite,
+    )
+
+  async_engine = create_async_engine(async_url, connect_args=connect_args, **engine_kwargs)
+  if is_sqlite:
+    _install_sqlite_pragmas(async_engine.sync_engine, settings)
+  return async_engine
+
+
+engine = build_engine(settings.database_url, settings)
+instrument_engine(engine, settings.slow_query_ms)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = build_async_engine(settings.database_url, settings)
+instrument_engine(async_engine.sync_engine, settings.slow_query_ms)
+
+# expire_on_commit=False: handlers read attributes after commit without an
+# implicit (and, in async code, illegal) lazy refresh.
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -27,3 +143,7 @@ def get_db() -> Generator[Session, None, None]:
   finally:
     db.close()
 
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+  async with AsyncSessionLocal() as db:
+    yield db
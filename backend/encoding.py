@@ -0,0 +1,157 @@
+"""
+Response encoding: fast JSON rendering and size-gated compression.
+
+- ``FastJSONResponse`` renders with orjson when it is installed (falls back
+  to the stdlib encoder otherwise) and is the app's default response class.
+- ``CompressionMiddleware`` gzip/brotli-encodes complete (non-streaming)
+  responses above a size threshold, negotiated via Accept-Encoding.
+
+orjson / brotli 均为可选依赖：未安装时分别退化为标准库 json 与仅 gzip。
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Set
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+  import orjson  # type: ignore[import]
+except ImportError:  # pragma: no cover - exercised only without orjson
+  orjson = None  # type: ignore[assignment]
+
+try:
+  import brotli  # type: ignore[import]
+except ImportError:  # pragma: no cover - exercised only without brotli
+  brotli = None  # type: ignore[assignment]
+
+
+def _default(value: Any) -> Any:
+  if isinstance(value, (datetime, date)):
+    return value.isoformat()
+  raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+  """
+  Serialize to UTF-8 JSON bytes (non-ASCII kept as-is, no extra whitespace).
+  """
+  if orjson is not None:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+  return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+  def render(self, content: Any) -> bytes:
+    return dumps(content)
+
+
+# Compressible media types; images / fonts with their own compression are skipped.
+_COMPRESSIBLE_PREFIXES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+_STREAMING_TYPES = ("text/event-stream",)
+
+
+def _accepted_encodings(accept_encoding: str) -> Set[str]:
+  accepted: Set[str] = set()
+  for part in accept_encoding.split(","):
+    name, _, params = part.partition(";")
+    name = name.strip().lower()
+    if not name:
+      continue
+    params = params.strip().replace(" ", "")
+    if params.startswith("q="):
+      try:
+        if float(params[2:]) <= 0:
+          continue
+      except ValueError:
+        continue
+    accepted.add(name)
+  return accepted
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+  accepted = _accepted_encodings(accept_encoding)
+  if brotli is not None and "br" in accepted:
+    return "br"
+  if "gzip" in accepted:
+    return "gzip"
+  return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+  if encoding == "br":
+    # Quality 5 keeps CPU per response low while still beating gzip on CJK JSON.
+    return brotli.compress(body, quality=5)  # type: ignore[union-attr]
+  return gzip.compress(body, compresslevel=6)
+
+
+class CompressionMiddleware:
+  """
+  Compress buffered responses larger than ``minimum_size``.
+
+  Streaming responses (SSE / long downloads) and responses that already carry
+  a Content-Encoding pass through untouched, so push delivery is never delayed.
+  """
+
+  def __init__(self, app: ASGIApp, minimum_size: int = 1024) -> None:
+    self.app = app
+    self.minimum_size = minimum_size
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+    if encoding is None:
+      await self.app(scope, receive, send)
+      return
+
+    start: Dict[str, Any] = {}
+    passthrough = False
+
+    async def send_wrapper(message: Message) -> None:
+      nonlocal start, passthrough
+
+      if message["type"] == "http.response.start":
+        headers = Headers(raw=message["headers"])
+        content_type = headers.get("content-type", "")
+        if (
+          "content-encoding" in headers
+          or not content_type.startswith(_COMPRESSIBLE_PREFIXES)
+          or content_type.startswith(_STREAMING_TYPES)
+        ):
+          passthrough = True
+          await send(message)
+        else:
+          start = message
+        return
+
+      if passthrough or message["type"] != "http.response.body":
+        await send(message)
+        return
+
+      body = message.get("body", b"")
+      if message.get("more_body", False):
+        # Streaming body: flush the held start message and stop buffering.
+        passthrough = True
+        await send(start)
+        await send(message)
+        return
+
+      headers = MutableHeaders(raw=start["headers"])
+      if len(body) >= self.minimum_size:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(body))
+      if "accept-encoding" not in headers.get("vary", "").lower():
+        headers.add_vary_header("Accept-Encoding")
+      await send(start)
+      await send({"type": "http.response.body", "body": body})
+
+    await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,241 @@
+"""
+Lightweight pub/sub for analysis status changes.
+
+The background LLM task publishes whenever an Analysis leaves the
+``pending`` state; long-poll (``GET /analysis/{id}?wait=30``) and SSE
+(``GET /analysis/{id}/events``) handlers wait on it instead of having the
+front-end poll every few seconds.
+
+Publishing happens from worker threads (FastAPI runs sync background tasks
+in the threadpool) while waiters are coroutines on the event loop, so the
+bus hands results over with ``loop.call_soon_threadsafe``.
+
+同一进程内的通知是即时的；跨进程（多个 uvicorn worker）时，任务可能在
+另一个进程中完成。每个进程只有一个 ``StatusWatcher``：
+
+- 默认每 analysis_wait_recheck_seconds 用一条 ``IN (...)`` 查询检查所有
+  正在被等待的 id，再通过 bus 唤醒对应的 waiter，查询次数与等待的请求数
+  无关；
+- PostgreSQL 上通过 ``listen`` 订阅 ``STATUS_CHANNEL``（写入方在提交时
+  ``pg_notify``），此时只需对新加入等待的 id 查一次，补上订阅之前发生的
+  变化。LISTEN 连接断开后自动退回轮询。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+_Waiter = Tuple[asyncio.AbstractEventLoop, "asyncio.Future[str]"]
+
+
+class AnalysisEventBus:
+  """
+  In-process fan-out of ``(analysis_id, status)`` notifications.
+  """
+
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._waiters: Dict[int, List[_Waiter]] = {}
+
+  def publish(self, analysis_id: int, status: str) -> None:
+    """
+    Wake every coroutine currently waiting on ``analysis_id``.
+
+    Safe to call from any thread.
+    """
+    with self._lock:
+      waiters = self._waiters.pop(analysis_id, [])
+
+    for loop, future in waiters:
+      try:
+        loop.call_soon_threadsafe(_resolve, future, status)
+      except RuntimeError:
+        # Event loop already closed (e.g. during shutdown); nothing to wake.
+        pass
+
+  async def wait(self, analysis_id: int, timeout: float) -> Optional[str]:
+    """
+    Wait for the next published status of ``analysis_id``.
+
+    Returns the published status, or None if ``timeout`` elapsed first.
+    """
+    loop = asyncio.get_running_loop()
+    future: "asyncio.Future[str]" = loop.create_future()
+    waiter = (loop, future)
+
+    with self._lock:
+      self._waiters.setdefault(analysis_id, []).append(waiter)
+
+    try:
+      return await asyncio.wait_for(future, timeout=timeout)
+    except asyncio.TimeoutError:
+      return None
+    finally:
+      self._discard(analysis_id, waiter)
+
+  def waiter_count(self, analysis_id: int) -> int:
+    with self._lock:
+      return len(self._waiters.get(analysis_id, []))
+
+  def _discard(self, analysis_id: int, waiter: _Waiter) -> None:
+    with self._lock:
+      waiters = self._waiters.get(analysis_id)
+      if not waiters:
+        return
+      try:
+        waiters.remove(waiter)
+      except ValueError:
+        pass
+      if not waiters:
+        self._waiters.pop(analysis_id, None)
+
+
+def _resolve(future: "asyncio.Future[str]", status: str) -> None:
+  if not future.done():
+    future.set_result(status)
+
+
+analysis_events = AnalysisEventBus()
+
+
+STATUS_CHANNEL = "analysis_status"
+
+
+def notify_payload(analysis_id: int, status: str) -> str:
+  return f"{analysis_id}:{status}"
+
+
+class StatusWatcher:
+  """
+  Per-process watch on the analyses that requests are waiting for.
+
+  ``load_statuses`` maps a list of ids to their current statuses in one
+  query. A background task on the event loop runs while anything is
+  watched and publishes changes to ``bus``.
+  """
+
+  def __init__(
+    self,
+    load_statuses: Callable[[List[int]], Awaitable[Dict[int, str]]],
+    interval: float,
+    bus: AnalysisEventBus = analysis_events,
+  ) -> None:
+    self.load_statuses = load_statuses
+    self.interval = interval
+    self.bus = bus
+    self._lock = threading.Lock()
+    # analysis id -> known statuses of its current waiters.
+    self._watched: Dict[int, Counter] = {}
+    # Ids watched since the last check (the only ones checked while listening).
+    self._fresh: Set[int] = set()
+    self._task: Optional["asyncio.Task[None]"] = None
+    self.listening = False
+
+  def watch(self, analysis_id: int, known_status: str) -> None:
+    with self._lock:
+      self._watched.setdefault(analysis_id, Counter())[known_status] += 1
+      self._fresh.add(analysis_id)
+    loop = asyncio.get_running_loop()
+    task = self._task
+    if task is None or task.done() or task.get_loop() is not loop:
+      self._task = loop.create_task(self._run())
+
+  def unwatch(self, analysis_id: int, known_status: str) -> None:
+    with self._lock:
+      known = self._watched.get(analysis_id)
+      if known is None:
+        return
+      known[known_status] -= 1
+      if known[known_status] <= 0:
+        del known[known_status]
+      if not known:
+        del self._watched[analysis_id]
+        self._fresh.discard(analysis_id)
+
+  def watched(self) -> List[int]:
+    with self._lock:
+      return sorted(self._watched)
+
+  async def check(self) -> int:
+    """
+    Query the watched ids once and publish every changed status; returns how many.
+    """
+    with self._lock:
+      ids = sorted(self._fresh if self.listening else self._watched)
+      self._fresh.clear()
+    if not ids:
+      return 0
+    statuses = await self.load_statuses(ids)
+    return sum(self._publish_if_changed(analysis_id, status) for analysis_id, status in statuses.items())
+
+  async def listen(self, connection: Any) -> None:
+    """
+    Subscribe an asyncpg ``connection`` to STATUS_CHANNEL (PostgreSQL only).
+
+    The connection must stay open; once it closes, checks go back to
+    polling every watched id.
+    """
+    await connection.add_listener(STATUS_CHANNEL, self._on_notify)
+    connection.add_termination_listener(self._on_listener_closed)
+    self.listening = True
+
+  async def _run(self) -> None:
+    while self.watched():
+      await asyncio.sleep(self.interval)
+      try:
+        await self.check()
+      except Exception as exc:  # noqa: BLE001
+        print(f"[EVENTS] Status check failed: {exc}")
+
+  def _publish_if_changed(self, analysis_id: int, status: str) -> bool:
+    with self._lock:
+      known = self._watched.get(analysis_id)
+      changed = known is not None and any(known_status != status for known_status in known)
+    if changed:
+      self.bus.publish(analysis_id, status)
+    return changed
+
+  def _on_notify(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+    analysis_id, _, status = payload.partition(":")
+    try:
+      self._publish_if_changed(int(analysis_id), status)
+    except ValueError:
+      pass
+
+  def _on_listener_closed(self, connection: Any) -> None:
+    print("[EVENTS] LISTEN connection closed, polling for status changes")
+    self.listening = False
+
+
+async def wait_for_status_change(
+  analysis_id: int,
+  known_status: str,
+  timeout: float,
+  watcher: StatusWatcher,
+) -> Optional[str]:
+  """
+  Wait until the analysis status differs from ``known_status``.
+
+  Changes committed by this process arrive through the bus directly, those
+  of other processes through ``watcher``. Returns the new status, or None
+  if nothing changed before ``timeout``.
+  """
+  loop = asyncio.get_running_loop()
+  deadline = loop.time() + timeout
+  watcher.watch(analysis_id, known_status)
+  try:
+    while True:
+      remaining = deadline - loop.time()
+      if remaining <= 0:
+        return None
+      published = await watcher.bus.wait(analysis_id, remaining)
+      if published is None:
+        return None
+      if published != known_status:
+        return published
+  finally:
+    watcher.unwatch(analysis_id, known_status)
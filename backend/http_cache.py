@@ -0,0 +1,86 @@
+"""
+Helpers for HTTP conditional requests (ETag / Last-Modified / 304).
+
+Endpoints compute an ETag from cheap row metadata (id, status,
+completed_at ...) before loading heavy columns, so a matching
+``If-None-Match`` can be answered with 304 without building the payload.
+
+API ETags are weak: CompressionMiddleware may send the same document as
+identity, gzip or br bytes under one validator, which only a weak ETag
+allows (static files, by contrast, get one strong ETag per encoding). The
+responses depend on the bearer token, so they vary on Authorization too.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response, status
+
+
+# 已完成的分析结果不可变，可以让浏览器长期缓存。
+# 使用 private：响应需要鉴权，不能让共享缓存把它提供给其他用户。
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# 可能变化的资源：允许缓存，但每次使用前都需要带 If-None-Match 重新验证。
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+# Per-account and per-encoding: a browser profile shared by two accounts
+# must not serve one account's cached document to the other.
+API_VARY = "Authorization, Accept-Encoding"
+
+
+def make_etag(*parts: Any) -> str:
+  """
+  Build a weak ETag from the given version parts.
+  """
+  raw = "|".join("" if part is None else str(part) for part in parts)
+  digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:32]
+  return f'W/"{digest}"'
+
+
+def _etag_in(header: str, etag: str) -> bool:
+  if header.strip() == "*":
+    return True
+  # If-None-Match uses weak comparison (RFC 9110 13.1.2): W/ prefixes on
+  # either side are ignored.
+  opaque = etag.removeprefix("W/")
+  return any(c.strip().removeprefix("W/") == opaque for c in header.split(","))
+
+
+def _http_date(value: datetime) -> str:
+  if value.tzinfo is None:
+    value = value.replace(tzinfo=timezone.utc)
+  return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def cache_headers(etag: str, cache_control: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+  headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": API_VARY}
+  if last_modified is not None:
+    headers["Last-Modified"] = _http_date(last_modified)
+  return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+  """
+  Evaluate If-None-Match (preferred) or If-Modified-Since against the resource.
+  """
+  if_none_match = request.headers.get("if-none-match")
+  if if_none_match:
+    return _etag_in(if_none_match, etag)
+
+  if_modified_since = request.headers.get("if-modified-since")
+  if if_modified_since and last_modified is not None:
+    try:
+      since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+      return False
+    modified = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have second precision.
+    return modified.replace(microsecond=0) <= since
+  return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+  return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,46 @@
+"""
+Single-runner election for periodic jobs across uvicorn workers.
+
+Every worker imports the same app; jobs that must not run N times (e.g. the
+cold-archive sweep) only start in the worker that holds an exclusive,
+non-blocking lock on ``jobs_lock_file``. The lock is released by the OS when
+that process exits, so a restarted worker can take over.
+
+On platforms without fcntl (Windows) every process considers itself leader.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import IO, Optional
+
+try:
+  import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+  fcntl = None  # type: ignore[assignment]
+
+
+_lock_handle: Optional[IO[str]] = None
+
+
+def try_become_leader(lock_path: str) -> bool:
+  global _lock_handle
+
+  if _lock_handle is not None:
+    return True
+  if fcntl is None:
+    return True
+
+  handle = open(lock_path, "a+")
+  try:
+    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+  except OSError:
+    handle.close()
+    return False
+
+  handle.seek(0)
+  handle.truncate()
+  handle.write(str(os.getpid()))
+  handle.flush()
+  _lock_handle = handle
+  return True
@@ -1,11 +1,12 @@
 import json
 import os
-from typing import Tuple, Dict, Any
-
-from openai import OpenAI
+import threading
+import time
+from typing import Tuple, Dict, Any, Optional
 
 from .config import get_settings
 from .constants import BAZI_SYSTEM_INSTRUCTION
+from .metrics import LLM_REQUEST_SECONDS, LLM_TOKENS
 from .bazi_algo import calculate_bazi_from_basic_profile
 
 settings = get_settings()
@@ -135,6 +136,65 @@ def calculate_bazi_from_basic_info(user_input: Dict[str, Any]) -> Dict[str, Any]
   return calculate_bazi_from_basic_profile(user_input)
 
 
+def _llm_config() -> Tuple[Optional[str], str, str]:
+  api_key = getattr(settings, "llm_api_key", None) or os.getenv("ARK_API_KEY")
+  api_base = getattr(settings, "llm_api_base", None) or "https://ark.cn-beijing.volces.com/api/v3"
+  model = getattr(settings, "llm_model", None) or "doubao-seed-1-6-251015"
+  return api_key, api_base, model
+
+
+# Idle connections to the LLM endpoint are kept this long (httpx default: 5 s),
+# so the TLS handshake is paid once per worker rather than once per analysis.
+_KEEPALIVE_SECONDS = 60
+
+_llm_client = None
+_llm_http_client = None
+_llm_client_key: Optional[Tuple[str, str]] = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client(api_key: str, api_base: str):
+  """
+  Return the process-wide OpenAI client for (api_key, api_base).
+
+  One client (and one httpx connection pool) is shared by all background
+  analyses instead of building a new one, with a fresh TLS connection, per call.
+  """
+  global _llm_client, _llm_http_client, _llm_client_key
+
+  with _llm_client_lock:
+    if _llm_client is None or _llm_client_key != (api_key, api_base):
+      # Imported on first use: the SDK adds ~0.5 s to a cold `import backend.main`.
+      import httpx
+      from openai import DefaultHttpxClient, OpenAI
+
+      _llm_http_client = DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=_KEEPALIVE_SECONDS),
+      )
+      _llm_client = OpenAI(api_key=api_key, base_url=api_base, http_client=_llm_http_client)
+      _llm_client_key = (api_key, api_base)
+    return _llm_client
+
+
+def preconnect(timeout: float = 5.0) -> str:
+  """
+  Build the shared client and open a keep-alive connection to the LLM endpoint.
+
+  Any HTTP response counts (the API base itself usually answers 404): the
+  point is that DNS, TCP and TLS are done before the first real analysis.
+  Returns a short description; raises if the endpoint cannot be reached.
+  """
+  api_key, api_base, _model = _llm_config()
+  if api_key == "demo":
+    return "demo mode, no endpoint"
+  if not api_key:
+    raise RuntimeError("LLM API key is not configured")
+
+  get_llm_client(api_key, api_base)
+  response = _llm_http_client.get(api_base, timeout=timeout)
+  return f"HTTP {response.status_code} from {api_base}"
+
+
 def call_llm(system_prompt: str, user_prompt: str) -> str:
   """
   Call the configured Doubao/Ark chat completions API (OpenAI-compatible)
@@ -142,9 +202,7 @@ def call_llm(system_prompt: str, user_prompt: str) -> str:
 
   The returned content is expected (but not guaranteed) to be a JSON string.
   """
-  api_key = getattr(settings, "llm_api_key", None) or os.getenv("ARK_API_KEY")
-  api_base = getattr(settings, "llm_api_base", None) or "https://ark.cn-beijing.volces.com/api/v3"
-  model = getattr(settings, "llm_model", None) or "doubao-seed-1-6-251015"
+  api_key, api_base, model = _llm_config()
 
   # Lightweight demo mode: when api_key is set to "demo", skip real HTTP calls
   # and return a small but structurally valid JSON payload.
@@ -202,10 +260,7 @@ def call_llm(system_prompt: str, user_prompt: str) -> str:
       "LLM API key is not configured (APP_LLM_API_KEY or ARK_API_KEY)."
     )
 
-  client = OpenAI(
-    api_key=api_key,
-    base_url=api_base,
-  )
+  client = get_llm_client(api_key, api_base)
 
   # Doubao / 其他 OpenAI 兼容服务：优先尝试 response_format=json_object，
   # 如果后端不支持该参数（部分第三方实现会报错），则自动降级为普通文本响应。
@@ -219,19 +274,30 @@ def call_llm(system_prompt: str, user_prompt: str) -> str:
     "max_tokens": getattr(settings, "llm_max_tokens", 8192),
   }
 
+  started = time.perf_counter()
   try:
-    completion = client.chat.completions.create(
-      **common_kwargs,
-      response_format={"type": "json_object"},
-    )
-  except Exception as exc:  # noqa: BLE001
-    message = str(exc)
-    # 仅当错误看起来与 response_format / JSON 相关时才做兜底重试，
-    # 其他错误直接抛出，避免吞掉真实问题。
-    if "response_format" in message or "json_object" in message:
-      completion = client.chat.completions.create(**common_kwargs)
-    else:
-      raise
+    try:
+      completion = client.chat.completions.create(
+        **common_kwargs,
+        response_format={"type": "json_object"},
+      )
+    except Exception as exc:  # noqa: BLE001
+      message = str(exc)
+      # 仅当错误看起来与 response_format / JSON 相关时才做兜底重试，
+      # 其他错误直接抛出，避免吞掉真实问题。
+      if "response_format" in message or "json_object" in message:
+        completion = client.chat.completions.create(**common_kwargs)
+      else:
+        raise
+  except Exception:
+    LLM_REQUEST_SECONDS.labels(model, "error").observe(time.perf_counter() - started)
+    raise
+  LLM_REQUEST_SECONDS.labels(model, "ok").observe(time.perf_counter() - started)
+
+  usage = getattr(completion, "usage", None)
+  if usage is not None:
+    LLM_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
 
   message = completion.choices[0].message
   content = message.content
@@ -1,28 +1,141 @@
-from datetime import datetime, date
+from contextlib import asynccontextmanager
+from datetime import datetime, date, timedelta
 from typing import Optional
+import asyncio
+import base64
 import json
-from pathlib import Path
+import time
 
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Request
+from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
 from . import schemas
-from .auth import generate_otp, verify_otp, create_access_token, get_current_user, get_otp_store_snapshot
+from .auth import (
+  generate_otp,
+  check_otp,
+  verify_otp,
+  create_access_token,
+  UserClaims,
+  get_claims_from_token,
+  get_current_claims,
+  get_current_user_async,
+  get_otp_store_snapshot,
+  purge_expired_otps,
+)
 from .config import get_settings
-from .db import Base, engine, get_db, SessionLocal
-from .models import User, Invite, Analysis
+from .db import Base, engine, get_db, get_async_db, SessionLocal, AsyncSessionLocal, async_engine
+from .leader import try_become_leader
+from .models import User, Invite, Analysis, ArchivedAnalysis
+from .archive import archive_old_analyses, read_archived_analysis
+from .analysis_jobs import AnalysisRunner, RunnerClosed, claim_requeued, claim_stale, hand_off, heartbeat
+from .analysis_store import SUMMARY_FIELDS
 from .llm_client import call_llm, build_prompts, extract_json_from_content, calculate_bazi_from_basic_info
-from .sms_client import send_verification_code_sms, verify_sms_code
+from .sms_client import verify_sms_code
+from .sms_outbox import sms_outbox
 from .invite_codes import get_initial_invite_codes
+from .referral_codes import insert_user_with_referral_code
+from .rate_limit import build_rate_limiter
+from .events import STATUS_CHANNEL, StatusWatcher, analysis_events, notify_payload, wait_for_status_change
+from .usage import (
+  get_daily_usage_async,
+  invite_bonus,
+  record_analysis_result,
+  record_invite,
+  reserve_analysis_async,
+  used_today,
+)
+from .encoding import CompressionMiddleware, FastJSONResponse
+from .static_files import FRONTEND_DIST_DIR, SpaIndex, StaticAssets
+from .metrics import (
+  ANALYSES_CREATED,
+  ANALYSES_FINISHED,
+  ANALYSIS_QUEUE_DEPTH,
+  MetricsMiddleware,
+  mark_process_dead,
+  render_metrics,
+)
+from .profiling import ProfileStore, ProfilingMiddleware
+from .query_stats import QueryStatsMiddleware
+from .warmup import probe_readiness, start_draining, warm_up_worker
+from .http_cache import (
+  IMMUTABLE_CACHE_CONTROL,
+  REVALIDATE_CACHE_CONTROL,
+  cache_headers,
+  is_not_modified,
+  make_etag,
+  not_modified,
+)
 
 settings = get_settings()
 
-Base.metadata.create_all(bind=engine)
+_SSE_KEEPALIVE_SECONDS = 15
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  """
+  Per-worker startup and shutdown.
+
+  Importing this module only builds the app; migrations, the static-file
+  index, dependency warm-up (backend/warmup.py) and background jobs happen
+  here, so imports (tests, CLI tools, worker restarts) stay fast and
+  side-effect free, and uvicorn only routes traffic to a warm worker.
+  """
+  started = time.perf_counter()
+  # backend/serve.py migrates once before starting workers and disables this.
+  if settings.run_migrations_on_startup:
+    from .migrate import upgrade_database
+
+    upgrade_database()
+  if static_assets is not None:
+    print(f"[STATIC] Indexed {static_assets.scan()} frontend files")
+  await warm_up_worker()
+  analysis_runner.start()
+  _start_background_jobs()
+  listener = await _listen_for_status_changes()
+  print(f"[STARTUP] Worker ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+  yield
+
+  # uvicorn has stopped accepting connections and given open requests
+  # shutdown_request_grace_seconds (backend/serve.py). Refuse new analyses,
+  # let running ones finish within shutdown_drain_seconds and hand the rest
+  # back to the queue so they do not stay pending forever.
+  shutdown_started = time.perf_counter()
+  start_draining()
+  analysis_runner.stop_accepting()
+  in_flight = analysis_runner.in_flight()
+  unfinished = await asyncio.to_thread(analysis_runner.drain, settings.shutdown_drain_seconds)
+  drain_ms = (time.perf_counter() - shutdown_started) * 1000
+  handed_off = await asyncio.to_thread(_hand_off_analyses, unfinished) if unfinished else 0
+  print(
+    f"[SHUTDOWN] Drained {len(in_flight) - len(unfinished)}/{len(in_flight)} analyses in {drain_ms:.0f} ms; "
+    f"handed off {handed_off} {_format_ids(unfinished)}"
+  )
+
+  if listener is not None:
+    await listener.close()
+
+  # Give queued verification codes a chance to go out before exiting.
+  await asyncio.to_thread(sms_outbox.stop, settings.sms_timeout_seconds)
+  mark_process_dead()
+  print(f"[SHUTDOWN] Worker stopped in {(time.perf_counter() - shutdown_started) * 1000:.0f} ms")
 
-app = FastAPI(title="Life Bull Market API", version="0.1.0")
+
+app = FastAPI(
+  title="Life Bull Market API",
+  version="0.1.0",
+  default_response_class=FastJSONResponse,
+  lifespan=lifespan,
+)
+
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
 
 app.add_middleware(
   CORSMiddleware,
@@ -32,47 +145,185 @@ app.add_middleware(
   allow_headers=["*"],
 )
 
+app.add_middleware(QueryStatsMiddleware, server_timing=settings.debug, repeat_warn=settings.query_repeat_warn)
+
+profile_store = ProfileStore(settings.profiling_dir, settings.profiling_max_files)
+if settings.profiling_token or settings.profiling_sample_every > 0:
+  app.add_middleware(
+    ProfilingMiddleware,
+    store=profile_store,
+    token=settings.profiling_token,
+    sample_every=settings.profiling_sample_every,
+    interval_ms=settings.profiling_interval_ms,
+  )
+
+# Outermost, so latency includes compression and CORS handling.
+app.add_middleware(MetricsMiddleware)
 
-def _generate_unique_referral_code(db: Session) -> str:
-  import secrets
-  import string
+_background_jobs: set = set()
 
-  alphabet = string.ascii_uppercase + string.digits
-  initial_codes = {code.upper() for code in get_initial_invite_codes()}
 
+async def _run_periodically(tag: str, interval_seconds: int, job) -> None:
+  """
+  Run the sync ``job`` in a worker thread every ``interval_seconds``.
+  """
   while True:
-    code = "".join(secrets.choice(alphabet) for _ in range(6))
-    existing = db.query(User).filter(User.referral_code == code).first()
-    # 确保不会与现有用户的邀请码或初始邀请码池发生冲突。
-    if not existing and code.upper() not in initial_codes:
-      return code
+    await asyncio.sleep(interval_seconds)
+    try:
+      await asyncio.to_thread(job)
+    except Exception as exc:  # noqa: BLE001
+      print(f"[{tag}] Periodic run failed: {exc}")
+
+
+async def _listen_for_status_changes():
+  """
+  PostgreSQL: hold one connection that LISTENs for analysis status changes,
+  so waiters no longer need the periodic status query.
+  """
+  if async_engine.dialect.name != "postgresql":
+    return None
+  conn = None
+  try:
+    conn = await async_engine.connect()
+    raw = await conn.get_raw_connection()
+    await analysis_watcher.listen(raw.driver_connection)
+  except Exception as exc:  # noqa: BLE001
+    print(f"[EVENTS] LISTEN unavailable, polling for status changes: {exc}")
+    if conn is not None:
+      await conn.close()
+    return None
+  return conn
+
+
+def _spawn_background_job(coro) -> None:
+  task = asyncio.get_running_loop().create_task(coro)
+  _background_jobs.add(task)
+  task.add_done_callback(_background_jobs.discard)
+
+
+def _start_background_jobs() -> None:
+  # Only one worker process runs the archive sweep; OTP cleanup is per-store
+  # and cheap, so every worker does it.
+  if settings.archive_interval_seconds > 0 and try_become_leader(settings.jobs_lock_file):
+    _spawn_background_job(_run_periodically("ARCHIVE", settings.archive_interval_seconds, archive_old_analyses))
+  if settings.otp_cleanup_interval_seconds > 0:
+    _spawn_background_job(_run_periodically("OTP", settings.otp_cleanup_interval_seconds, purge_expired_otps))
+  if settings.analysis_resume_interval_seconds > 0 and try_become_leader(settings.jobs_lock_file):
+    _spawn_background_job(
+      _run_periodically("REQUEUE", settings.analysis_resume_interval_seconds, _resume_handed_off_analyses)
+    )
+  if settings.analysis_heartbeat_seconds > 0:
+    _spawn_background_job(_run_periodically("HEARTBEAT", settings.analysis_heartbeat_seconds, _heartbeat_analyses))
+  # Database buckets are shared, so one worker purges them; memory ones are per-process.
+  if settings.rate_limit_purge_interval_seconds > 0 and (
+    settings.rate_limit_backend != "database" or try_become_leader(settings.jobs_lock_file)
+  ):
+    _spawn_background_job(
+      _run_periodically("RATE", settings.rate_limit_purge_interval_seconds, rate_limiter.purge_full_buckets)
+    )
+
+
+@app.get("/healthz", include_in_schema=False)
+def healthz() -> dict:
+  """
+  Liveness: the process is up and serving requests. Checks nothing else.
+  """
+  return {"status": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz() -> Response:
+  """
+  Readiness: 200 once warm-up finished and the required dependencies are
+  healthy, 503 otherwise, with each dependency's status and latency.
+  """
+  payload = await probe_readiness()
+  code = status.HTTP_200_OK if payload["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE
+  return FastJSONResponse(payload, status_code=code, headers={"Cache-Control": "no-store"})
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request) -> Response:
+  """
+  Prometheus exposition (aggregated over all workers under backend.serve).
+  """
+  if settings.metrics_token and request.headers.get("authorization") != f"Bearer {settings.metrics_token}":
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+  payload, content_type = render_metrics()
+  return Response(content=payload, media_type=content_type)
+
+
+def _require_profiling_admin(request: Request) -> None:
+  # Without a token the profile endpoints do not exist.
+  if not settings.profiling_token:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+  if request.headers.get("authorization") != f"Bearer {settings.profiling_token}":
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+
+@app.get("/debug/profiles", include_in_schema=False)
+def list_profiles(request: Request) -> dict:
+  _require_profiling_admin(request)
+  return {"items": profile_store.list()}
+
+
+@app.get("/debug/profiles/{name}", include_in_schema=False)
+def download_profile(name: str, request: Request) -> FileResponse:
+  _require_profiling_admin(request)
+  path = profile_store.path(name)
+  if path is None:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+  return FileResponse(path, media_type="text/plain; charset=utf-8", filename=name)
+
+
+rate_limiter = build_rate_limiter(settings, engine)
+
+
+def _enforce_rate_limits(request: Request, endpoint: str, phone: str) -> None:
+  """
+  Apply the per-phone and per-IP token buckets of ``endpoint`` (429 when empty).
+  """
+  client_ip = request.client.host if request.client else "unknown"
+  for name, key in ((f"{endpoint}_phone", phone), (f"{endpoint}_ip", client_ip)):
+    retry_after = rate_limiter.check(name, key)
+    if retry_after:
+      print(f"[RATE] {name} limited key={key}")
+      raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="请求过于频繁，请稍后再试",
+        headers={"Retry-After": str(int(retry_after))},
+      )
 
 
 @app.post("/auth/send-code", response_model=schemas.SendCodeResponse)
-def send_code(payload: schemas.SendCodeRequest) -> schemas.SendCodeResponse:
+def send_code(payload: schemas.SendCodeRequest, request: Request) -> schemas.SendCodeResponse:
+  _enforce_rate_limits(request, "send_code", payload.phone)
   code = generate_otp(payload.phone)
   # For development we log the code; in production this will also
   # trigger an SMS via the configured provider (see sms_client).
   print(f"[DEV] Sending verification code {code} to phone {payload.phone}")
-  try:
-    send_verification_code_sms(payload.phone, code)
-  except Exception as exc:  # noqa: BLE001
-    # Never crash login because external SMS fails; the OTP remains
-    # valid in the in-memory store and can仍然通过调试接口获取。
-    print(f"[SMS] Failed to call provider: {exc}")
+  # The provider call happens on the outbox workers, so login latency no
+  # longer depends on it. Never crash login because external SMS fails; the
+  # OTP remains valid and can仍然通过调试接口获取。
+  sms_outbox.enqueue(payload.phone, code)
   return schemas.SendCodeResponse(success=True)
 
 
 @app.post("/auth/verify-code", response_model=schemas.Token)
-def verify_code(payload: schemas.VerifyCodeRequest, db: Session = Depends(get_db)) -> schemas.Token:
-  local_ok = verify_otp(payload.phone, payload.code)
+def verify_code(payload: schemas.VerifyCodeRequest, request: Request, db: Session = Depends(get_db)) -> schemas.Token:
+  _enforce_rate_limits(request, "verify_code", payload.phone)
+  # Only checked here; the code is consumed right before the commit, so a
+  # rejected invite code does not cost the user their SMS code.
+  local_ok = check_otp(payload.phone, payload.code)
 
+  # 本地校验通过时无需再请求远端，省去一次外部调用。
   remote_ok = False
-  try:
-    remote_ok = verify_sms_code(payload.phone, payload.code)
-  except Exception as exc:  # noqa: BLE001
-    # 远端异常不应影响本地 OTP 逻辑，只做日志记录。
-    print(f"[SMS] verify_sms_code raised exception: {exc}")
+  if not local_ok:
+    try:
+      remote_ok = verify_sms_code(payload.phone, payload.code)
+    except Exception as exc:  # noqa: BLE001
+      # 远端异常不应影响本地 OTP 逻辑，只做日志记录。
+      print(f"[SMS] verify_sms_code raised exception: {exc}")
 
   if not (local_ok or remote_ok):
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired verification code")
@@ -109,29 +360,36 @@ def verify_code(payload: schemas.VerifyCodeRequest, db: Session = Depends(get_db
         detail="邀请码无效，请确认后再试",
       )
 
-    # 通过校验后，创建新用户
+    # 通过校验后，创建新用户（referral_code 由唯一索引保证不重复，见 referral_codes.py）
     is_new_user = True
-    referral_code = _generate_unique_referral_code(db)
-
     user = User(
       phone=payload.phone,
-      referral_code=referral_code,
       inviter_code=inviter_code,
       created_at=datetime.utcnow(),
       last_login_at=datetime.utcnow(),
     )
-    db.add(user)
-    db.flush()  # Ensure user.id is available
+    try:
+      insert_user_with_referral_code(db, user)  # Ensures user.id is available
+    except IntegrityError:
+      db.rollback()
+      raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="注册请求冲突，请重试")
 
     # 只有“用户邀请码邀请用户”才计入 Invite 统计；
     # 使用初始邀请码池注册的用户不会增加某个具体用户的邀请数。
     if inviter_user and inviter_user.id != user.id:
       invite = Invite(inviter_user_id=inviter_user.id, invited_user_id=user.id, created_at=datetime.utcnow())
       db.add(invite)
+      record_invite(db, inviter_user.id, invite.created_at)
   else:
     # 老用户登录时忽略 inviterCode，只更新最近登录时间。
     user.last_login_at = datetime.utcnow()
 
+  # Atomic consume, in this transaction: of two concurrent logins with one
+  # code only one commits, and a failed commit leaves the code usable.
+  if local_ok and not verify_otp(payload.phone, payload.code, db):
+    db.rollback()
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired verification code")
+
   db.commit()
 
   if is_new_user:
@@ -159,21 +417,16 @@ def debug_get_otp_store() -> dict:
 
 
 @app.get("/user/me", response_model=schemas.UserMeResponse)
-def get_me(
+async def get_me(
   request: Request,
-  current_user: User = Depends(get_current_user),
-  db: Session = Depends(get_db),
-) -> schemas.UserMeResponse:
-  # Basic invite statistics
-  total_invited = db.query(Invite).filter(Invite.inviter_user_id == current_user.id).count()
-
-  today = date.today()
-  invited_today = (
-    db.query(Invite)
-    .filter(Invite.inviter_user_id == current_user.id)
-    .filter(Invite.created_at >= datetime(today.year, today.month, today.day))
-    .count()
-  )
+  current_user: User = Depends(get_current_user_async),
+  db: AsyncSession = Depends(get_async_db),
+) -> Response:
+  # Invite statistics and today's usage come from materialized counters
+  # (backend/usage.py): one primary-key lookup instead of three COUNTs.
+  total_invited = current_user.invite_count
+  usage = await get_daily_usage_async(db, current_user.id)
+  invited_today = usage.invites if usage else 0
 
   today_base_quota = 3
 
@@ -181,19 +434,10 @@ def get_me(
   # every 5 successful invites grants +1 extra, capped at +5 per day.
   # For now we use totalInvited as a simple approximation; later we can
   # refine this to use "completed analyses of invited users".
-  extra_by_invites = total_invited // 5
-  today_extra_quota = min(extra_by_invites, 5)
-
-  # Count today's completed analyses
-  analyses_today_done = (
-    db.query(Analysis)
-    .filter(Analysis.user_id == current_user.id)
-    .filter(Analysis.status == "done")
-    .filter(Analysis.created_at >= datetime(today.year, today.month, today.day))
-    .count()
-  )
+  today_extra_quota = invite_bonus(total_invited, cap=5)
 
-  today_used = analyses_today_done
+  # Analyses reserved today (pending or done; failed ones are refunded).
+  today_used = used_today(usage)
   today_remaining = max(today_base_quota + today_extra_quota - today_used, 0)
 
   # Compute public base URL:
@@ -207,7 +451,7 @@ def get_me(
 
   my_referral_url = f"{base_url}/auth?ref={current_user.referral_code}"
 
-  return schemas.UserMeResponse(
+  body = schemas.UserMeResponse(
     user=current_user,
     todayBaseQuota=today_base_quota,
     todayExtraQuota=today_extra_quota,
@@ -216,20 +460,116 @@ def get_me(
     totalInvited=total_invited,
     invitedToday=invited_today,
     myReferralUrl=my_referral_url,
-  )
+  ).model_dump_json()
+
+  # Quota figures change throughout the day, so the ETag is derived from the
+  # payload itself; a match still saves the transfer and client re-render.
+  headers = cache_headers(make_etag("user-me", body), REVALIDATE_CACHE_CONTROL)
+  if is_not_modified(request, headers["ETag"]):
+    return not_modified(headers)
+  return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _encode_cursor(created_at: datetime, analysis_id: int) -> str:
+  raw = f"{created_at.isoformat()}|{analysis_id}".encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+  try:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    created_at_str, id_str = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+    return datetime.fromisoformat(created_at_str), int(id_str)
+  except (ValueError, UnicodeDecodeError) as exc:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from exc
+
+
+def _score_value(value) -> Optional[float]:
+  # LLM output is loosely typed: scores may arrive as numbers or numeric strings.
+  if value is None or isinstance(value, bool):
+    return None
+  try:
+    number = float(value)
+  except (TypeError, ValueError):
+    return None
+  return int(number) if number.is_integer() else number
+
+
+@app.get("/analysis", response_model=schemas.AnalysisListResponse)
+def list_analyses(
+  cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+  limit: int = Query(default=20, ge=1, le=100),
+  status_filter: Optional[list[str]] = Query(default=None, alias="status", description="Only these statuses (repeatable)"),
+  current_user: UserClaims = Depends(get_current_claims),
+  db: Session = Depends(get_db),
+) -> schemas.AnalysisListResponse:
+  """
+  List the current user's analyses, newest first.
+
+  Uses keyset pagination on (created_at, id): each page is a bounded index
+  range scan that costs the same no matter how deep the client pages,
+  unlike OFFSET. Only light columns are selected; the compressed output is
+  never loaded, the scores come from summary_json.
+  """
+  query = db.query(
+    Analysis.id,
+    Analysis.status,
+    Analysis.created_at,
+    Analysis.completed_at,
+    Analysis.input_json["name"].as_string().label("name"),
+    Analysis.input_json["gender"].as_string().label("gender"),
+    Analysis.input_json["birthDate"].as_string().label("birthDate"),
+    *(Analysis.summary_json[field].as_string().label(field) for field in SUMMARY_FIELDS),
+  ).filter(Analysis.user_id == current_user.id)
+
+  if status_filter:
+    query = query.filter(Analysis.status.in_(status_filter))
+
+  if cursor:
+    cursor_created_at, cursor_id = _decode_cursor(cursor)
+    query = query.filter(
+      or_(
+        Analysis.created_at < cursor_created_at,
+        and_(Analysis.created_at == cursor_created_at, Analysis.id < cursor_id),
+      )
+    )
+
+  rows = query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit + 1).all()
+
+  has_more = len(rows) > limit
+  rows = rows[:limit]
+
+  items = [
+    schemas.AnalysisSummary(
+      id=row.id,
+      status=row.status,
+      created_at=row.created_at,
+      completed_at=row.completed_at,
+      name=row.name,
+      gender=row.gender,
+      birthDate=row.birthDate,
+      **{field: _score_value(getattr(row, field)) for field in SUMMARY_FIELDS},
+    )
+    for row in rows
+  ]
+  next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+  return schemas.AnalysisListResponse(items=items, next_cursor=next_cursor)
 
 
 @app.get("/analysis/latest", response_model=schemas.LatestAnalysisResponse)
 def get_latest_analysis(
-  current_user: User = Depends(get_current_user),
+  request: Request,
+  response: Response,
+  current_user: UserClaims = Depends(get_current_claims),
   db: Session = Depends(get_db),
-) -> schemas.LatestAnalysisResponse:
+):
   """
   Return the most recent non-error analysis for the current user.
   This is primarily used for prefilling the input form on the profile page.
   """
+  # Only the light columns are needed; the LLM output is never read here.
   analysis = (
-    db.query(Analysis)
+    db.query(Analysis.id, Analysis.status, Analysis.input_json, Analysis.created_at)
     .filter(Analysis.user_id == current_user.id)
     .filter(Analysis.status != "error")
     .order_by(Analysis.created_at.desc())
@@ -239,6 +579,15 @@ def get_latest_analysis(
   if not analysis:
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No analysis found")
 
+  # input_json is immutable once stored, so (id, status) identifies the payload.
+  headers = cache_headers(
+    make_etag("analysis-latest", analysis.id, analysis.status),
+    REVALIDATE_CACHE_CONTROL,
+  )
+  if is_not_modified(request, headers["ETag"]):
+    return not_modified(headers)
+  response.headers.update(headers)
+
   return schemas.LatestAnalysisResponse(
     id=analysis.id,
     status=analysis.status,
@@ -247,18 +596,7 @@ def get_latest_analysis(
   )
 
 
-@app.post("/bazi/calc", response_model=schemas.BaziResult)
-def calc_bazi(
-  payload: schemas.BaziUserInput,
-  current_user: User = Depends(get_current_user),
-) -> schemas.BaziResult:
-  """
-  Pre-calculate BaZi chart and Da Yun based on basic profile input.
-
-  This mirrors the first step in the latest reference project so that
-  the /profile form can stay simple (只填生日、时间、地点)，而不需要用户自己
-  输入干支与大运。
-  """
+def _calculate_bazi_result(payload: schemas.BaziUserInput) -> schemas.BaziResult:
   try:
     raw = calculate_bazi_from_basic_info(payload.model_dump())
   except Exception as exc:  # noqa: BLE001
@@ -274,6 +612,21 @@ def calc_bazi(
   return schemas.BaziResult.model_validate(raw)
 
 
+@app.post("/bazi/calc", response_model=schemas.BaziResult)
+def calc_bazi(
+  payload: schemas.BaziUserInput,
+  current_user: UserClaims = Depends(get_current_claims),
+) -> schemas.BaziResult:
+  """
+  Pre-calculate BaZi chart and Da Yun based on basic profile input.
+
+  This mirrors the first step in the latest reference project so that
+  the /profile form can stay simple (只填生日、时间、地点)，而不需要用户自己
+  输入干支与大运。
+  """
+  return _calculate_bazi_result(payload)
+
+
 def _run_analysis_background(analysis_id: int) -> None:
   """
   Background task: call LLM and update the Analysis record.
@@ -281,95 +634,402 @@ def _run_analysis_background(analysis_id: int) -> None:
   db = SessionLocal()
   try:
     analysis = db.get(Analysis, analysis_id)
-    if not analysis:
+    # Also covers a handed-off analysis its old worker finished after all.
+    if not analysis or analysis.status != "pending":
       return
 
     system_prompt, user_prompt = build_prompts(analysis.input_json or {})
+    output, error = None, None
     try:
       content = call_llm(system_prompt, user_prompt)
       output = extract_json_from_content(content)
+    except Exception as exc:  # noqa: BLE001
+      error = exc
+
+    # After hand-off another worker may have claimed and finished this
+    # analysis while the LLM call ran; its result stands.
+    db.refresh(analysis)
+    if analysis.status != "pending":
+      return
+
+    if error is None:
       analysis.output_json = output
       analysis.status = "done"
       analysis.error_message = None
       analysis.completed_at = datetime.utcnow()
-    except Exception as exc:  # noqa: BLE001
+    else:
       # 调用大模型失败（超时 / 解析错误 / 网络问题等）时，不再使用本地 exp.json 兜底，
       # 而是明确标记为 error，前端可以据此展示“分析失败”并引导用户重试。
       analysis.status = "error"
-      analysis.error_message = f"{exc}"
+      analysis.error_message = f"{error}"
       analysis.completed_at = datetime.utcnow()
 
+    # Failed analyses give the reserved quota back.
+    record_analysis_result(db, analysis.user_id, analysis.created_at, succeeded=analysis.status == "done")
+
+    if engine.dialect.name == "postgresql":
+      # Delivered on commit to every worker's LISTEN connection.
+      db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": STATUS_CHANNEL, "payload": notify_payload(analysis.id, analysis.status)},
+      )
     db.commit()
+    ANALYSES_FINISHED.labels(analysis.status).inc()
+    analysis_events.publish(analysis.id, analysis.status)
   finally:
+    ANALYSIS_QUEUE_DEPTH.dec()
     db.close()
 
 
-@app.post("/analysis", response_model=schemas.AnalysisCreateResponse)
-def create_analysis(
-  payload: schemas.AnalysisInput,
-  background_tasks: BackgroundTasks,
-  current_user: User = Depends(get_current_user),
-  db: Session = Depends(get_db),
-) -> schemas.AnalysisCreateResponse:
-  today = date.today()
+analysis_runner = AnalysisRunner(_run_analysis_background, workers=settings.analysis_workers)
 
-  # Compute today's quotas for this user
-  today_base_quota = 5
 
-  total_invited = db.query(Invite).filter(Invite.inviter_user_id == current_user.id).count()
-  extra_by_invites = total_invited // 5
-  today_extra_quota = min(extra_by_invites, 10)
+_LOGGED_IDS_MAX = 10
+
+
+def _format_ids(analysis_ids: list) -> str:
+  # A long backlog would otherwise flood the log with one huge line.
+  shown = ", ".join(str(analysis_id) for analysis_id in analysis_ids[:_LOGGED_IDS_MAX])
+  if len(analysis_ids) > _LOGGED_IDS_MAX:
+    shown += f", ... (+{len(analysis_ids) - _LOGGED_IDS_MAX} more)"
+  return f"[{shown}]"
+
+
+def _hand_off_analyses(analysis_ids: list) -> int:
+  db = SessionLocal()
+  try:
+    return hand_off(db, analysis_ids)
+  finally:
+    db.close()
+
+
+async def _run_analysis_job(analysis_id: int) -> None:
+  try:
+    await analysis_runner.run_async(analysis_id)
+  except RunnerClosed:
+    # Shutdown began after the row was committed: leave it to another worker.
+    ANALYSIS_QUEUE_DEPTH.dec()
+    await asyncio.to_thread(_hand_off_analyses, [analysis_id])
+  except asyncio.CancelledError:
+    # uvicorn's request grace expired; the job keeps running and the
+    # lifespan drain takes over (not an error, nothing to log).
+    return
+
+
+def _heartbeat_analyses() -> None:
+  in_flight = analysis_runner.in_flight()
+  if not in_flight:
+    return
+  db = SessionLocal()
+  try:
+    heartbeat(db, in_flight)
+  finally:
+    db.close()
+
+
+def _resume_handed_off_analyses() -> None:
+  """
+  Run analyses that shutting-down workers handed back to the queue, and
+  those whose worker died without handing them off (stale heartbeat).
+  """
+  db = SessionLocal()
+  try:
+    claimed = claim_requeued(db)
+    if settings.analysis_stale_seconds > 0:
+      stale_before = datetime.utcnow() - timedelta(seconds=settings.analysis_stale_seconds)
+      claimed += claim_stale(db, stale_before)
+  finally:
+    db.close()
+  for index, analysis_id in enumerate(claimed):
+    try:
+      analysis_runner.submit(analysis_id)
+    except RunnerClosed:
+      _hand_off_analyses(claimed[index:])
+      return
+    ANALYSIS_QUEUE_DEPTH.inc()
+  if claimed:
+    print(f"[REQUEUE] Resumed {len(claimed)} handed-off or orphaned analyses: {_format_ids(claimed)}")
 
-  analyses_today_done = (
-    db.query(Analysis)
-    .filter(Analysis.user_id == current_user.id)
-    .filter(Analysis.status == "done")
-    .filter(Analysis.created_at >= datetime(today.year, today.month, today.day))
-    .count()
-  )
 
-  today_used = analyses_today_done
-  today_remaining = today_base_quota + today_extra_quota - today_used
+async def _reserve_analysis_quota(db: AsyncSession, user: User) -> None:
+  """
+  Atomically take one analysis from today's quota, or raise 400.
 
-  if today_remaining <= 0:
+  The reservation is committed together with the Analysis row in
+  _enqueue_analysis, so concurrent submissions cannot overshoot.
+  """
+  today_base_quota = 5
+  today_extra_quota = invite_bonus(user.invite_count, cap=10)
+
+  if not await reserve_analysis_async(db, user.id, limit=today_base_quota + today_extra_quota):
+    await db.rollback()
     raise HTTPException(
       status_code=status.HTTP_400_BAD_REQUEST,
       detail="今日测算次数已用完，请明天再试或通过邀请获得更多次数。",
     )
 
+
+async def _enqueue_analysis(
+  db: AsyncSession,
+  user: User,
+  analysis_input: schemas.AnalysisInput,
+  background_tasks: BackgroundTasks,
+) -> Analysis:
+  """
+  Persist a pending Analysis row and schedule the LLM background task.
+  """
+  if not analysis_runner.accepting:
+    await db.rollback()
+    raise HTTPException(
+      status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+      detail="服务正在重启，请稍后重试。",
+      headers={"Retry-After": str(settings.shutdown_drain_seconds)},
+    )
+
   analysis = Analysis(
-    user_id=current_user.id,
-    input_json=payload.model_dump(),
+    user_id=user.id,
+    input_json=analysis_input.model_dump(),
     status="pending",
     created_at=datetime.utcnow(),
   )
   db.add(analysis)
-  db.commit()
-  db.refresh(analysis)
+  await db.commit()
+
+  ANALYSES_CREATED.inc()
+  ANALYSIS_QUEUE_DEPTH.inc()
+  background_tasks.add_task(_run_analysis_job, analysis.id)
+  return analysis
+
 
-  background_tasks.add_task(_run_analysis_background, analysis.id)
+def _analysis_input_from_bazi(payload: schemas.BaziUserInput, bazi: schemas.BaziResult) -> schemas.AnalysisInput:
+  """
+  Build the LLM-facing AnalysisInput from a server-side BaZi calculation.
+
+  与前端此前在 ProfilePage 中的拼装逻辑保持一致：四柱取天干+地支，
+  出生年份取自 birthDate，第一步大运取 daYun[0]。
+  """
+  try:
+    birth_year = int(payload.birthDate.split("-")[0])
+  except (ValueError, IndexError):
+    birth_year = date.today().year
+
+  return schemas.AnalysisInput(
+    name=payload.name,
+    gender=payload.gender,
+    birth_year=birth_year,
+    year_pillar=f"{bazi.bazi.year.gan}{bazi.bazi.year.zhi}",
+    month_pillar=f"{bazi.bazi.month.gan}{bazi.bazi.month.zhi}",
+    day_pillar=f"{bazi.bazi.day.gan}{bazi.bazi.day.zhi}",
+    hour_pillar=f"{bazi.bazi.hour.gan}{bazi.bazi.hour.zhi}",
+    start_age=bazi.startAge,
+    first_da_yun=bazi.daYun[0] if bazi.daYun else "",
+    birthDate=payload.birthDate,
+    birthTime=payload.birthTime,
+    birthLocation=payload.birthLocation,
+  )
+
+
+@app.post("/analysis", response_model=schemas.AnalysisCreateResponse)
+async def create_analysis(
+  payload: schemas.AnalysisInput,
+  background_tasks: BackgroundTasks,
+  current_user: User = Depends(get_current_user_async),
+  db: AsyncSession = Depends(get_async_db),
+) -> schemas.AnalysisCreateResponse:
+  await _reserve_analysis_quota(db, current_user)
+
+  analysis = await _enqueue_analysis(db, current_user, payload, background_tasks)
 
   return schemas.AnalysisCreateResponse(id=analysis.id, status=analysis.status)
 
 
+@app.post("/analysis/from-profile", response_model=schemas.AnalysisFromProfileResponse)
+async def create_analysis_from_profile(
+  payload: schemas.BaziUserInput,
+  background_tasks: BackgroundTasks,
+  current_user: User = Depends(get_current_user_async),
+  db: AsyncSession = Depends(get_async_db),
+) -> schemas.AnalysisFromProfileResponse:
+  """
+  One-shot flow: calculate the BaZi chart server-side and enqueue the analysis.
+
+  等价于先调用 /bazi/calc 再调用 POST /analysis，但只需一次往返，
+  并且四柱 / 起运年龄 / 第一步大运完全由后端推导，避免前后端不一致。
+  排盘结果随响应一起返回，供 /bazi 预览页直接渲染。
+  """
+  # Lunar-calendar maths is CPU-bound; keep it off the event loop. It runs
+  # before the quota reservation so the write transaction (and SQLite's
+  # write lock) does not stay open across the threadpool hop, and an
+  # invalid profile never touches the usage row.
+  bazi = await run_in_threadpool(_calculate_bazi_result, payload)
+  await _reserve_analysis_quota(db, current_user)
+  analysis_input = _analysis_input_from_bazi(payload, bazi)
+  analysis = await _enqueue_analysis(db, current_user, analysis_input, background_tasks)
+
+  return schemas.AnalysisFromProfileResponse(id=analysis.id, status=analysis.status, bazi=bazi)
+
+
+def _analysis_detail(analysis: Analysis) -> dict:
+  """
+  Plain-dict form of schemas.AnalysisDetail.
+
+  output_json was already parsed and validated when the background task stored
+  it, so we skip a second pydantic pass over ~100 chartPoints and hand the dict
+  straight to the JSON encoder.
+  """
+  return {
+    "id": analysis.id,
+    "status": analysis.status,
+    "input": analysis.input_json or {},
+    "output": analysis.output_json,
+    "error_message": analysis.error_message,
+    "created_at": analysis.created_at,
+    "completed_at": analysis.completed_at,
+  }
+
+
+async def _get_owned_analysis(db: AsyncSession, analysis_id: int, user_id: int) -> Analysis:
+  # Load the compressed output in the same round trip (no lazy load on AsyncSession).
+  analysis = await db.get(Analysis, analysis_id, options=[joinedload(Analysis.output)])
+  if not analysis or analysis.user_id != user_id:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analysis not found")
+  return analysis
+
+
+async def _get_owned_analysis_head(db: AsyncSession, analysis_id: int, user_id: int):
+  """
+  Load only the small columns of an analysis (no input/output JSON).
+
+  Returns an ArchivedAnalysis stub when the analysis has been archived.
+  """
+  result = await db.execute(
+    select(Analysis.id, Analysis.user_id, Analysis.status, Analysis.created_at, Analysis.completed_at)
+    .where(Analysis.id == analysis_id)
+  )
+  head = result.first()
+  if head is None:
+    # Old analyses live in the cold archive; the stub has the same light columns.
+    head = await db.get(ArchivedAnalysis, analysis_id)
+  if not head or head.user_id != user_id:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analysis not found")
+  return head
+
+
+def _analysis_cache_headers(analysis) -> dict:
+  """
+  Conditional-GET headers for an analysis (ORM row or head projection).
+
+  A finished analysis never changes again, so it is cacheable for a year;
+  a pending one must be revalidated.
+  """
+  etag = make_etag("analysis", analysis.id, analysis.status, analysis.completed_at)
+  finished = analysis.status != "pending"
+  return cache_headers(
+    etag,
+    IMMUTABLE_CACHE_CONTROL if finished else REVALIDATE_CACHE_CONTROL,
+    last_modified=analysis.completed_at or analysis.created_at,
+  )
+
+
+async def _load_analysis_statuses(analysis_ids: list) -> dict:
+  """
+  Status-only lookup of every waited-on analysis, to notice changes
+  committed by other processes.
+  """
+  async with AsyncSessionLocal() as db:
+    rows = await db.execute(select(Analysis.id, Analysis.status).where(Analysis.id.in_(analysis_ids)))
+    return dict(rows.all())
+
+
+analysis_watcher = StatusWatcher(_load_analysis_statuses, settings.analysis_wait_recheck_seconds)
+
+
+async def _wait_for_analysis(analysis_id: int, known_status: str, timeout: float) -> Optional[str]:
+  return await wait_for_status_change(analysis_id, known_status, timeout=timeout, watcher=analysis_watcher)
+
+
 @app.get("/analysis/{analysis_id}", response_model=schemas.AnalysisDetail)
-def get_analysis(
+async def get_analysis(
   analysis_id: int,
-  current_user: User = Depends(get_current_user),
-  db: Session = Depends(get_db),
-) -> schemas.AnalysisDetail:
-  analysis = db.get(Analysis, analysis_id)
-  if not analysis or analysis.user_id != current_user.id:
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analysis not found")
+  request: Request,
+  wait: int = Query(default=0, ge=0, description="Long-poll: seconds to wait while the analysis is still pending"),
+  current_user: UserClaims = Depends(get_current_claims),
+  db: AsyncSession = Depends(get_async_db),
+):
+  """
+  Return one analysis.
 
-  return schemas.AnalysisDetail(
-    id=analysis.id,
-    status=analysis.status,
-    input=analysis.input_json or {},
-    output=analysis.output_json,
-    error_message=analysis.error_message,
-    created_at=analysis.created_at,
-    completed_at=analysis.completed_at,
+  With `?wait=N` and a pending analysis, the request is held until the status
+  changes (or N seconds pass), so the client gets one response per change
+  instead of polling every few seconds.
+
+  Supports If-None-Match / If-Modified-Since: the check runs against a
+  light projection, so a 304 never loads the compressed output.
+  """
+  head = await _get_owned_analysis_head(db, analysis_id, current_user.id)
+
+  if wait > 0 and head.status == "pending":
+    # Release the pooled connection while we sit idle.
+    await db.close()
+    timeout = min(wait, settings.analysis_wait_max_seconds)
+    if await _wait_for_analysis(analysis_id, "pending", timeout) is not None:
+      head = await _get_owned_analysis_head(db, analysis_id, current_user.id)
+
+  headers = _analysis_cache_headers(head)
+  if is_not_modified(request, headers["ETag"], head.completed_at or head.created_at):
+    return not_modified(headers)
+
+  if isinstance(head, ArchivedAnalysis):
+    record = await run_in_threadpool(read_archived_analysis, head)
+    if record is None:
+      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analysis not found")
+    return FastJSONResponse(record, headers=headers)
+
+  analysis = await _get_owned_analysis(db, analysis_id, current_user.id)
+  return FastJSONResponse(_analysis_detail(analysis), headers=_analysis_cache_headers(analysis))
+
+
+def _sse_event(event: str, data: dict) -> str:
+  return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/analysis/{analysis_id}/events", include_in_schema=False)
+async def stream_analysis_events(
+  analysis_id: int,
+  access_token: str = Query(..., description="Bearer token (EventSource cannot send headers)"),
+  db: AsyncSession = Depends(get_async_db),
+) -> StreamingResponse:
+  """
+  Server-Sent Events channel for one analysis.
+
+  Emits a `status` event with the current status, then (if still pending)
+  exactly one more `status` event when it changes, and closes. Comment lines
+  are sent periodically as keep-alive for proxies.
+  """
+  user = await get_claims_from_token(access_token)
+  head = await _get_owned_analysis_head(db, analysis_id, user.id)
+  initial_status = head.status
+  await db.close()
+
+  async def event_stream():
+    yield _sse_event("status", {"id": analysis_id, "status": initial_status})
+    if initial_status != "pending":
+      return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.analysis_wait_max_seconds
+    while loop.time() < deadline:
+      timeout = min(_SSE_KEEPALIVE_SECONDS, deadline - loop.time())
+      new_status = await _wait_for_analysis(analysis_id, initial_status, timeout)
+      if new_status is not None:
+        yield _sse_event("status", {"id": analysis_id, "status": new_status})
+        return
+      yield ": keep-alive\n\n"
+
+  return StreamingResponse(
+    event_stream(),
+    media_type="text/event-stream",
+    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
   )
 
 
@@ -378,55 +1038,49 @@ def get_analysis(
 # 1. 将 dist/assets 挂到 /assets，供静态资源访问；
 # 2. 为前端路由（/、/auth、/profile、/bazi/...、/result/...）提供统一的
 #    index.html 返回，让 React Router 负责前端路由解析。
-FRONTEND_DIST_DIR = Path(__file__).resolve().parent.parent / "frontend" / "dist"
+FRONTEND_ROOT_FILES = ("title.ttf", "content.ttf", "qrcode.jpg")
 
 
-def _read_frontend_index() -> str:
-  index_file = FRONTEND_DIST_DIR / "index.html"
-  try:
-    return index_file.read_text(encoding="utf-8")
-  except FileNotFoundError as exc:  # noqa: BLE001
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found") from exc
-
+static_assets: Optional[StaticAssets] = None
 
 if FRONTEND_DIST_DIR.exists():
-  assets_dir = FRONTEND_DIST_DIR / "assets"
-  if assets_dir.exists():
-    app.mount(
-      "/assets",
-      StaticFiles(directory=str(assets_dir)),
-      name="frontend-assets",
-    )
-
-  title_font = FRONTEND_DIST_DIR / "title.ttf"
-  content_font = FRONTEND_DIST_DIR / "content.ttf"
-  qrcode_image = FRONTEND_DIST_DIR / "qrcode.jpg"
-
-  if title_font.exists():
-    @app.get("/title.ttf", include_in_schema=False)
-    def serve_title_font() -> FileResponse:
-      return FileResponse(str(title_font), media_type="font/ttf")
-
-  if content_font.exists():
-    @app.get("/content.ttf", include_in_schema=False)
-    def serve_content_font() -> FileResponse:
-      return FileResponse(str(content_font), media_type="font/ttf")
-
-  if qrcode_image.exists():
-    @app.get("/qrcode.jpg", include_in_schema=False)
-    def serve_qrcode() -> FileResponse:
-      return FileResponse(str(qrcode_image), media_type="image/jpeg")
+  # Indexed in lifespan (precompressed by the build step / backend.serve),
+  # or lazily on first request.
+  static_assets = StaticAssets(FRONTEND_DIST_DIR)
+  frontend_index = SpaIndex(FRONTEND_DIST_DIR / "index.html")
+
+  def _serve_static(request: Request, rel_path: str) -> Response:
+    response = static_assets.response(request, rel_path)
+    if response is None:
+      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return response
+
+  @app.get("/assets/{path:path}", include_in_schema=False)
+  def serve_frontend_asset(path: str, request: Request) -> Response:
+    return _serve_static(request, f"assets/{path}")
+
+  def _root_file_endpoint(name: str):
+    def serve_root_file(request: Request) -> Response:
+      return _serve_static(request, name)
+    return serve_root_file
+
+  for _name in FRONTEND_ROOT_FILES:
+    if (FRONTEND_DIST_DIR / _name).is_file():
+      app.add_api_route(f"/{_name}", _root_file_endpoint(_name), methods=["GET"], include_in_schema=False)
 
   @app.get("/", include_in_schema=False)
   @app.get("/auth", include_in_schema=False)
   @app.get("/profile", include_in_schema=False)
   @app.get("/bazi/{path:path}", include_in_schema=False)
   @app.get("/result/{path:path}", include_in_schema=False)
-  def serve_frontend_app(path: str | None = None) -> HTMLResponse:
+  def serve_frontend_app(request: Request, path: str | None = None) -> Response:
     """
     Serve the SPA entrypoint for known frontend routes.
 
     注意：仅处理 GET 请求，后端 API 如 /auth/send-code 仍由上面的
     FastAPI 路由负责。
     """
-    return HTMLResponse(_read_frontend_index())
+    response = frontend_index.response(request)
+    if response is None:
+      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return response
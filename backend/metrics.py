@@ -0,0 +1,127 @@
+"""
+Prometheus metrics, exposed at GET /metrics.
+
+Instrumented:
+- HTTP: request latency per route template, method and status
+  (``MetricsMiddleware``; unmatched paths share one label value).
+- LLM: call latency and prompt / completion tokens per model.
+- Analyses: created / finished by status, and the number queued or running.
+- DB: statement count and duration per operation (SELECT / INSERT / ...),
+  for both the sync and the async engine (fed by backend/query_stats.py).
+- SMS: outbox outcomes, delivery latency and queue depth.
+- Caches: hits / misses per named TTLCache; rate-limit rejections.
+
+Multi-worker: ``backend.serve`` sets PROMETHEUS_MULTIPROC_DIR before the
+workers start, so every process writes its samples to mmap'd files there
+and whichever worker answers /metrics aggregates all of them (gauges are
+summed over live processes). With a single process the default in-memory
+registry is used.
+
+Label values are bounded (route templates, not raw paths), so cardinality
+stays fixed no matter what clients request.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_LLM_BUCKETS = (1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300)
+_DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+HTTP_REQUEST_SECONDS = Histogram(
+  "http_request_duration_seconds",
+  "Time until the response starts, per route template.",
+  ["method", "route", "status"],
+  buckets=_LATENCY_BUCKETS,
+)
+
+LLM_REQUEST_SECONDS = Histogram("llm_request_duration_seconds", "LLM completion latency.", ["model", "outcome"], buckets=_LLM_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the LLM API.", ["model", "kind"])
+
+ANALYSES_CREATED = Counter("analyses_created_total", "Analyses submitted.")
+ANALYSES_FINISHED = Counter("analyses_finished_total", "Analyses finished, by final status.", ["status"])
+ANALYSIS_QUEUE_DEPTH = Gauge("analysis_queue_depth", "Analyses queued or running in background tasks.", multiprocess_mode="livesum")
+
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "SQL statement duration.", ["operation"], buckets=_DB_BUCKETS)
+
+SMS_MESSAGES = Counter("sms_messages_total", "Verification SMS outcomes.", ["outcome"])
+SMS_DELIVERY_SECONDS = Histogram("sms_delivery_seconds", "Enqueue to provider-accepted latency.", buckets=_LATENCY_BUCKETS)
+SMS_QUEUE_DEPTH = Gauge("sms_queue_depth", "Verification SMS waiting in the outbox.", multiprocess_mode="livesum")
+
+CACHE_REQUESTS = Counter("cache_requests_total", "In-process cache lookups.", ["cache", "result"])
+RATE_LIMIT_REJECTIONS = Counter("rate_limit_rejections_total", "Requests rejected by a rate limit.", ["limit"])
+
+
+def multiprocess_enabled() -> bool:
+  return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+  """
+  Exposition payload and content type for GET /metrics.
+  """
+  if multiprocess_enabled():
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+  return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+  """
+  Drop this worker's live gauges (call on shutdown in multi-worker mode).
+  """
+  if multiprocess_enabled():
+    multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+  """
+  Record HTTP latency (until the response starts) per route template.
+
+  Measuring to the start message keeps SSE / long-poll streams from being
+  counted as one very slow request.
+  """
+
+  def __init__(self, app: ASGIApp) -> None:
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    started = time.perf_counter()
+    recorded = False
+
+    def record(status_code: int) -> None:
+      nonlocal recorded
+      recorded = True
+      route = scope.get("route")
+      if route is not None:
+        route_path = route.path
+      elif "endpoint" in scope:
+        # Plain Starlette routes (/docs, /openapi.json) have fixed paths.
+        route_path = scope["path"]
+      else:
+        route_path = "unmatched"
+      HTTP_REQUEST_SECONDS.labels(scope["method"], route_path, str(status_code)).observe(time.perf_counter() - started)
+
+    async def send_wrapper(message: Message) -> None:
+      if message["type"] == "http.response.start" and not recorded:
+        record(message["status"])
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      if not recorded:
+        record(500)
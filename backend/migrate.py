@@ -0,0 +1,86 @@
+"""
+Database schema migrations (Alembic).
+
+upgrade_database() brings the configured database to the latest revision.
+It replaces the old ``Base.metadata.create_all`` call, which could create
+missing tables but never add indexes or columns to an existing database.
+
+Databases created by create_all before migrations existed have tables but
+no ``alembic_version`` row; they are stamped at the initial revision first
+so only the newer revisions run against them.
+
+Command line (from the project root):
+
+  python -m backend.migrate                   # upgrade to head
+  python -m backend.migrate upgrade 0001      # upgrade to a revision
+  python -m backend.migrate downgrade 0001    # downgrade to a revision
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from .db import engine as default_engine
+
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+BASELINE_REVISION = "0001"
+
+
+def _alembic_config(connection) -> Config:
+  cfg = Config(str(ALEMBIC_INI))
+  cfg.attributes["connection"] = connection
+  # Keep the application's own logging configuration intact.
+  cfg.attributes["configure_logger"] = False
+  return cfg
+
+
+def head_revision() -> str:
+  return ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head()
+
+
+def current_revision(engine: Optional[Engine] = None) -> Optional[str]:
+  with (engine or default_engine).connect() as connection:
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def upgrade_database(revision: str = "head", engine: Optional[Engine] = None) -> None:
+  """
+  Upgrade the database schema to ``revision``.
+  """
+  engine = engine or default_engine
+  with engine.begin() as connection:
+    cfg = _alembic_config(connection)
+    existing_tables = set(inspect(connection).get_table_names())
+    has_version = MigrationContext.configure(connection).get_current_revision() is not None
+
+    if not has_version and "users" in existing_tables:
+      # Legacy database created by create_all: adopt it at the baseline.
+      print(f"[DB] Existing schema without migration history; stamping {BASELINE_REVISION}.")
+      command.stamp(cfg, BASELINE_REVISION)
+
+    command.upgrade(cfg, revision)
+
+
+def downgrade_database(revision: str, engine: Optional[Engine] = None) -> None:
+  with (engine or default_engine).begin() as connection:
+    command.downgrade(_alembic_config(connection), revision)
+
+
+if __name__ == "__main__":
+  action = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+  target = sys.argv[2] if len(sys.argv) > 2 else "head"
+  if action == "downgrade":
+    downgrade_database(target)
+  else:
+    upgrade_database(target)
+  print(f"[DB] Schema at revision {current_revision()}")
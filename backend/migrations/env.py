@@ -0,0 +1,64 @@
+"""
+Alembic environment.
+
+The connection is taken from ``config.attributes["connection"]`` when the
+app runs migrations programmatically (backend/migrate.py); otherwise the
+engine configured in backend.db is used.
+"""
+
+from __future__ import annotations
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from backend.db import Base, engine
+from backend import models  # noqa: F401  (register tables on Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+  fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def _configure(connection) -> None:
+  context.configure(
+    connection=connection,
+    target_metadata=target_metadata,
+    # SQLite cannot ALTER most things in place; batch mode recreates tables.
+    render_as_batch=connection.dialect.name == "sqlite",
+    compare_type=True,
+  )
+
+
+def run_migrations_offline() -> None:
+  context.configure(
+    url=str(engine.url),
+    target_metadata=target_metadata,
+    literal_binds=True,
+    dialect_opts={"paramstyle": "named"},
+  )
+  with context.begin_transaction():
+    context.run_migrations()
+
+
+def run_migrations_online() -> None:
+  connection = config.attributes.get("connection")
+  if connection is not None:
+    _configure(connection)
+    with context.begin_transaction():
+      context.run_migrations()
+    return
+
+  with engine.connect() as connection:
+    _configure(connection)
+    with context.begin_transaction():
+      context.run_migrations()
+
+
+if context.is_offline_mode():
+  run_migrations_offline()
+else:
+  run_migrations_online()
@@ -0,0 +1,71 @@
+"""initial schema (users, invites, analyses)
+
+Matches the tables previously created by ``Base.metadata.create_all``.
+Databases created that way are stamped at this revision by
+backend/migrate.py instead of being re-created.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  op.create_table(
+    "users",
+    sa.Column("id", sa.Integer(), primary_key=True),
+    sa.Column("phone", sa.String(length=32), nullable=False),
+    sa.Column("referral_code", sa.String(length=32), nullable=False),
+    sa.Column("inviter_code", sa.String(length=32), nullable=True),
+    sa.Column("created_at", sa.DateTime(), nullable=False),
+    sa.Column("last_login_at", sa.DateTime(), nullable=False),
+  )
+  op.create_index("ix_users_id", "users", ["id"])
+  op.create_index("ix_users_phone", "users", ["phone"], unique=True)
+  op.create_index("ix_users_referral_code", "users", ["referral_code"], unique=True)
+  op.create_index("ix_users_inviter_code", "users", ["inviter_code"])
+
+  op.create_table(
+    "invites",
+    sa.Column("id", sa.Integer(), primary_key=True),
+    sa.Column("inviter_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    sa.Column("invited_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    sa.Column("created_at", sa.DateTime(), nullable=False),
+  )
+  op.create_index("ix_invites_id", "invites", ["id"])
+
+  op.create_table(
+    "analyses",
+    sa.Column("id", sa.Integer(), primary_key=True),
+    sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    sa.Column("input_json", sa.JSON(), nullable=False),
+    sa.Column("output_json", sa.JSON(), nullable=True),
+    sa.Column("status", sa.String(length=20), nullable=False),
+    sa.Column("error_message", sa.String(length=512), nullable=True),
+    sa.Column("created_at", sa.DateTime(), nullable=False),
+    sa.Column("completed_at", sa.DateTime(), nullable=True),
+  )
+  op.create_index("ix_analyses_id", "analyses", ["id"])
+
+
+def downgrade() -> None:
+  op.drop_index("ix_analyses_id", table_name="analyses")
+  op.drop_table("analyses")
+  op.drop_index("ix_invites_id", table_name="invites")
+  op.drop_table("invites")
+  op.drop_index("ix_users_inviter_code", table_name="users")
+  op.drop_index("ix_users_referral_code", table_name="users")
+  op.drop_index("ix_users_phone", table_name="users")
+  op.drop_index("ix_users_id", table_name="users")
+  op.drop_table("users")
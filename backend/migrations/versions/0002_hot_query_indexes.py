@@ -0,0 +1,34 @@
+"""composite indexes for quota, history and invite queries
+
+- analyses (user_id, status, created_at): quota counts in /user/me and
+  POST /analysis, and status-filtered history.
+- analyses (user_id, created_at, id): /analysis/latest and the keyset
+  pagination of GET /analysis.
+- invites (inviter_user_id, created_at): total / today invite counts.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  op.create_index("ix_analyses_user_status_created", "analyses", ["user_id", "status", "created_at"], if_not_exists=True)
+  op.create_index("ix_analyses_user_created_id", "analyses", ["user_id", "created_at", "id"], if_not_exists=True)
+  op.create_index("ix_invites_inviter_created", "invites", ["inviter_user_id", "created_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+  op.drop_index("ix_invites_inviter_created", table_name="invites")
+  op.drop_index("ix_analyses_user_created_id", table_name="analyses")
+  op.drop_index("ix_analyses_user_status_created", table_name="analyses")
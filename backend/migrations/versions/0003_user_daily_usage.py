@@ -0,0 +1,93 @@
+"""materialized usage counters: user_daily_usage and users.invite_count
+
+Backfills users.invite_count from invites and the last two days of
+user_daily_usage from analyses / invites, so quotas stay correct across
+the deploy.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  op.create_table(
+    "user_daily_usage",
+    sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    sa.Column("day", sa.Date(), nullable=False),
+    sa.Column("analyses_reserved", sa.Integer(), server_default="0", nullable=False),
+    sa.Column("analyses_done", sa.Integer(), server_default="0", nullable=False),
+    sa.Column("analyses_failed", sa.Integer(), server_default="0", nullable=False),
+    sa.Column("invites", sa.Integer(), server_default="0", nullable=False),
+    sa.PrimaryKeyConstraint("user_id", "day"),
+  )
+  with op.batch_alter_table("users") as batch:
+    batch.add_column(sa.Column("invite_count", sa.Integer(), server_default="0", nullable=False))
+
+  bind = op.get_bind()
+  bind.execute(
+    sa.text(
+      "UPDATE users SET invite_count = "
+      "(SELECT count(*) FROM invites WHERE invites.inviter_user_id = users.id)"
+    )
+  )
+
+  since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+  counters = defaultdict(lambda: {"analyses_reserved": 0, "analyses_done": 0, "analyses_failed": 0, "invites": 0})
+
+  analyses = bind.execute(
+    sa.text("SELECT user_id, status, created_at FROM analyses WHERE created_at >= :since"),
+    {"since": since},
+  )
+  for user_id, status, created_at in analyses:
+    row = counters[(user_id, _as_date(created_at))]
+    row["analyses_reserved"] += 1
+    if status == "done":
+      row["analyses_done"] += 1
+    elif status == "error":
+      row["analyses_failed"] += 1
+
+  invites = bind.execute(
+    sa.text("SELECT inviter_user_id, created_at FROM invites WHERE created_at >= :since"),
+    {"since": since},
+  )
+  for user_id, created_at in invites:
+    counters[(user_id, _as_date(created_at))]["invites"] += 1
+
+  if counters:
+    usage = sa.table(
+      "user_daily_usage",
+      sa.column("user_id", sa.Integer),
+      sa.column("day", sa.Date),
+      sa.column("analyses_reserved", sa.Integer),
+      sa.column("analyses_done", sa.Integer),
+      sa.column("analyses_failed", sa.Integer),
+      sa.column("invites", sa.Integer),
+    )
+    op.bulk_insert(usage, [{"user_id": uid, "day": day, **values} for (uid, day), values in counters.items()])
+
+
+def _as_date(value):
+  if isinstance(value, str):
+    value = datetime.fromisoformat(value)
+  return value.date()
+
+
+def downgrade() -> None:
+  with op.batch_alter_table("users") as batch:
+    batch.drop_column("invite_count")
+  op.drop_table("user_daily_usage")
@@ -0,0 +1,111 @@
+"""move analysis output into a compressed side table
+
+analyses.output_json (the full LLM document) moves to analysis_outputs as
+gzip-compressed JSON; the scores used by history listings are copied into
+analyses.summary_json. Rows are converted in id-ordered batches so large
+tables never need to be held in memory.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+_BATCH_SIZE = 1000
+_SUMMARY_FIELDS = ("summaryScore", "industryScore", "wealthScore", "healthScore")
+
+_analyses = sa.table(
+  "analyses",
+  sa.column("id", sa.Integer),
+  sa.column("output_json", sa.JSON),
+  sa.column("summary_json", sa.JSON),
+)
+_outputs = sa.table(
+  "analysis_outputs",
+  sa.column("analysis_id", sa.Integer),
+  sa.column("codec", sa.String),
+  sa.column("data", sa.LargeBinary),
+  sa.column("raw_size", sa.Integer),
+)
+
+
+def _batches(bind, query):
+  last_id = 0
+  while True:
+    rows = bind.execute(query(last_id).limit(_BATCH_SIZE)).fetchall()
+    if not rows:
+      return
+    yield rows
+    last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+  op.create_table(
+    "analysis_outputs",
+    sa.Column("analysis_id", sa.Integer(), sa.ForeignKey("analyses.id"), primary_key=True),
+    sa.Column("codec", sa.String(16), nullable=False),
+    sa.Column("data", sa.LargeBinary(), nullable=False),
+    sa.Column("raw_size", sa.Integer(), nullable=False),
+  )
+  with op.batch_alter_table("analyses") as batch:
+    batch.add_column(sa.Column("summary_json", sa.JSON(), nullable=True))
+
+  bind = op.get_bind()
+  query = lambda last_id: (  # noqa: E731
+    sa.select(_analyses.c.id, _analyses.c.output_json)
+    .where(_analyses.c.id > last_id, _analyses.c.output_json.isnot(None))
+    .order_by(_analyses.c.id)
+  )
+  for rows in _batches(bind, query):
+    outputs, summaries = [], []
+    for analysis_id, document in rows:
+      if document is None:  # JSON 'null'
+        continue
+      raw = json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+      outputs.append({"analysis_id": analysis_id, "codec": "gzip", "data": gzip.compress(raw, compresslevel=6), "raw_size": len(raw)})
+      if isinstance(document, dict):
+        summaries.append({"_id": analysis_id, "summary": {f: document[f] for f in _SUMMARY_FIELDS if f in document}})
+    if outputs:
+      bind.execute(_outputs.insert(), outputs)
+    if summaries:
+      bind.execute(
+        _analyses.update().where(_analyses.c.id == sa.bindparam("_id")).values(summary_json=sa.bindparam("summary")),
+        summaries,
+      )
+
+  with op.batch_alter_table("analyses") as batch:
+    batch.drop_column("output_json")
+
+
+def downgrade() -> None:
+  with op.batch_alter_table("analyses") as batch:
+    batch.add_column(sa.Column("output_json", sa.JSON(), nullable=True))
+
+  bind = op.get_bind()
+  query = lambda last_id: (  # noqa: E731
+    sa.select(_outputs.c.analysis_id, _outputs.c.codec, _outputs.c.data)
+    .where(_outputs.c.analysis_id > last_id)
+    .order_by(_outputs.c.analysis_id)
+  )
+  for rows in _batches(bind, query):
+    bind.execute(
+      _analyses.update().where(_analyses.c.id == sa.bindparam("_id")).values(output_json=sa.bindparam("document")),
+      [{"_id": analysis_id, "document": json.loads(gzip.decompress(data))} for analysis_id, _codec, data in rows],
+    )
+
+  with op.batch_alter_table("analyses") as batch:
+    batch.drop_column("summary_json")
+  op.drop_table("analysis_outputs")
@@ -0,0 +1,39 @@
+"""cold archive: archived_analyses stub table and analyses.created_at index
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  op.create_table(
+    "archived_analyses",
+    sa.Column("id", sa.Integer(), primary_key=True),
+    sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    sa.Column("status", sa.String(20), nullable=False),
+    sa.Column("created_at", sa.DateTime(), nullable=False),
+    sa.Column("completed_at", sa.DateTime(), nullable=True),
+    sa.Column("partition", sa.String(64), nullable=False),
+    sa.Column("archived_at", sa.DateTime(), nullable=False),
+  )
+  op.create_index("ix_archived_analyses_user_id", "archived_analyses", ["user_id"])
+  # Lets the archiver find the oldest rows without scanning the table.
+  op.create_index("ix_analyses_created_at", "analyses", ["created_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+  op.drop_index("ix_analyses_created_at", table_name="analyses", if_exists=True)
+  op.drop_index("ix_archived_analyses_user_id", table_name="archived_analyses")
+  op.drop_table("archived_analyses")
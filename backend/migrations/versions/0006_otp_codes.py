@@ -0,0 +1,32 @@
+"""shared one-time login codes: otp_codes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  op.create_table(
+    "otp_codes",
+    sa.Column("phone", sa.String(32), primary_key=True),
+    sa.Column("code", sa.String(16), nullable=False),
+    sa.Column("expires_at", sa.DateTime(), nullable=False),
+  )
+  op.create_index("ix_otp_codes_expires_at", "otp_codes", ["expires_at"])
+
+
+def downgrade() -> None:
+  op.drop_index("ix_otp_codes_expires_at", table_name="otp_codes")
+  op.drop_table("otp_codes")
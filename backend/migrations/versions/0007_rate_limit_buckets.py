@@ -0,0 +1,30 @@
+"""shared token buckets for login rate limiting: rate_limit_buckets
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  op.create_table(
+    "rate_limit_buckets",
+    sa.Column("bucket_key", sa.String(128), primary_key=True),
+    sa.Column("tokens", sa.Float(), nullable=False),
+    sa.Column("updated_at", sa.Float(), nullable=False),
+  )
+
+
+def downgrade() -> None:
+  op.drop_table("rate_limit_buckets")
@@ -0,0 +1,29 @@
+"""graceful shutdown: analyses.requeued_at marks analyses handed back to the queue
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  with op.batch_alter_table("analyses") as batch:
+    batch.add_column(sa.Column("requeued_at", sa.DateTime(), nullable=True))
+  op.create_index("ix_analyses_requeued_at", "analyses", ["requeued_at"])
+
+
+def downgrade() -> None:
+  op.drop_index("ix_analyses_requeued_at", table_name="analyses")
+  with op.batch_alter_table("analyses") as batch:
+    batch.drop_column("requeued_at")
@@ -0,0 +1,44 @@
+"""sqlite: never reuse analyses ids (AUTOINCREMENT)
+
+Without AUTOINCREMENT SQLite hands out max(id) + 1, so once the newest
+analysis is archived its id comes back for the next insert and collides
+with the archived_analyses stub. PostgreSQL sequences never go back, so
+only SQLite needs the table rebuilt.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  bind = op.get_bind()
+  if bind.dialect.name != "sqlite":
+    return
+  with op.batch_alter_table("analyses", recreate="always", table_kwargs={"sqlite_autoincrement": True}):
+    pass
+  # Start past every id ever handed out, archived ones included.
+  top = bind.execute(
+    sa.text("SELECT max(id) FROM (SELECT max(id) AS id FROM analyses UNION ALL SELECT max(id) FROM archived_analyses)")
+  ).scalar()
+  if top:
+    bind.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = 'analyses'"))
+    bind.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('analyses', :seq)"), {"seq": top})
+
+
+def downgrade() -> None:
+  if op.get_bind().dialect.name != "sqlite":
+    return
+  with op.batch_alter_table("analyses", recreate="always"):
+    pass
@@ -0,0 +1,29 @@
+"""crash recovery: analyses.heartbeat_at, refreshed by the worker running an analysis
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+  with op.batch_alter_table("analyses") as batch:
+    batch.add_column(sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+  op.create_index("ix_analyses_status_heartbeat", "analyses", ["status", "heartbeat_at"])
+
+
+def downgrade() -> None:
+  op.drop_index("ix_analyses_status_heartbeat", table_name="analyses")
+  with op.batch_alter_table("analyses") as batch:
+    batch.drop_column("heartbeat_at")
@@ -1,8 +1,9 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, ForeignKey, JSON, Index, LargeBinary, PrimaryKeyConstraint
 from sqlalchemy.orm import relationship
 
+from .analysis_store import decode_document, encode_document, summarize
 from .db import Base
 
 
@@ -15,6 +16,9 @@ class User(Base):
   inviter_code = Column(String(32), index=True, nullable=True)
   created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
   last_login_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+  # Materialized count of Invite rows where this user is the inviter
+  # (maintained by backend.usage.record_invite).
+  invite_count = Column(Integer, default=0, server_default="0", nullable=False)
 
   invites = relationship(
     "Invite",
@@ -47,6 +51,11 @@ class Invite(Base):
   inviter = relationship("User", foreign_keys=[inviter_user_id], back_populates="invites")
   invited = relationship("User", foreign_keys=[invited_user_id], back_populates="invited_by")
 
+  # Keep in sync with backend/migrations (revision 0002).
+  __table_args__ = (
+    Index("ix_invites_inviter_created", "inviter_user_id", "created_at"),
+  )
+
 
 class Analysis(Base):
   __tablename__ = "analyses"
@@ -55,12 +64,143 @@ class Analysis(Base):
   user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
   input_json = Column(JSON, nullable=False)
-  output_json = Column(JSON, nullable=True)
+  # Scores copied out of the LLM output for listings; the full document lives
+  # in AnalysisOutput and is only loaded on demand (see analysis_store.py).
+  summary_json = Column(JSON, nullable=True)
 
   status = Column(String(20), nullable=False, default="pending")
   error_message = Column(String(512), nullable=True)
 
   created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
   completed_at = Column(DateTime, nullable=True)
+  # Set when a shutting-down worker hands a pending analysis back to the
+  # queue; cleared by the worker that claims it (backend/analysis_jobs.py).
+  requeued_at = Column(DateTime, nullable=True)
+  # Refreshed while a live worker has the analysis queued or running; a
+  # pending row whose heartbeat went stale lost its worker to a crash.
+  heartbeat_at = Column(DateTime, nullable=True)
 
   user = relationship("User", back_populates="analyses")
+  output = relationship(
+    "AnalysisOutput",
+    back_populates="analysis",
+    uselist=False,
+    cascade="all, delete-orphan",
+  )
+
+  # Keep in sync with backend/migrations (revisions 0002, 0005, 0008, 0009, 0010).
+  # AUTOINCREMENT on SQLite: ids of archived analyses must never come back.
+  __table_args__ = (
+    Index("ix_analyses_user_status_created", "user_id", "status", "created_at"),
+    Index("ix_analyses_user_created_id", "user_id", "created_at", "id"),
+    Index("ix_analyses_created_at", "created_at"),
+    Index("ix_analyses_requeued_at", "requeued_at"),
+    Index("ix_analyses_status_heartbeat", "status", "heartbeat_at"),
+    {"sqlite_autoincrement": True},
+  )
+
+  @property
+  def output_json(self):
+    """
+    The decoded LLM document (lazy-loads ``output`` on first access).
+    """
+    if self.output is None:
+      return None
+    return decode_document(self.output.codec, self.output.data)
+
+  @output_json.setter
+  def output_json(self, document) -> None:
+    if document is None:
+      self.output = None
+      self.summary_json = None
+      return
+    codec, data, raw_size = encode_document(document)
+    if self.output is None:
+      self.output = AnalysisOutput(codec=codec, data=data, raw_size=raw_size)
+    else:
+      self.output.codec, self.output.data, self.output.raw_size = codec, data, raw_size
+    self.summary_json = summarize(document)
+
+
+class AnalysisOutput(Base):
+  """
+  Compressed LLM output of an Analysis, stored apart from the hot row.
+  """
+
+  __tablename__ = "analysis_outputs"
+
+  analysis_id = Column(Integer, ForeignKey("analyses.id"), primary_key=True)
+  codec = Column(String(16), nullable=False)
+  data = Column(LargeBinary, nullable=False)
+  # Uncompressed size in bytes, kept for storage statistics.
+  raw_size = Column(Integer, nullable=False)
+
+  analysis = relationship("Analysis", back_populates="output")
+
+
+class ArchivedAnalysis(Base):
+  """
+  Lookup stub for an analysis moved to the cold archive (backend/archive.py).
+
+  Mirrors the light columns of Analysis so conditional GETs work unchanged;
+  ``partition`` is the archive file (relative to archive_dir) holding the
+  full record.
+  """
+
+  __tablename__ = "archived_analyses"
+
+  id = Column(Integer, primary_key=True)
+  user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+  status = Column(String(20), nullable=False)
+  created_at = Column(DateTime, nullable=False)
+  completed_at = Column(DateTime, nullable=True)
+  partition = Column(String(64), nullable=False)
+  archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class OtpCode(Base):
+  """
+  Shared one-time login codes (used when otp_store = "database").
+  """
+
+  __tablename__ = "otp_codes"
+
+  phone = Column(String(32), primary_key=True)
+  code = Column(String(16), nullable=False)
+  expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class RateLimitBucket(Base):
+  """
+  Shared token buckets (used when rate_limit_backend = "database").
+  """
+
+  __tablename__ = "rate_limit_buckets"
+
+  bucket_key = Column(String(128), primary_key=True)
+  tokens = Column(Float, nullable=False)
+  # Unix timestamp (seconds) of the last refill.
+  updated_at = Column(Float, nullable=False)
+
+
+class UserDailyUsage(Base):
+  """
+  Per-user, per-day (UTC) counters backing quota checks and /user/me.
+
+  analyses_reserved is incremented atomically when an analysis is accepted;
+  a failed analysis is refunded via analyses_failed, so the quota consumed
+  on a day is ``analyses_reserved - analyses_failed`` (pending jobs count).
+  """
+
+  __tablename__ = "user_daily_usage"
+
+  user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+  day = Column(Date, nullable=False)
+  analyses_reserved = Column(Integer, default=0, server_default="0", nullable=False)
+  analyses_done = Column(Integer, default=0, server_default="0", nullable=False)
+  analyses_failed = Column(Integer, default=0, server_default="0", nullable=False)
+  invites = Column(Integer, default=0, server_default="0", nullable=False)
+
+  __table_args__ = (
+    PrimaryKeyConstraint("user_id", "day"),
+  )
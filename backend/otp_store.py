@@ -0,0 +1,185 @@
+"""
+Storage for one-time login codes.
+
+``OTPStore`` is the interface used by auth.generate_otp / verify_otp:
+
+- ``MemoryOTPStore``: per-process, TTL-checked and bounded (oldest entries
+  are evicted beyond ``otp_max_entries``). Fine for a single worker.
+- ``DatabaseOTPStore``: the ``otp_codes`` table, shared by every worker,
+  so send-code and verify-code may land on different processes.
+
+Verification consumes the code: the matching entry is removed in the same
+atomic step (lock / conditional DELETE), so one code can log in only once.
+Given the request's session, ``DatabaseOTPStore.consume`` deletes inside
+that transaction: a second connection would wait on the SQLite write lock
+the session already holds, and a rolled-back request keeps its code.
+``check`` validates without consuming, so /auth/verify-code can reject a
+bad invite code and let the user retry with the same SMS code.
+Expired entries are also removed by ``purge_expired``, which the API runs
+periodically (otp_cleanup_interval_seconds).
+
+选择实现：APP_OTP_STORE=memory（默认）或 database。
+"""
+
+from __future__ import annotations
+
+import secrets
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .config import Settings
+from .models import OtpCode
+
+
+class OTPStore(ABC):
+  @abstractmethod
+  def put(self, phone: str, code: str, expires_at: datetime) -> None:
+    ...
+
+  @abstractmethod
+  def check(self, phone: str, code: str) -> bool:
+    """
+    Return True if ``code`` is currently valid for ``phone``, without consuming it.
+    """
+
+  @abstractmethod
+  def consume(self, phone: str, code: str, db: Optional[Session] = None) -> bool:
+    """
+    Return True and delete the entry if ``code`` is valid for ``phone``.
+
+    With ``db``, stores backed by the database delete within its transaction
+    (committed or rolled back by the caller).
+    """
+
+  @abstractmethod
+  def purge_expired(self) -> int:
+    ...
+
+  @abstractmethod
+  def snapshot(self) -> Dict[str, Tuple[str, datetime]]:
+    ...
+
+
+class MemoryOTPStore(OTPStore):
+  def __init__(self, max_entries: int) -> None:
+    self.max_entries = max_entries
+    self._lock = threading.Lock()
+    self._codes: "OrderedDict[str, Tuple[str, datetime]]" = OrderedDict()
+
+  def put(self, phone: str, code: str, expires_at: datetime) -> None:
+    with self._lock:
+      self._codes[phone] = (code, expires_at)
+      self._codes.move_to_end(phone)
+      while len(self._codes) > self.max_entries:
+        self._codes.popitem(last=False)
+
+  def check(self, phone: str, code: str) -> bool:
+    with self._lock:
+      stored = self._codes.get(phone)
+    if not stored:
+      return False
+    real_code, expires_at = stored
+    return datetime.utcnow() <= expires_at and secrets.compare_digest(real_code, code)
+
+  def consume(self, phone: str, code: str, db: Optional[Session] = None) -> bool:
+    with self._lock:
+      stored = self._codes.get(phone)
+      if not stored:
+        return False
+      real_code, expires_at = stored
+      if datetime.utcnow() > expires_at:
+        del self._codes[phone]
+        return False
+      if not secrets.compare_digest(real_code, code):
+        return False
+      del self._codes[phone]
+      return True
+
+  def purge_expired(self) -> int:
+    now = datetime.utcnow()
+    with self._lock:
+      expired = [phone for phone, (_, expires_at) in self._codes.items() if expires_at < now]
+      for phone in expired:
+        del self._codes[phone]
+    return len(expired)
+
+  def snapshot(self) -> Dict[str, Tuple[str, datetime]]:
+    with self._lock:
+      return dict(self._codes)
+
+
+class DatabaseOTPStore(OTPStore):
+  def __init__(self, engine: Engine) -> None:
+    self.engine = engine
+
+  def _upsert_stmt(self, values: dict):
+    dialect = self.engine.dialect.name
+    if dialect == "sqlite":
+      from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+      from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+      return None
+    stmt = dialect_insert(OtpCode).values(**values)
+    return stmt.on_conflict_do_update(
+      index_elements=["phone"],
+      set_={"code": stmt.excluded.code, "expires_at": stmt.excluded.expires_at},
+    )
+
+  def put(self, phone: str, code: str, expires_at: datetime) -> None:
+    values = {"phone": phone, "code": code, "expires_at": expires_at}
+    stmt = self._upsert_stmt(values)
+    with self.engine.begin() as conn:
+      if stmt is None:
+        conn.execute(delete(OtpCode).where(OtpCode.phone == phone))
+        stmt = OtpCode.__table__.insert().values(**values)
+      conn.execute(stmt)
+
+  def check(self, phone: str, code: str) -> bool:
+    with self.engine.connect() as conn:
+      found = conn.execute(
+        select(OtpCode.phone).where(
+          OtpCode.phone == phone,
+          OtpCode.code == code,
+          OtpCode.expires_at >= datetime.utcnow(),
+        )
+      ).first()
+    return found is not None
+
+  def consume(self, phone: str, code: str, db: Optional[Session] = None) -> bool:
+    # A single conditional DELETE: of two concurrent verifications with the
+    # same code, exactly one sees rowcount == 1.
+    stmt = delete(OtpCode).where(
+      OtpCode.phone == phone,
+      OtpCode.code == code,
+      OtpCode.expires_at >= datetime.utcnow(),
+    )
+    if db is not None:
+      return db.execute(stmt).rowcount == 1
+    with self.engine.begin() as conn:
+      result = conn.execute(stmt)
+    return result.rowcount == 1
+
+  def purge_expired(self) -> int:
+    with self.engine.begin() as conn:
+      return conn.execute(delete(OtpCode).where(OtpCode.expires_at < datetime.utcnow())).rowcount
+
+  def snapshot(self) -> Dict[str, Tuple[str, datetime]]:
+    with self.engine.connect() as conn:
+      rows = conn.execute(select(OtpCode.phone, OtpCode.code, OtpCode.expires_at)).all()
+    return {phone: (code, expires_at) for phone, code, expires_at in rows}
+
+
+def build_otp_store(settings: Settings, engine: Engine) -> OTPStore:
+  if settings.otp_store == "database":
+    return DatabaseOTPStore(engine)
+  if settings.otp_store != "memory":
+    raise RuntimeError(f"Unknown otp_store: {settings.otp_store}")
+  return MemoryOTPStore(settings.otp_max_entries)
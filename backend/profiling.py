@@ -0,0 +1,188 @@
+"""
+On-demand request profiling.
+
+``ProfilingMiddleware`` profiles a request when it opts in (admin header /
+query flag carrying profiling_token) or is picked by sampling
+(profiling_sample_every). Requests that are not picked skip straight to the
+app; when neither trigger is configured, main.py does not install the
+middleware, so there is no per-request cost at all.
+
+The profiler is a stack sampler rather than cProfile: sync endpoints run
+in threadpool threads that cProfile (per-thread) would not see. A helper
+thread reads ``sys._current_frames()`` every profiling_interval_ms while the
+request is in flight and counts the stacks of every other thread. The
+output is the "folded" format (``frame;frame;frame count`` per line), which
+speedscope / flamegraph.pl / inferno open directly. Concurrent requests
+and busy background threads appear in the same profile; profile on a
+quiet instance or filter by thread name (first frame).
+
+``ProfileStore`` keeps the newest profiling_max_files profiles on disk;
+/debug/profiles lists them and /debug/profiles/{name} downloads one.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "__profile"
+# Long-lived responses (SSE) stop being sampled after this long.
+MAX_PROFILE_SECONDS = 30.0
+
+_NAME_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9]{6}-[A-Za-z0-9_.-]+\.folded$")
+# Threads parked here are idle, not doing work for the request.
+_IDLE_LEAVES = {("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get")}
+
+
+class StackSampler:
+  def __init__(self, interval_seconds: float, max_seconds: float = MAX_PROFILE_SECONDS) -> None:
+    self.interval_seconds = interval_seconds
+    self.max_seconds = max_seconds
+    self.stacks: Counter = Counter()
+    self.samples = 0
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+  def start(self) -> None:
+    self._thread.start()
+
+  def stop(self) -> None:
+    self._stop.set()
+    self._thread.join()
+
+  def _run(self) -> None:
+    me = threading.get_ident()
+    deadline = time.monotonic() + self.max_seconds
+    while not self._stop.wait(self.interval_seconds) and time.monotonic() < deadline:
+      names = {thread.ident: thread.name for thread in threading.enumerate()}
+      for ident, frame in sys._current_frames().items():
+        if ident == me:
+          continue
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+          continue
+        stack: List[str] = []
+        while frame is not None:
+          code = frame.f_code
+          stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+          frame = frame.f_back
+        stack.append(names.get(ident, str(ident)))
+        self.stacks[";".join(reversed(stack))] += 1
+      self.samples += 1
+
+  def folded(self) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+  """
+  Bounded on-disk ring of profiles (oldest files are deleted first).
+  """
+
+  def __init__(self, directory: str, max_files: int) -> None:
+    self.directory = Path(directory)
+    self.max_files = max_files
+    self._lock = threading.Lock()
+
+  def save(self, method: str, path: str, status_code: int, duration: float, content: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+    now = time.time()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"-{int(now * 1e6) % 1_000_000:06d}"
+    name = f"{stamp}-{method}-{slug}-{status_code}-{duration * 1000:.0f}ms.folded"
+    with self._lock:
+      self.directory.mkdir(parents=True, exist_ok=True)
+      (self.directory / name).write_text(content, encoding="utf-8")
+      names = self._names()
+      for old in names[: max(0, len(names) - max(1, self.max_files))]:
+        (self.directory / old).unlink(missing_ok=True)
+    return name
+
+  def _names(self) -> List[str]:
+    if not self.directory.exists():
+      return []
+    return sorted(p.name for p in self.directory.iterdir() if _NAME_RE.match(p.name))
+
+  def list(self) -> List[Dict[str, object]]:
+    """
+    Newest first: name, size in bytes and creation time (unix seconds).
+    """
+    items = []
+    for name in reversed(self._names()):
+      stat = (self.directory / name).stat()
+      items.append({"name": name, "size": stat.st_size, "createdAt": stat.st_mtime})
+    return items
+
+  def path(self, name: str) -> Optional[Path]:
+    if not _NAME_RE.match(name):
+      return None
+    path = self.directory / name
+    return path if path.is_file() else None
+
+
+class ProfilingMiddleware:
+  def __init__(
+    self,
+    app: ASGIApp,
+    store: ProfileStore,
+    token: str = "",
+    sample_every: int = 0,
+    interval_ms: int = 5,
+  ) -> None:
+    self.app = app
+    self.store = store
+    self.token = token
+    self.sample_every = sample_every
+    self.interval_seconds = interval_ms / 1000
+
+  def _selected(self, scope: Scope) -> bool:
+    if self.token:
+      if Headers(scope=scope).get(PROFILE_HEADER) == self.token:
+        return True
+      query = scope.get("query_string", b"")
+      if PROFILE_QUERY_PARAM.encode() in query:
+        if parse_qs(query.decode("latin-1")).get(PROFILE_QUERY_PARAM, [""])[0] == self.token:
+          return True
+    return self.sample_every > 0 and random.randrange(self.sample_every) == 0
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http" or not self._selected(scope):
+      await self.app(scope, receive, send)
+      return
+
+    status_code = 500
+
+    async def send_wrapper(message: Message) -> None:
+      nonlocal status_code
+      if message["type"] == "http.response.start":
+        status_code = message["status"]
+      await send(message)
+
+    sampler = StackSampler(self.interval_seconds)
+    started = time.perf_counter()
+    sampler.start()
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      sampler.stop()
+      duration = time.perf_counter() - started
+      try:
+        name = await run_in_threadpool(
+          self.store.save, scope["method"], scope["path"], status_code, duration, sampler.folded()
+        )
+        print(f"[PROFILE] {scope['method']} {scope['path']} {duration * 1000:.0f} ms, {sampler.samples} samples -> {name}")
+      except OSError as exc:
+        print(f"[PROFILE] Could not save profile: {exc}")
@@ -0,0 +1,165 @@
+"""
+SQL statement accounting: per request, per test block and slow-query log.
+
+``instrument_engine`` hooks before/after_cursor_execute on an engine (the
+sync one and ``async_engine.sync_engine``) and, for every statement:
+
+- feeds the db_query_duration_seconds histogram (backend/metrics.py);
+- adds it to the current request's ``QueryStats`` (a ContextVar set by
+  ``QueryStatsMiddleware``; threadpool calls and async sessions inherit it);
+- adds it to any ``assert_max_queries`` block that is open;
+- logs it if it took at least slow_query_ms, with parameter values redacted
+  to their types (phone numbers, codes and tokens never reach the log).
+
+``QueryStatsMiddleware`` adds ``Server-Timing: db;dur=..;desc="N queries"``
+in debug mode and warns when one request runs the same statement
+query_repeat_warn times or more, the usual sign of an N+1 lazy load.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import DB_QUERY_SECONDS
+
+
+@dataclass
+class QueryStats:
+  count: int = 0
+  seconds: float = 0.0
+  statements: Counter = field(default_factory=Counter)
+
+  def record(self, statement: str, elapsed: float) -> None:
+    self.count += 1
+    self.seconds += elapsed
+    self.statements[statement] += 1
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Open assert_max_queries blocks; they see statements from every thread.
+_observers: List[QueryStats] = []
+
+
+def _operation(statement: str) -> str:
+  word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+  return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA") else "OTHER"
+
+
+def redact_parameters(parameters: Any) -> str:
+  """
+  Describe bound parameters by type only, e.g. ``{'phone': 'str'}``.
+  """
+  if isinstance(parameters, dict):
+    return repr({key: type(value).__name__ for key, value in parameters.items()})
+  if isinstance(parameters, (list, tuple)):
+    if parameters and isinstance(parameters[0], (dict, list, tuple)):
+      return f"<{len(parameters)} parameter sets>"
+    return repr([type(value).__name__ for value in parameters])
+  return type(parameters).__name__
+
+
+def _one_line(statement: str, limit: int = 300) -> str:
+  text = " ".join(statement.split())
+  return text if len(text) <= limit else text[:limit] + "..."
+
+
+def instrument_engine(engine: Engine, slow_query_ms: int = 0) -> None:
+  """
+  Time every statement executed on ``engine`` (pass ``.sync_engine`` for async engines).
+  """
+  children = {}
+
+  @event.listens_for(engine, "before_cursor_execute")
+  def _before(conn, cursor, statement, parameters, context, executemany) -> None:  # noqa: ANN001
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+  @event.listens_for(engine, "after_cursor_execute")
+  def _after(conn, cursor, statement, parameters, context, executemany) -> None:  # noqa: ANN001
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+
+    operation = _operation(statement)
+    child = children.get(operation)
+    if child is None:
+      child = children[operation] = DB_QUERY_SECONDS.labels(operation)
+    child.observe(elapsed)
+
+    stats = _current_stats.get()
+    if stats is not None:
+      stats.record(statement, elapsed)
+    for observer in _observers:
+      observer.record(statement, elapsed)
+
+    if slow_query_ms and elapsed * 1000 >= slow_query_ms:
+      print(
+        f"[DB] Slow query {elapsed * 1000:.0f} ms: {_one_line(statement)} "
+        f"params={redact_parameters(parameters)}"
+      )
+
+  @event.listens_for(engine, "handle_error")
+  def _error(context) -> None:  # noqa: ANN001
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+      starts.pop()
+
+
+class QueryStatsMiddleware:
+  def __init__(self, app: ASGIApp, server_timing: bool = False, repeat_warn: int = 0) -> None:
+    self.app = app
+    self.server_timing = server_timing
+    self.repeat_warn = repeat_warn
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+
+    async def send_wrapper(message: Message) -> None:
+      if message["type"] == "http.response.start" and self.server_timing:
+        headers = MutableHeaders(scope=message)
+        headers.append("Server-Timing", f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"')
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      _current_stats.reset(token)
+
+    if self.repeat_warn and stats.statements:
+      statement, times = stats.statements.most_common(1)[0]
+      if times >= self.repeat_warn:
+        print(
+          f"[DB] {scope['method']} {scope['path']} ran one statement {times} times "
+          f"({stats.count} queries in total), possible N+1: {_one_line(statement, 200)}"
+        )
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+  """
+  Fail if the block executes more than ``limit`` SQL statements.
+
+    with assert_max_queries(3):
+      client.get("/user/me", headers=auth)
+  """
+  stats = QueryStats()
+  _observers.append(stats)
+  try:
+    yield stats
+  finally:
+    _observers.remove(stats)
+  if stats.count > limit:
+    listing = "\n".join(f"  {times}x {_one_line(statement, 200)}" for statement, times in stats.statements.most_common())
+    raise AssertionError(f"Expected at most {limit} queries, got {stats.count}:\n{listing}")
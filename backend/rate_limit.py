@@ -0,0 +1,197 @@
+"""
+Token-bucket rate limiting for the login endpoints.
+
+Each limit is a bucket per key (phone number or client IP) holding up to
+``capacity`` tokens that refill continuously; a request takes one token or
+is rejected with 429 and a Retry-After hint. A bucket is two numbers
+(tokens, last update), so memory per key is O(1).
+
+Backends (APP_RATE_LIMIT_BACKEND):
+- memory (default): per-process dict, LRU-bounded to rate_limit_max_keys.
+- database: the rate_limit_buckets table, shared by every worker; each take
+  is one atomic upsert.
+
+A bucket that has refilled to capacity is indistinguishable from a missing
+one, so ``RateLimiter.purge_full_buckets`` deletes those (run periodically,
+see rate_limit_purge_interval_seconds); otherwise every phone number and IP
+ever seen keeps a row in rate_limit_buckets.
+
+Limits are configured as "<burst>/<seconds>" strings, e.g. "5/300" allows a
+burst of 5 and refills 5 tokens every 300 seconds. An empty string turns
+that limit off.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .config import Settings
+from .metrics import RATE_LIMIT_REJECTIONS
+
+
+@dataclass(frozen=True)
+class RateLimit:
+  capacity: float
+  refill_per_second: float
+
+  @classmethod
+  def parse(cls, spec: str) -> Optional["RateLimit"]:
+    if not spec:
+      return None
+    burst, _, seconds = spec.partition("/")
+    capacity = float(burst)
+    return cls(capacity=capacity, refill_per_second=capacity / float(seconds))
+
+  def retry_after(self, tokens: float) -> float:
+    return max(0.0, (1 - tokens) / self.refill_per_second)
+
+
+class MemoryTokenBuckets:
+  def __init__(self, max_keys: int) -> None:
+    self.max_keys = max_keys
+    self._lock = threading.Lock()
+    self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+  def take(self, key: str, limit: RateLimit, now: Optional[float] = None) -> float:
+    """
+    Take one token; returns 0 when allowed, else seconds until one is available.
+    """
+    now = time.monotonic() if now is None else now
+    with self._lock:
+      tokens, updated_at = self._buckets.get(key, (limit.capacity, now))
+      tokens = min(limit.capacity, tokens + (now - updated_at) * limit.refill_per_second)
+      allowed = tokens >= 1
+      if allowed:
+        tokens -= 1
+      self._buckets[key] = (tokens, now)
+      self._buckets.move_to_end(key)
+      if len(self._buckets) > self.max_keys:
+        # Evicting resets a bucket to full; the oldest ones are the most refilled anyway.
+        self._buckets.popitem(last=False)
+    return 0.0 if allowed else limit.retry_after(tokens)
+
+  def purge_full(self, prefix: str, limit: RateLimit, now: Optional[float] = None) -> int:
+    """
+    Drop the ``prefix`` buckets that have refilled to capacity; returns how many.
+    """
+    now = time.monotonic() if now is None else now
+    with self._lock:
+      full = [
+        key
+        for key, (tokens, updated_at) in self._buckets.items()
+        if key.startswith(prefix) and tokens + (now - updated_at) * limit.refill_per_second >= limit.capacity
+      ]
+      for key in full:
+        del self._buckets[key]
+    return len(full)
+
+
+# One statement per take: refill, check and decrement atomically. The
+# conflict branch only updates (and RETURNs a row) when a token is available.
+_TAKE_SQL = """
+INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at) VALUES (:key, :capacity - 1, :now)
+ON CONFLICT (bucket_key) DO UPDATE SET
+  tokens = {least}(:capacity, rate_limit_buckets.tokens + (:now - rate_limit_buckets.updated_at) * :rate) - 1,
+  updated_at = :now
+WHERE {least}(:capacity, rate_limit_buckets.tokens + (:now - rate_limit_buckets.updated_at) * :rate) >= 1
+RETURNING tokens
+"""
+
+
+_PURGE_SQL = text(
+  "DELETE FROM rate_limit_buckets WHERE substr(bucket_key, 1, :length) = :prefix "
+  "AND tokens + (:now - updated_at) * :rate >= :capacity"
+)
+
+
+class DatabaseTokenBuckets:
+  def __init__(self, engine: Engine) -> None:
+    self.engine = engine
+    least = "MIN" if engine.dialect.name == "sqlite" else "LEAST"
+    self._take_sql = text(_TAKE_SQL.format(least=least))
+
+  def take(self, key: str, limit: RateLimit, now: Optional[float] = None) -> float:
+    now = time.time() if now is None else now
+    params = {"key": key, "capacity": limit.capacity, "rate": limit.refill_per_second, "now": now}
+    with self.engine.begin() as conn:
+      if conn.execute(self._take_sql, params).first() is not None:
+        return 0.0
+      row = conn.execute(
+        text("SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = :key"), {"key": key}
+      ).first()
+    tokens = min(limit.capacity, row.tokens + (now - row.updated_at) * limit.refill_per_second) if row else 0.0
+    return limit.retry_after(tokens)
+
+  def purge_full(self, prefix: str, limit: RateLimit, now: Optional[float] = None) -> int:
+    now = time.time() if now is None else now
+    params = {
+      "prefix": prefix,
+      "length": len(prefix),
+      "capacity": limit.capacity,
+      "rate": limit.refill_per_second,
+      "now": now,
+    }
+    with self.engine.begin() as conn:
+      # substr rather than LIKE: limit names contain "_", a LIKE wildcard.
+      result = conn.execute(_PURGE_SQL, params)
+    return result.rowcount
+
+
+class RateLimiter:
+  """
+  Named limits over one bucket backend, with per-limit rejection counters.
+  """
+
+  def __init__(self, limits: Dict[str, Optional[RateLimit]], buckets) -> None:
+    self.limits = limits
+    self.buckets = buckets
+    self._stats_lock = threading.Lock()
+    self.rejections: Counter = Counter()
+
+  def check(self, name: str, key: str) -> float:
+    """
+    Returns 0 if the request may proceed, else the Retry-After in seconds.
+    """
+    limit = self.limits.get(name)
+    if limit is None:
+      return 0.0
+    retry_after = self.buckets.take(f"{name}:{key}", limit)
+    if retry_after:
+      with self._stats_lock:
+        self.rejections[name] += 1
+      RATE_LIMIT_REJECTIONS.labels(name).inc()
+      return max(1.0, math.ceil(retry_after))
+    return 0.0
+
+  def purge_full_buckets(self) -> int:
+    """
+    Delete buckets that have refilled to capacity, for every enabled limit.
+    """
+    purged = sum(
+      self.buckets.purge_full(f"{name}:", limit) for name, limit in self.limits.items() if limit is not None
+    )
+    if purged:
+      print(f"[RATE] Purged {purged} refilled rate-limit buckets")
+    return purged
+
+
+def build_rate_limiter(settings: Settings, engine: Engine) -> RateLimiter:
+  limits = {
+    "send_code_phone": RateLimit.parse(settings.rate_limit_send_code_phone),
+    "send_code_ip": RateLimit.parse(settings.rate_limit_send_code_ip),
+    "verify_code_phone": RateLimit.parse(settings.rate_limit_verify_code_phone),
+    "verify_code_ip": RateLimit.parse(settings.rate_limit_verify_code_ip),
+  }
+  if settings.rate_limit_backend == "database":
+    return RateLimiter(limits, DatabaseTokenBuckets(engine))
+  if settings.rate_limit_backend != "memory":
+    raise RuntimeError(f"Unknown rate_limit_backend: {settings.rate_limit_backend}")
+  return RateLimiter(limits, MemoryTokenBuckets(settings.rate_limit_max_keys))
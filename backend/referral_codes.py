@@ -0,0 +1,63 @@
+"""
+Referral code allocation for new users.
+
+Codes are 6 random characters from [A-Z0-9] (~2.2 billion values). Instead of
+a SELECT per candidate, uniqueness is left to the unique index on
+``users.referral_code``: the new user row is flushed with a fresh code and,
+on the (rare) IntegrityError, a new code is drawn and the insert retried.
+This also closes the race where two concurrent signups picked the same code
+after both SELECTs came back empty.
+
+Codes from the initial invite pool (backend/initial_invite_codes.csv) are
+never handed out; that set is loaded and uppercased once and cached.
+"""
+
+from __future__ import annotations
+
+import secrets
+import string
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .invite_codes import get_initial_invite_codes
+from .models import User
+
+
+REFERRAL_CODE_LENGTH = 6
+REFERRAL_CODE_ALPHABET = string.ascii_uppercase + string.digits
+# With ~1M users a single collision has a ~0.05% chance; 8 in a row means
+# something other than a code collision is failing.
+MAX_ALLOCATION_ATTEMPTS = 8
+
+
+def random_referral_code() -> str:
+  initial_codes = get_initial_invite_codes()
+  while True:
+    code = "".join(secrets.choice(REFERRAL_CODE_ALPHABET) for _ in range(REFERRAL_CODE_LENGTH))
+    # 确保不会与初始邀请码池发生冲突（与现有用户的冲突交给唯一索引）。
+    if code not in initial_codes:
+      return code
+
+
+def insert_user_with_referral_code(db: Session, user: User) -> None:
+  """
+  Assign ``user`` a unique referral code and flush it (user.id is set after).
+
+  The user row must be the first write of the current transaction: a code
+  collision rolls the transaction back before retrying. Re-raises the
+  IntegrityError when the row conflicts for another reason (e.g. the same
+  phone number signed up concurrently).
+  """
+  for attempt in range(MAX_ALLOCATION_ATTEMPTS):
+    user.referral_code = random_referral_code()
+    db.add(user)
+    try:
+      db.flush()
+      return
+    except IntegrityError:
+      db.rollback()
+      if attempt == MAX_ALLOCATION_ATTEMPTS - 1:
+        raise
+      if db.query(User.id).filter(User.phone == user.phone).first() is not None:
+        raise
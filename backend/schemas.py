@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -87,6 +87,33 @@ class AnalysisDetail(BaseModel):
   completed_at: Optional[datetime] = None
 
 
+class AnalysisSummary(BaseModel):
+  """
+  Light projection of an analysis for history listings.
+
+  Never includes the full LLM output; the headline scores come from
+  ``analyses.summary_json``, filled when the output is written
+  (backend/analysis_store.py).
+  """
+
+  id: int
+  status: str
+  created_at: datetime
+  completed_at: Optional[datetime] = None
+  name: Optional[str] = None
+  gender: Optional[str] = None
+  birthDate: Optional[str] = None
+  summaryScore: Optional[Union[int, float]] = None
+  industryScore: Optional[Union[int, float]] = None
+  wealthScore: Optional[Union[int, float]] = None
+  healthScore: Optional[Union[int, float]] = None
+
+
+class AnalysisListResponse(BaseModel):
+  items: List[AnalysisSummary]
+  next_cursor: Optional[str] = Field(default=None, description="Opaque cursor for the next page; null on the last page")
+
+
 class LatestAnalysisResponse(BaseModel):
   id: int
   status: str
@@ -136,3 +163,16 @@ class BaziResult(BaseModel):
   startAge: int
   direction: str
   daYun: List[str]
+
+
+class AnalysisFromProfileResponse(BaseModel):
+  """
+  Response of the one-shot POST /analysis/from-profile endpoint.
+
+  Carries the server-side BaZi chart so the preview page can render
+  immediately without calling /bazi/calc.
+  """
+
+  id: int
+  status: str
+  bazi: BaziResult
@@ -0,0 +1,106 @@
+"""
+Production launcher: run the API with several uvicorn worker processes.
+
+  python -m backend.serve                       # APP_WEB_WORKERS workers (default 1)
+  python -m backend.serve --workers 4 --port 8000
+
+Before forking, the launcher migrates the database once and tells the
+workers to skip their own startup migration. With more than one worker it
+also switches the OTP store and the login rate limiter to their shared
+database backends (unless set explicitly), because per-process state would
+make send-code / verify-code land on a worker that never saw the code.
+
+Metrics are aggregated across workers through PROMETHEUS_MULTIPROC_DIR
+(metrics_multiproc_dir, or a fresh temporary directory), which has to be
+set before any worker imports prometheus_client.
+
+Other cross-process concerns are handled where they live: analysis status
+waits re-check the database (events.py), the auth cache is TTL-bounded
+(auth.py), periodic jobs run in one elected worker (leader.py), and
+analyses still running at shutdown are handed off (analysis_jobs.py).
+
+The jobs election is a flock on a local file, so it picks one leader per
+host or container, not per deployment: with several replicas each one runs
+its own archive sweep, requeue pass and rate-limit purge.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+
+import uvicorn
+
+from .config import get_settings
+
+
+_SHARED_BACKENDS = {
+  "APP_OTP_STORE": "database",
+  "APP_RATE_LIMIT_BACKEND": "database",
+}
+
+
+def _use_shared_backends() -> None:
+  for env_name, shared in _SHARED_BACKENDS.items():
+    current = os.getenv(env_name)
+    if not current:
+      os.environ[env_name] = shared
+    elif current != shared:
+      print(f"[SERVE] Warning: {env_name}={current} is per-process; workers will not share it.")
+
+
+def _prepare_metrics_dir(configured: str) -> None:
+  if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    return
+  if configured:
+    # Samples from a previous run would be summed into the new counters.
+    shutil.rmtree(configured, ignore_errors=True)
+    os.makedirs(configured)
+    path = configured
+  else:
+    path = tempfile.mkdtemp(prefix="backend-metrics-")
+  os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
+def main() -> None:
+  settings = get_settings()
+  parser = argparse.ArgumentParser(description="Run the API with multiple worker processes.")
+  parser.add_argument("--host", default="0.0.0.0")
+  parser.add_argument("--port", type=int, default=8000)
+  parser.add_argument("--workers", type=int, default=settings.web_workers, help="0 = one per CPU core")
+  args = parser.parse_args()
+
+  workers = args.workers or os.cpu_count() or 1
+  if workers > 1:
+    _use_shared_backends()
+    _prepare_metrics_dir(settings.metrics_multiproc_dir)
+
+  # Precompress the front-end once here instead of in every worker at boot
+  # (a quick no-op when the image build step already did it).
+  from .static_files import FRONTEND_DIST_DIR, StaticAssets
+
+  if FRONTEND_DIST_DIR.exists():
+    print(f"[SERVE] Precompressed {StaticAssets(FRONTEND_DIST_DIR).scan(precompress=True)} frontend files")
+
+  # Migrate once here instead of once per worker.
+  from .migrate import current_revision, upgrade_database
+
+  upgrade_database()
+  print(f"[SERVE] Schema at revision {current_revision()}; starting {workers} workers")
+  os.environ["APP_RUN_MIGRATIONS_ON_STARTUP"] = "0"
+
+  uvicorn.run(
+    "backend.main:app",
+    host=args.host,
+    port=args.port,
+    workers=workers,
+    proxy_headers=True,
+    # Then the app's own drain of in-flight analyses (shutdown_drain_seconds).
+    timeout_graceful_shutdown=settings.shutdown_request_grace_seconds,
+  )
+
+
+if __name__ == "__main__":
+  main()
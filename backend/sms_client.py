@@ -9,6 +9,7 @@ mechanism in backend.auth continues工作正常。
 
 from __future__ import annotations
 
+import time
 from typing import Optional
 
 from .config import get_settings
@@ -16,32 +17,39 @@ from .config import get_settings
 settings = get_settings()
 
 
-try:
-  # Import Alibaba Cloud SDKs once at module import time.
-  from alibabacloud_dypnsapi20170525.client import (  # type: ignore[import]
-    Client as Dypnsapi20170525Client,
-  )
-  from alibabacloud_credentials.client import (  # type: ignore[import]
-    Client as CredentialClient,
-  )
-  from alibabacloud_tea_openapi import models as open_api_models  # type: ignore[import]
-  from alibabacloud_dypnsapi20170525 import (  # type: ignore[import]
-    models as dypnsapi_20170525_models,
-  )
-  from alibabacloud_tea_util import models as util_models  # type: ignore[import]
-except Exception as exc:  # noqa: BLE001
-  # SDK 未安装时，直接记录日志，后续调用会走本地 OTP，而不会中断登录流程。
-  print(f"[SMS] Alibaba Cloud SMS SDK not available during import: {exc}")
-  Dypnsapi20170525Client = None  # type: ignore[assignment]
-  CredentialClient = None  # type: ignore[assignment]
-  open_api_models = None  # type: ignore[assignment]
-  dypnsapi_20170525_models = None  # type: ignore[assignment]
-  util_models = None  # type: ignore[assignment]
-
+# The Alibaba Cloud SDKs are imported on first use (_load_sdk): importing
+# them costs ~0.2 s, and tests / CLI jobs / stub mode never send anything.
+Dypnsapi20170525Client = None
+open_api_models = None
+dypnsapi_20170525_models = None
+util_models = None
+_sdk_loaded: Optional[bool] = None
 
 _sms_client: Optional["Dypnsapi20170525Client"] = None
 
 
+def _load_sdk() -> bool:
+  global Dypnsapi20170525Client, open_api_models, dypnsapi_20170525_models, util_models, _sdk_loaded
+
+  if _sdk_loaded is not None:
+    return _sdk_loaded
+  try:
+    from alibabacloud_dypnsapi20170525.client import (  # type: ignore[import]
+      Client as Dypnsapi20170525Client,
+    )
+    from alibabacloud_tea_openapi import models as open_api_models  # type: ignore[import]
+    from alibabacloud_dypnsapi20170525 import (  # type: ignore[import]
+      models as dypnsapi_20170525_models,
+    )
+    from alibabacloud_tea_util import models as util_models  # type: ignore[import]
+    _sdk_loaded = True
+  except Exception as exc:  # noqa: BLE001
+    # SDK 未安装时，直接记录日志，后续调用会走本地 OTP，而不会中断登录流程。
+    print(f"[SMS] Alibaba Cloud SMS SDK not available: {exc}")
+    _sdk_loaded = False
+  return _sdk_loaded
+
+
 def _ensure_client() -> Optional["Dypnsapi20170525Client"]:
   """
   Lazily create a shared SMS client.
@@ -63,8 +71,7 @@ def _ensure_client() -> Optional["Dypnsapi20170525Client"]:
       print("[SMS] sms_access_key_id or sms_access_key_secret not configured; skip provider call.")
       return None
 
-    if Dypnsapi20170525Client is None or open_api_models is None:
-      # SDK import failed earlier.
+    if not _load_sdk():
       return None
 
     # 使用配置文件/环境变量中显式提供的 AccessKeyId/Secret，
@@ -84,6 +91,79 @@ def _ensure_client() -> Optional["Dypnsapi20170525Client"]:
     return None
 
 
+class SmsDeliveryError(Exception):
+  """
+  The provider was reached but did not accept the message.
+  """
+
+  def __init__(self, code: str, message: str = "") -> None:
+    super().__init__(f"{code}: {message}")
+    self.code = code
+
+
+# Provider codes worth retrying: throttling and provider-side faults. Every
+# other rejection (invalid number, template or signature, exhausted balance
+# ...) fails the same way again, and a retry may send a duplicate or cost money.
+_TRANSIENT_CODES = {"ServiceUnavailable", "InternalError", "isp.SYSTEM_ERROR", "SYSTEM_ERROR"}
+
+
+def is_transient_error(exc: Exception) -> bool:
+  """
+  Whether a failed delivery is worth retrying (see backend.sms_outbox).
+
+  Errors without a provider code (timeouts, connection errors) are transient.
+  """
+  # SmsDeliveryError and the SDK's own exceptions both carry the provider code.
+  code = getattr(exc, "code", None)
+  if not isinstance(code, str) or not code:
+    return True
+  return code in _TRANSIENT_CODES or code.startswith("Throttling")
+
+
+def _runtime_options():
+  # Bound every provider call; the SDK default read timeout is much longer.
+  timeout_ms = int(settings.sms_timeout_seconds * 1000)
+  return util_models.RuntimeOptions(connect_timeout=timeout_ms, read_timeout=timeout_ms)  # type: ignore[call-arg]
+
+
+def deliver_verification_code(phone: str, code: str) -> bool:
+  """
+  Send an SMS verification code via Alibaba Cloud.
+
+  Returns False when SMS is not configured (nothing sent). Raises on provider
+  or network errors; the caller (backend.sms_outbox) retries those that
+  ``is_transient_error`` accepts.
+  """
+  if settings.sms_provider == "stub":
+    time.sleep(settings.sms_stub_latency_ms / 1000)
+    return True
+
+  client = _ensure_client()
+  if client is None:
+    return False
+
+  template_param = (
+    settings.sms_template_param_template.replace("##code##", code)
+    if settings.sms_template_param_template
+    else f'{{"code":"{code}","min":"5"}}'
+  )
+
+  request = dypnsapi_20170525_models.SendSmsVerifyCodeRequest(  # type: ignore[call-arg]
+    phone_number=phone,
+    sign_name=settings.sms_sign_name,
+    template_code=settings.sms_template_code,
+    template_param=template_param,
+  )
+  resp = client.send_sms_verify_code_with_options(request, _runtime_options())
+  print("[SMS] send_sms_verify_code response:", resp)
+
+  body = getattr(resp, "body", None)
+  result_code = getattr(body, "code", None)
+  if result_code and str(result_code).upper() != "OK":
+    raise SmsDeliveryError(str(result_code), getattr(body, "message", "") or "")
+  return True
+
+
 def send_verification_code_sms(phone: str, code: str) -> None:
   """
   Send an SMS verification code via Alibaba Cloud, if configured.
@@ -95,27 +175,8 @@ def send_verification_code_sms(phone: str, code: str) -> None:
   Any import errors or runtime errors are logged to stdout and then swallowed
   so that本地开发和测试不会因为外部短信服务不可用而完全中断。
   """
-  client = _ensure_client()
-  if client is None:
-    return
-
   try:
-    template_param = (
-      settings.sms_template_param_template.replace("##code##", code)
-      if settings.sms_template_param_template
-      else f'{{"code":"{code}","min":"5"}}'
-    )
-
-    request = dypnsapi_20170525_models.SendSmsVerifyCodeRequest(  # type: ignore[call-arg]
-      phone_number=phone,
-      sign_name=settings.sms_sign_name,
-      template_code=settings.sms_template_code,
-      template_param=template_param,
-    )
-    runtime = util_models.RuntimeOptions()  # type: ignore[call-arg]
-
-    resp = client.send_sms_verify_code_with_options(request, runtime)
-    print("[SMS] send_sms_verify_code response:", resp)
+    deliver_verification_code(phone, code)
   except Exception as error:  # noqa: BLE001
     # 在工程中可以根据需要把错误接入监控，这里只做简单打印。
     message = getattr(error, "message", None) or str(error)
@@ -142,9 +203,7 @@ def verify_sms_code(phone: str, code: str) -> bool:
       phone_number=phone,
       verify_code=code,
     )
-    runtime = util_models.RuntimeOptions()  # type: ignore[call-arg]
-
-    resp = client.check_sms_verify_code_with_options(request, runtime)
+    resp = client.check_sms_verify_code_with_options(request, _runtime_options())
     print("[SMS] check_sms_verify_code response:", resp)
 
     # 尝试读取通用的 "code" 字段（大多阿里云 OpenAPI 返回 "OK" 表示成功）。
@@ -161,9 +220,17 @@ def verify_sms_code(phone: str, code: str) -> bool:
     return False
 
 
-# 尝试在模块导入阶段提前初始化一次 client，这时运行在主线程，
-# 可以避免 APScheduler 在工作线程里使用 signal 导致的报错。
-try:
-  _ensure_client()
-except Exception as exc:  # noqa: BLE001
-  print(f"[SMS] Initial client warm-up failed (will retry lazily): {exc}")
+def warm_up() -> bool:
+  """
+  Create the provider client now; returns True if SMS is usable.
+
+  由 API 的 lifespan 启动阶段调用，这时运行在主线程，
+  可以避免 APScheduler 在工作线程里使用 signal 导致的报错。
+  """
+  if settings.sms_provider == "stub":
+    return True
+  try:
+    return _ensure_client() is not None
+  except Exception as exc:  # noqa: BLE001
+    print(f"[SMS] Initial client warm-up failed (will retry lazily): {exc}")
+    return False
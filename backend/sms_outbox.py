@@ -0,0 +1,179 @@
+"""
+Outbound SMS queue.
+
+/auth/send-code only enqueues the message and returns; a small pool of
+worker threads (sms_queue_workers, which is also the concurrency limit
+towards the provider) delivers it. Each attempt is bounded by the provider
+client's connect/read timeout (sms_timeout_seconds); transient failures
+(timeouts, connection errors, throttling) are retried with exponential
+backoff up to sms_max_attempts, permanent provider rejections fail at once.
+
+The queue is bounded (sms_queue_max_size): when it is full the message is
+dropped and counted, the OTP stays valid and the user can request a resend.
+
+Per-message outcome and latency (enqueue -> provider accepted) are logged
+and aggregated in ``SmsOutbox.stats`` / ``SmsOutbox.latencies``.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, List, Optional
+
+from .config import get_settings
+from .metrics import SMS_DELIVERY_SECONDS, SMS_MESSAGES, SMS_QUEUE_DEPTH
+from .sms_client import deliver_verification_code, is_transient_error
+
+settings = get_settings()
+
+
+@dataclass
+class SmsMessage:
+  phone: str
+  code: str
+  enqueued_at: float = field(default_factory=time.monotonic)
+  attempts: int = 0
+
+
+def _mask(phone: str) -> str:
+  return f"***{phone[-4:]}"
+
+
+class SmsOutbox:
+  def __init__(
+    self,
+    send: Callable[[str, str], bool],
+    workers: int,
+    max_size: int,
+    max_attempts: int,
+    retry_backoff_seconds: float,
+    is_transient: Callable[[Exception], bool] = is_transient_error,
+  ) -> None:
+    self.send = send
+    self.is_transient = is_transient
+    self.workers = workers
+    self.max_attempts = max_attempts
+    self.retry_backoff_seconds = retry_backoff_seconds
+    self._queue: "queue.Queue[Optional[SmsMessage]]" = queue.Queue(maxsize=max_size)
+    self._threads: List[threading.Thread] = []
+    self._start_lock = threading.Lock()
+    self._stats_lock = threading.Lock()
+    # delivered / failed / retried / dropped / skipped (SMS not configured)
+    self.stats: Counter = Counter()
+    self.latencies: Deque[float] = deque(maxlen=1000)
+
+  def enqueue(self, phone: str, code: str) -> bool:
+    """
+    Queue a verification SMS; returns False if the queue is full.
+    """
+    self._ensure_workers()
+    try:
+      self._queue.put_nowait(SmsMessage(phone=phone, code=code))
+      SMS_QUEUE_DEPTH.inc()
+      return True
+    except queue.Full:
+      self._record("dropped")
+      print(f"[SMS] Outbox full, dropped message to {_mask(phone)}")
+      return False
+
+  def pending(self) -> int:
+    return self._queue.qsize()
+
+  def drain(self, timeout: float) -> bool:
+    """
+    Wait until every queued message has been handled (or ``timeout`` passes).
+    """
+    deadline = time.monotonic() + timeout
+    while self._queue.unfinished_tasks:
+      if time.monotonic() >= deadline:
+        return False
+      time.sleep(0.01)
+    return True
+
+  def stop(self, timeout: float = 5.0) -> None:
+    """
+    Drain the queue, then stop the workers.
+    """
+    self.drain(timeout)
+    with self._start_lock:
+      threads, self._threads = self._threads, []
+    for _ in threads:
+      self._queue.put(None)
+    for thread in threads:
+      thread.join(timeout)
+
+  def _ensure_workers(self) -> None:
+    if self._threads:
+      return
+    with self._start_lock:
+      if self._threads:
+        return
+      for i in range(self.workers):
+        thread = threading.Thread(target=self._run, name=f"sms-outbox-{i}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+  def _record(self, outcome: str, latency: Optional[float] = None) -> None:
+    with self._stats_lock:
+      self.stats[outcome] += 1
+      if latency is not None:
+        self.latencies.append(latency)
+    SMS_MESSAGES.labels(outcome).inc()
+    if latency is not None:
+      SMS_DELIVERY_SECONDS.observe(latency)
+
+  def _run(self) -> None:
+    while True:
+      message = self._queue.get()
+      try:
+        if message is None:
+          return
+        SMS_QUEUE_DEPTH.dec()
+        self._deliver(message)
+      finally:
+        self._queue.task_done()
+
+  def _deliver(self, message: SmsMessage) -> None:
+    while True:
+      message.attempts += 1
+      started = time.monotonic()
+      try:
+        sent = self.send(message.phone, message.code)
+      except Exception as exc:  # noqa: BLE001
+        error = getattr(exc, "message", None) or str(exc)
+        if not self.is_transient(exc):
+          self._record("failed")
+          print(f"[SMS] Delivery to {_mask(message.phone)} rejected, not retrying: {error}")
+          return
+        if message.attempts >= self.max_attempts:
+          self._record("failed")
+          print(f"[SMS] Delivery to {_mask(message.phone)} failed after {message.attempts} attempts: {error}")
+          return
+        self._record("retried")
+        print(f"[SMS] Attempt {message.attempts} to {_mask(message.phone)} failed ({error}); retrying")
+        time.sleep(self.retry_backoff_seconds * 2 ** (message.attempts - 1))
+        continue
+
+      if not sent:
+        self._record("skipped")
+        return
+      latency = time.monotonic() - message.enqueued_at
+      self._record("delivered", latency)
+      print(
+        f"[SMS] Delivered to {_mask(message.phone)} in {latency * 1000:.0f} ms "
+        f"(attempts={message.attempts}, provider={(time.monotonic() - started) * 1000:.0f} ms)"
+      )
+      return
+
+
+sms_outbox = SmsOutbox(
+  send=deliver_verification_code,
+  workers=settings.sms_queue_workers,
+  max_size=settings.sms_queue_max_size,
+  max_attempts=settings.sms_max_attempts,
+  retry_backoff_seconds=settings.sms_retry_backoff_seconds,
+)
@@ -0,0 +1,290 @@
+"""
+Serving the built front-end (frontend/dist).
+
+- ``StaticAssets`` indexes every file at startup (content ETag, media
+  type) and keeps gzip / brotli variants next to the originals
+  (``app.js.gz``, ``app.js.br``). Variants are produced at image build time
+  (``python -m backend.static_files frontend/dist``) or, if missing or
+  stale, once by the backend.serve launcher before it starts workers;
+  requests then only pick the variant the client accepts, so nothing is
+  compressed per request. Files added or changed
+  after the scan (a front-end redeploy: new hashed names under /assets) are
+  indexed on first request, with whatever variants already exist.
+- ``SpaIndex`` keeps index.html and its compressed forms in memory and
+  reloads them when the file's mtime changes (e.g. after a redeploy of the
+  front-end without restarting the API).
+
+Vite emits content-hashed file names under /assets, so those are served as
+immutable for a year; other files and index.html revalidate via ETag.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from .encoding import _accepted_encodings, brotli
+from .http_cache import is_not_modified
+
+
+HASHED_ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+INDEX_CACHE_CONTROL = "no-cache"
+
+# Worth precompressing; images, woff2 etc. are already compressed.
+_COMPRESSIBLE_SUFFIXES = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".txt", ".map", ".ttf", ".otf", ".ico"}
+_VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+_TMP_SUFFIX = ".tmp"
+# Never indexed or served: compressed siblings and in-progress writes.
+_SKIPPED_SUFFIXES = tuple(_VARIANT_SUFFIXES.values()) + (_TMP_SUFFIX,)
+
+
+def _content_etag(data: bytes) -> str:
+  return hashlib.sha1(data).hexdigest()[:20]
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+  if encoding == "br":
+    return brotli.compress(data, quality=11)  # type: ignore[union-attr]
+  return gzip.compress(data, compresslevel=9)
+
+
+def _encodings() -> Tuple[str, ...]:
+  return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _pick_encoding(request: Request, available) -> Optional[str]:
+  accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+  for encoding in _encodings():
+    if encoding in accepted and encoding in available:
+      return encoding
+  return None
+
+
+def _variant_path(path: Path, encoding: str) -> Path:
+  return path.with_name(path.name + _VARIANT_SUFFIXES[encoding])
+
+
+def fresh_variants(path: Path) -> Dict[str, Path]:
+  """
+  The existing .br / .gz siblings of ``path`` that are not older than it.
+  """
+  variants: Dict[str, Path] = {}
+  if path.suffix.lower() not in _COMPRESSIBLE_SUFFIXES:
+    return variants
+  source_mtime = path.stat().st_mtime
+  for encoding in _encodings():
+    target = _variant_path(path, encoding)
+    try:
+      if target.stat().st_mtime >= source_mtime:
+        variants[encoding] = target
+    except FileNotFoundError:
+      continue
+  return variants
+
+
+def precompress_file(path: Path) -> Dict[str, Path]:
+  """
+  Create (or refresh) the .br / .gz siblings of ``path``; returns those usable.
+
+  A variant that would not be smaller than the original is skipped.
+  """
+  if path.suffix.lower() not in _COMPRESSIBLE_SUFFIXES:
+    return {}
+
+  existing = fresh_variants(path)
+  data: Optional[bytes] = None
+  for encoding in _encodings():
+    if encoding in existing:
+      continue
+    target = _variant_path(path, encoding)
+    data = path.read_bytes() if data is None else data
+    compressed = _compress(data, encoding)
+    if len(compressed) >= len(data):
+      continue
+    try:
+      _write_atomically(target, compressed)
+    except OSError as exc:
+      print(f"[STATIC] Cannot write {target}: {exc}")
+  return fresh_variants(path)
+
+
+def _write_atomically(target: Path, data: bytes) -> None:
+  # Readers (other workers, a running API) see either the old file or the
+  # complete new one, never a truncated variant with a fresh mtime.
+  fd, tmp = tempfile.mkstemp(prefix=f".{target.name}.", suffix=_TMP_SUFFIX, dir=target.parent)
+  try:
+    with os.fdopen(fd, "wb") as fh:
+      fh.write(data)
+    os.replace(tmp, target)
+  except BaseException:
+    try:
+      os.unlink(tmp)
+    except OSError:
+      pass
+    raise
+
+
+@dataclass
+class StaticAsset:
+  path: Path
+  mtime: float
+  media_type: str
+  etag: str
+  cache_control: str
+  variants: Dict[str, Path] = field(default_factory=dict)
+
+
+FRONTEND_DIST_DIR = Path(__file__).resolve().parent.parent / "frontend" / "dist"
+
+
+class StaticAssets:
+  def __init__(self, root: Path, immutable_dirs: Tuple[str, ...] = ("assets",)) -> None:
+    self.root = root
+    self.immutable_dirs = immutable_dirs
+    self._assets: Optional[Dict[str, StaticAsset]] = None
+
+  def _index_file(self, rel: str, path: Path, precompress: bool) -> StaticAsset:
+    immutable = rel.split("/", 1)[0] in self.immutable_dirs
+    return StaticAsset(
+      path=path,
+      mtime=path.stat().st_mtime,
+      media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+      etag=_content_etag(path.read_bytes()),
+      cache_control=HASHED_ASSET_CACHE_CONTROL if immutable else STATIC_CACHE_CONTROL,
+      variants=precompress_file(path) if precompress else fresh_variants(path),
+    )
+
+  def scan(self, precompress: bool = False) -> int:
+    """
+    Index every file under ``root``; returns the file count.
+
+    With ``precompress`` missing or stale variants are written first. That
+    is the build step / launcher's job (brotli quality 11 on the CJK fonts
+    takes seconds); API workers only pick up the variants already on disk.
+    """
+    assets: Dict[str, StaticAsset] = {}
+    for path in sorted(self.root.rglob("*")):
+      if not path.is_file() or path.name.endswith(_SKIPPED_SUFFIXES):
+        continue
+      rel = path.relative_to(self.root).as_posix()
+      assets[rel] = self._index_file(rel, path, precompress)
+    self._assets = assets
+    return len(assets)
+
+  def _resolve(self, rel_path: str) -> Optional[Path]:
+    if rel_path.endswith(_SKIPPED_SUFFIXES):
+      return None
+    root = self.root.resolve()
+    path = (root / rel_path).resolve()
+    if root not in path.parents or not path.is_file():
+      return None
+    return path
+
+  def lookup(self, rel_path: str) -> Optional[StaticAsset]:
+    """
+    The indexed asset for ``rel_path``, re-indexed if the file changed.
+
+    Files that appeared after the scan (a front-end redeploy without an API
+    restart: new hashed names under /assets) are indexed on first request;
+    deleted files are dropped.
+    """
+    if self._assets is None:
+      self.scan()
+    assets: Dict[str, StaticAsset] = self._assets  # type: ignore[assignment]
+    asset = assets.get(rel_path)
+    path = asset.path if asset is not None else self._resolve(rel_path)
+    if path is None:
+      return None
+    try:
+      mtime = path.stat().st_mtime
+    except FileNotFoundError:
+      assets.pop(rel_path, None)
+      return None
+    if asset is None or asset.mtime != mtime:
+      asset = assets[rel_path] = self._index_file(rel_path, path, precompress=False)
+    return asset
+
+  def __contains__(self, rel_path: str) -> bool:
+    return self.lookup(rel_path) is not None
+
+  def response(self, request: Request, rel_path: str) -> Optional[Response]:
+    """
+    Response for ``rel_path`` (304 / precompressed / plain), or None if unknown.
+    """
+    asset = self.lookup(rel_path)
+    if asset is None:
+      return None
+
+    encoding = _pick_encoding(request, asset.variants)
+    # Each representation needs its own strong ETag.
+    etag = f'"{asset.etag}-{encoding}"' if encoding else f'"{asset.etag}"'
+    headers = {"ETag": etag, "Cache-Control": asset.cache_control}
+    if asset.variants:
+      headers["Vary"] = "Accept-Encoding"
+    if is_not_modified(request, etag):
+      return Response(status_code=304, headers=headers)
+
+    if encoding is None:
+      return FileResponse(asset.path, media_type=asset.media_type, headers=headers)
+    headers["Content-Encoding"] = encoding
+    return FileResponse(asset.variants[encoding], media_type=asset.media_type, headers=headers)
+
+
+class SpaIndex:
+  """
+  index.html held in memory with precompressed variants, reloaded on change.
+  """
+
+  def __init__(self, path: Path) -> None:
+    self.path = path
+    self._lock = threading.Lock()
+    self._mtime: Optional[float] = None
+    self._etag = ""
+    self._bodies: Dict[Optional[str], bytes] = {}
+
+  def _load_if_changed(self) -> None:
+    mtime = os.stat(self.path).st_mtime
+    if mtime == self._mtime:
+      return
+    with self._lock:
+      if mtime == self._mtime:
+        return
+      data = self.path.read_bytes()
+      bodies: Dict[Optional[str], bytes] = {None: data}
+      for encoding in _encodings():
+        bodies[encoding] = _compress(data, encoding)
+      self._bodies, self._etag, self._mtime = bodies, _content_etag(data), mtime
+
+  def response(self, request: Request) -> Optional[Response]:
+    try:
+      self._load_if_changed()
+    except FileNotFoundError:
+      return None
+
+    encoding = _pick_encoding(request, self._bodies)
+    etag = f'"{self._etag}-{encoding}"' if encoding else f'"{self._etag}"'
+    headers = {"ETag": etag, "Cache-Control": INDEX_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if is_not_modified(request, etag):
+      return Response(status_code=304, headers=headers)
+    if encoding:
+      headers["Content-Encoding"] = encoding
+    return Response(content=self._bodies[encoding], media_type="text/html; charset=utf-8", headers=headers)
+
+
+if __name__ == "__main__":
+  # Build step: python -m backend.static_files frontend/dist
+  root = Path(sys.argv[1] if len(sys.argv) > 1 else "frontend/dist")
+  count = StaticAssets(root).scan(precompress=True)
+  print(f"[STATIC] Indexed and precompressed {count} files under {root}")
@@ -1,9 +1,18 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+
 from fastapi.testclient import TestClient
 import pytest
 
 from backend.main import app, Base, engine
+from backend.archive import archive_old_analyses
 from backend.auth import get_otp_store_snapshot
-from backend.models import Analysis
+from backend.events import STATUS_CHANNEL, AnalysisEventBus, StatusWatcher, analysis_events, wait_for_status_change
+from backend.usage import get_daily_usage
+from backend.models import Analysis, User
 from backend.db import SessionLocal
 from backend.invite_codes import get_initial_invite_codes
 
@@ -206,3 +215,468 @@ def test_get_latest_analysis_skips_error_and_returns_most_recent(monkeypatch) ->
   latest = resp.json()
   assert latest["id"] == first_id
   assert latest["input"]["birth_year"] == payload1["birth_year"]
+
+
+def test_create_analysis_from_profile_derives_pillars_server_side(monkeypatch) -> None:
+  """
+  Ensure POST /analysis/from-profile computes the chart, stores the derived
+  pillars as analysis input and returns the chart in the same response.
+  """
+
+  monkeypatch.setattr("backend.main.call_llm", lambda system_prompt, user_prompt: '{"summary": "测试总评", "chartPoints": []}')
+
+  token = _signup_user("13900000004")
+  headers = {"Authorization": f"Bearer {token}"}
+
+  profile = {
+    "name": "测试用户",
+    "gender": "Male",
+    "birthDate": "1990-05-20",
+    "birthTime": "08:30",
+    "birthLocation": "北京",
+  }
+
+  resp = client.post("/bazi/calc", json=profile, headers=headers)
+  assert resp.status_code == 200
+  expected_chart = resp.json()
+
+  from backend import main
+
+  calculate = main._calculate_bazi_result
+  on_event_loop = []
+
+  def calculate_and_record(payload):
+    try:
+      asyncio.get_running_loop()
+      on_event_loop.append(True)
+    except RuntimeError:
+      on_event_loop.append(False)
+    return calculate(payload)
+
+  monkeypatch.setattr(main, "_calculate_bazi_result", calculate_and_record)
+
+  resp = client.post("/analysis/from-profile", json=profile, headers=headers)
+  assert resp.status_code == 200
+  # The chart is computed in the threadpool, not on the event loop.
+  assert on_event_loop == [False]
+  created = resp.json()
+  assert created["status"] == "pending"
+  assert created["bazi"] == expected_chart
+
+  resp = client.get(f"/analysis/{created['id']}", headers=headers)
+  assert resp.status_code == 200
+  stored_input = resp.json()["input"]
+  chart = expected_chart["bazi"]
+  assert stored_input["birth_year"] == 1990
+  assert stored_input["year_pillar"] == chart["year"]["gan"] + chart["year"]["zhi"]
+  assert stored_input["hour_pillar"] == chart["hour"]["gan"] + chart["hour"]["zhi"]
+  assert stored_input["start_age"] == expected_chart["startAge"]
+  assert stored_input["first_da_yun"] == expected_chart["daYun"][0]
+  assert stored_input["birthLocation"] == "北京"
+
+
+def test_failed_chart_calculation_never_reserves_quota(monkeypatch) -> None:
+  from backend import main
+
+  token = _signup_user("13900000010")
+  headers = {"Authorization": f"Bearer {token}"}
+  profile = {"gender": "Male", "birthDate": "1990-13-45", "birthTime": "08:30", "birthLocation": "北京"}
+  reserve = main._reserve_analysis_quota
+  reservations = []
+
+  async def record_reservation(db, user):
+    reservations.append(user.id)
+    return await reserve(db, user)
+
+  monkeypatch.setattr(main, "_reserve_analysis_quota", record_reservation)
+
+  # The chart is computed before the usage row is locked for the reservation.
+  resp = client.post("/analysis/from-profile", json=profile, headers=headers)
+  assert resp.status_code == 500
+  assert reservations == []
+  assert client.get("/user/me", headers=headers).json()["todayUsed"] == 0
+
+
+def test_get_analysis_long_poll_returns_when_status_changes() -> None:
+  """
+  Ensure GET /analysis/{id}?wait=N holds a pending analysis until the
+  background task publishes a status change, then returns once.
+  """
+
+  token = _signup_user("13900000005")
+  headers = {"Authorization": f"Bearer {token}"}
+
+  db = SessionLocal()
+  try:
+    user = db.query(User).filter(User.phone == "13900000005").first()
+    analysis = Analysis(user_id=user.id, input_json={"gender": "Male"}, status="pending")
+    db.add(analysis)
+    db.commit()
+    analysis_id = analysis.id
+  finally:
+    db.close()
+
+  def finish() -> None:
+    db = SessionLocal()
+    try:
+      row = db.get(Analysis, analysis_id)
+      row.status = "done"
+      row.output_json = {"summary": "测试总评"}
+      db.commit()
+    finally:
+      db.close()
+    analysis_events.publish(analysis_id, "done")
+
+  timer = threading.Timer(0.2, finish)
+  timer.start()
+  try:
+    started = time.monotonic()
+    resp = client.get(f"/analysis/{analysis_id}?wait=10", headers=headers)
+    elapsed = time.monotonic() - started
+  finally:
+    timer.join()
+
+  assert resp.status_code == 200
+  detail = resp.json()
+  assert detail["status"] == "done"
+  assert detail["output"] == {"summary": "测试总评"}
+  assert elapsed < 5
+  assert analysis_events.waiter_count(analysis_id) == 0
+
+
+def test_event_bus_times_out_without_publish() -> None:
+  async def scenario():
+    return await analysis_events.wait(999_999, timeout=0.05)
+
+  assert asyncio.run(scenario()) is None
+  assert analysis_events.waiter_count(999_999) == 0
+
+
+def test_status_watcher_checks_all_waiters_with_one_query_per_interval() -> None:
+  statuses = {analysis_id: "pending" for analysis_id in range(1, 11)}
+  queries = []
+
+  async def load_statuses(analysis_ids):
+    queries.append(list(analysis_ids))
+    return {analysis_id: statuses[analysis_id] for analysis_id in analysis_ids}
+
+  watcher = StatusWatcher(load_statuses, interval=0.05, bus=AnalysisEventBus())
+
+  async def scenario():
+    # Two waiters per analysis, as if finished by another process.
+    waits = [
+      asyncio.ensure_future(wait_for_status_change(analysis_id, "pending", 5, watcher))
+      for analysis_id in statuses
+      for _ in range(2)
+    ]
+    await asyncio.sleep(0.12)
+    statuses[3] = "done"
+    statuses[7] = "error"
+    await asyncio.sleep(0.1)
+    finished = [w.result() for w in waits if w.done()]
+    for w in waits:
+      w.cancel()
+    await asyncio.gather(*waits, return_exceptions=True)
+    return finished
+
+  assert sorted(asyncio.run(scenario())) == ["done", "done", "error", "error"]
+  assert 2 <= len(queries) <= 5
+  assert queries[0] == list(range(1, 11))
+  assert watcher.watched() == []
+
+
+def test_status_watcher_uses_notifications_while_listening() -> None:
+  queries = []
+
+  async def load_statuses(analysis_ids):
+    queries.append(list(analysis_ids))
+    return {analysis_id: "pending" for analysis_id in analysis_ids}
+
+  class FakeConnection:
+    def __init__(self) -> None:
+      self.listeners = {}
+
+    async def add_listener(self, channel, callback) -> None:
+      self.listeners[channel] = callback
+
+    def add_termination_listener(self, callback) -> None:
+      self.on_close = callback
+
+  connection = FakeConnection()
+  watcher = StatusWatcher(load_statuses, interval=0.02, bus=AnalysisEventBus())
+
+  async def scenario():
+    await watcher.listen(connection)
+    wait = asyncio.ensure_future(wait_for_status_change(42, "pending", 5, watcher))
+    await asyncio.sleep(0.1)
+    connection.listeners[STATUS_CHANNEL](connection, 1, STATUS_CHANNEL, "42:done")
+    return await wait
+
+  assert asyncio.run(scenario()) == "done"
+  # Only the newly watched id is checked once, to catch earlier changes.
+  assert queries == [[42]]
+  connection.on_close(connection)
+  assert watcher.listening is False
+
+
+def test_finished_analysis_supports_conditional_get(monkeypatch) -> None:
+  """
+  Ensure a finished analysis carries a weak ETag and immutable caching
+  that varies per account and encoding, and that If-None-Match is answered
+  with 304 and no body.
+  """
+
+  monkeypatch.setattr("backend.main.call_llm", lambda system_prompt, user_prompt: '{"summary": "测试总评", "chartPoints": []}')
+
+  token = _signup_user("13900000006")
+  headers = {"Authorization": f"Bearer {token}"}
+
+  payload = {
+    "gender": "Male",
+    "birth_year": 1990,
+    "year_pillar": "癸未",
+    "month_pillar": "壬戌",
+    "day_pillar": "丙子",
+    "hour_pillar": "庚寅",
+    "start_age": 8,
+    "first_da_yun": "辛酉",
+  }
+  resp = client.post("/analysis", json=payload, headers=headers)
+  analysis_id = resp.json()["id"]
+
+  resp = client.get(f"/analysis/{analysis_id}", headers=headers)
+  assert resp.status_code == 200
+  assert resp.json()["status"] == "done"
+  etag = resp.headers["ETag"]
+  # Weak: identity, gzip and br bodies share it.
+  assert etag.startswith('W/"') and etag.endswith('"')
+  assert "immutable" in resp.headers["Cache-Control"]
+  assert "Last-Modified" in resp.headers
+  assert resp.headers["Vary"] == "Authorization, Accept-Encoding"
+
+  resp = client.get(f"/analysis/{analysis_id}", headers={**headers, "Accept-Encoding": "identity"})
+  assert resp.headers["ETag"] == etag
+  assert resp.headers["Vary"] == "Authorization, Accept-Encoding"
+
+  resp = client.get(f"/analysis/{analysis_id}", headers={**headers, "If-None-Match": etag})
+  assert resp.status_code == 304
+  assert resp.content == b""
+  assert resp.headers["ETag"] == etag
+
+  resp = client.get("/analysis/latest", headers=headers)
+  assert resp.status_code == 200
+  resp = client.get("/analysis/latest", headers={**headers, "If-None-Match": resp.headers["ETag"]})
+  assert resp.status_code == 304
+
+  resp = client.get("/user/me", headers=headers)
+  assert resp.status_code == 200
+  assert resp.json()["todayUsed"] == 1
+  resp = client.get("/user/me", headers={**headers, "If-None-Match": resp.headers["ETag"]})
+  assert resp.status_code == 304
+
+
+def test_large_analysis_response_is_compressed(monkeypatch) -> None:
+  """
+  Ensure large analysis payloads are compressed per Accept-Encoding and
+  small responses are left alone.
+  """
+
+  chart_points = [
+    {"age": age, "year": 1989 + age, "daYun": "童限", "ganZhi": "庚午", "open": 50, "close": 55,
+     "high": 60, "low": 45, "score": 55, "reason": "流年平稳，宜守不宜攻，注意身体"}
+    for age in range(1, 101)
+  ]
+  output = json.dumps({"summary": "测试总评", "chartPoints": chart_points}, ensure_ascii=False)
+  monkeypatch.setattr("backend.main.call_llm", lambda system_prompt, user_prompt: output)
+
+  token = _signup_user("13900000007")
+  headers = {"Authorization": f"Bearer {token}"}
+
+  payload = {
+    "gender": "Female",
+    "birth_year": 1990,
+    "year_pillar": "癸未",
+    "month_pillar": "壬戌",
+    "day_pillar": "丙子",
+    "hour_pillar": "庚寅",
+    "start_age": 8,
+    "first_da_yun": "辛酉",
+  }
+  analysis_id = client.post("/analysis", json=payload, headers=headers).json()["id"]
+
+  resp = client.get(f"/analysis/{analysis_id}", headers={**headers, "Accept-Encoding": "gzip"})
+  assert resp.status_code == 200
+  assert resp.headers["Content-Encoding"] == "gzip"
+  assert int(resp.headers["Content-Length"]) < len(output)
+  assert resp.json()["output"]["chartPoints"] == chart_points
+  assert resp.headers["ETag"].startswith('W/"')
+  assert resp.headers["Vary"] == "Authorization, Accept-Encoding"
+  gzip_etag = resp.headers["ETag"]
+  resp = client.get(f"/analysis/{analysis_id}", headers={**headers, "If-None-Match": gzip_etag})
+  assert resp.status_code == 304
+
+  resp = client.get("/analysis/latest", headers={**headers, "Accept-Encoding": "gzip"})
+  assert resp.status_code == 200
+  assert "Content-Encoding" not in resp.headers
+
+
+def test_list_analyses_keyset_pagination_and_status_filter() -> None:
+  """
+  Ensure GET /analysis pages newest-first with an opaque cursor, filters by
+  status and returns summary fields only.
+  """
+
+  token = _signup_user("13900000008")
+  headers = {"Authorization": f"Bearer {token}"}
+
+  db = SessionLocal()
+  try:
+    user = db.query(User).filter(User.phone == "13900000008").first()
+    same_time = datetime(2026, 1, 1, 8, 0, 0)
+    rows = []
+    for i in range(5):
+      rows.append(
+        Analysis(
+          user_id=user.id,
+          input_json={"name": f"用户{i}", "gender": "Male", "birthDate": "1990-05-20"},
+          output_json={"summaryScore": i, "wealthScore": "7", "chartPoints": []},
+          status="error" if i == 2 else "done",
+          # Two rows share created_at to exercise the id tie-breaker.
+          created_at=same_time if i >= 3 else datetime(2025, 12, 1 + i, 8, 0, 0),
+        )
+      )
+    db.add_all(rows)
+    db.commit()
+    expected_ids = [r.id for r in sorted(rows, key=lambda r: (r.created_at, r.id), reverse=True)]
+  finally:
+    db.close()
+
+  seen = []
+  cursor = None
+  while True:
+    params = {"limit": 2}
+    if cursor:
+      params["cursor"] = cursor
+    resp = client.get("/analysis", params=params, headers=headers)
+    assert resp.status_code == 200
+    page = resp.json()
+    assert len(page["items"]) <= 2
+    seen.extend(item["id"] for item in page["items"])
+    cursor = page["next_cursor"]
+    if not cursor:
+      break
+
+  assert seen == expected_ids
+
+  first = client.get("/analysis", params={"limit": 1}, headers=headers).json()["items"][0]
+  assert "output" not in first and "input" not in first
+  assert first["summaryScore"] == 4
+  assert first["wealthScore"] == 7
+  assert first["name"] == "用户4"
+
+  resp = client.get("/analysis", params={"status": "error"}, headers=headers)
+  assert [item["status"] for item in resp.json()["items"]] == ["error"]
+
+  resp = client.get("/analysis", params={"cursor": "not-a-cursor"}, headers=headers)
+  assert resp.status_code == 400
+
+
+def test_quota_counts_pending_and_refunds_failed(monkeypatch) -> None:
+  """
+  Ensure the daily quota is reserved atomically on submission (pending
+  jobs count) and failed analyses give their slot back.
+  """
+
+  outcomes = []
+
+  def fake_call_llm(system_prompt: str, user_prompt: str) -> str:
+    if outcomes.pop(0) == "fail":
+      raise RuntimeError("LLM timeout")
+    return '{"summary": "测试总评", "chartPoints": []}'
+
+  monkeypatch.setattr("backend.main.call_llm", fake_call_llm)
+
+  token = _signup_user("13900000009")
+  headers = {"Authorization": f"Bearer {token}"}
+  payload = {
+    "gender": "Male",
+    "birth_year": 1990,
+    "year_pillar": "癸未",
+    "month_pillar": "壬戌",
+    "day_pillar": "丙子",
+    "hour_pillar": "庚寅",
+    "start_age": 8,
+    "first_da_yun": "辛酉",
+  }
+
+  # Base quota for POST /analysis is 5 per day; one failure is refunded.
+  outcomes.extend(["fail", "ok", "ok", "ok", "ok", "ok"])
+  for _ in range(6):
+    resp = client.post("/analysis", json=payload, headers=headers)
+    assert resp.status_code == 200
+
+  resp = client.post("/analysis", json=payload, headers=headers)
+  assert resp.status_code == 400
+
+  me = client.get("/user/me", headers=headers).json()
+  assert me["todayUsed"] == 5
+
+  db = SessionLocal()
+  try:
+    user = db.query(User).filter(User.phone == "13900000009").first()
+    usage = get_daily_usage(db, user.id)
+    assert (usage.analyses_reserved, usage.analyses_done, usage.analyses_failed) == (6, 5, 1)
+  finally:
+    db.close()
+
+
+def test_archived_analysis_is_served_from_cold_archive(monkeypatch, tmp_path) -> None:
+  """
+  Ensure the archive job moves old finished analyses out of the table and
+  GET /analysis/{id} transparently reads them back from the archive file.
+  """
+  monkeypatch.setattr("backend.archive.settings.archive_dir", str(tmp_path))
+
+  token = _signup_user("13900000010")
+  headers = {"Authorization": f"Bearer {token}"}
+
+  document = {"summaryScore": 9, "summary": "归档总评", "chartPoints": [{"age": 1, "score": 60}]}
+  db = SessionLocal()
+  try:
+    user = db.query(User).filter(User.phone == "13900000010").first()
+    old = Analysis(
+      user_id=user.id,
+      input_json={"gender": "Female"},
+      output_json=document,
+      status="done",
+      created_at=datetime(2020, 3, 1, 8, 0, 0),
+      completed_at=datetime(2020, 3, 1, 8, 1, 0),
+    )
+    recent = Analysis(user_id=user.id, input_json={"gender": "Female"}, status="pending")
+    db.add_all([old, recent])
+    db.commit()
+    old_id, recent_id = old.id, recent.id
+  finally:
+    db.close()
+
+  assert archive_old_analyses(older_than_days=30, batch_size=1) >= 1
+  assert (tmp_path / "2020" / "2020-03-01.jsonl.gz").exists()
+
+  db = SessionLocal()
+  try:
+    assert db.get(Analysis, old_id) is None
+    assert db.get(Analysis, recent_id) is not None
+  finally:
+    db.close()
+
+  resp = client.get(f"/analysis/{old_id}", headers=headers)
+  assert resp.status_code == 200
+  data = resp.json()
+  assert data["id"] == old_id
+  assert data["status"] == "done"
+  assert data["output"] == document
+  assert "user_id" not in data
+  assert "immutable" in resp.headers["cache-control"]
+
+  resp = client.get(f"/analysis/{old_id}", headers={**headers, "If-None-Match": resp.headers["etag"]})
+  assert resp.status_code == 304
@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from backend import main
+from backend.analysis_jobs import AnalysisRunner, RunnerClosed, claim_requeued, claim_stale, hand_off, heartbeat
+from backend.auth import create_access_token
+from backend.db import Base, SessionLocal, engine
+from backend.models import Analysis, User
+
+
+def setup_module() -> None:
+  Base.metadata.drop_all(bind=engine)
+  Base.metadata.create_all(bind=engine)
+
+
+ANALYSIS_INPUT = {
+  "gender": "Female",
+  "birth_year": 1992,
+  "year_pillar": "壬申",
+  "month_pillar": "丙午",
+  "day_pillar": "丁卯",
+  "hour_pillar": "庚子",
+  "start_age": 5,
+  "first_da_yun": "乙巳",
+}
+
+
+def _create_pending_analysis(phone: str) -> tuple:
+  db = SessionLocal()
+  user = db.query(User).filter(User.phone == phone).first()
+  if user is None:
+    user = User(phone=phone, referral_code=f"J{phone[-5:]}")
+    db.add(user)
+    db.flush()
+  analysis = Analysis(user_id=user.id, input_json=ANALYSIS_INPUT, status="pending", created_at=datetime.utcnow())
+  db.add(analysis)
+  db.commit()
+  ids = (user.id, analysis.id)
+  db.close()
+  return ids
+
+
+def _load(analysis_id: int) -> Analysis:
+  db = SessionLocal()
+  try:
+    return db.get(Analysis, analysis_id)
+  finally:
+    db.close()
+
+
+def test_runner_drain_reports_unfinished_and_refuses_after_stop() -> None:
+  release = threading.Event()
+  runner = AnalysisRunner(lambda analysis_id: release.wait(5) if analysis_id == 2 else None, workers=2)
+
+  runner.submit(1)
+  runner.submit(2)
+  started = time.monotonic()
+  runner.stop_accepting()
+  assert runner.drain(timeout=0.2) == [2]
+  assert time.monotonic() - started < 1
+
+  with pytest.raises(RunnerClosed):
+    runner.submit(3)
+  release.set()
+  assert runner.drain(timeout=5) == []
+
+
+def test_hand_off_and_claim_each_analysis_once() -> None:
+  _, pending_id = _create_pending_analysis("13600000001")
+  _, done_id = _create_pending_analysis("13600000001")
+  db = SessionLocal()
+  db.get(Analysis, done_id).status = "done"
+  db.commit()
+
+  assert hand_off(db, [pending_id, done_id]) == 1
+  assert _load(pending_id).requeued_at is not None
+  assert _load(done_id).requeued_at is None
+
+  assert claim_requeued(db) == [pending_id]
+  assert claim_requeued(db) == []
+  assert _load(pending_id).requeued_at is None
+  db.close()
+
+
+def test_orphans_of_a_killed_worker_are_claimed_once_their_heartbeat_is_stale() -> None:
+  long_ago = datetime.utcnow() - timedelta(hours=1)
+  stale_before = datetime.utcnow() - timedelta(minutes=5)
+  _, fresh_id = _create_pending_analysis("13600000004")
+  _, never_started_id = _create_pending_analysis("13600000004")
+  _, orphan_id = _create_pending_analysis("13600000004")
+  _, alive_id = _create_pending_analysis("13600000004")
+  _, handed_off_id = _create_pending_analysis("13600000004")
+  db = SessionLocal()
+  for analysis_id in (never_started_id, orphan_id, alive_id, handed_off_id):
+    db.get(Analysis, analysis_id).created_at = long_ago
+  db.get(Analysis, orphan_id).heartbeat_at = long_ago
+  db.commit()
+  # A live worker still holds alive_id; handed_off_id waits for claim_requeued.
+  assert heartbeat(db, [alive_id]) == 1
+  hand_off(db, [handed_off_id])
+
+  assert claim_stale(db, stale_before) == [never_started_id, orphan_id]
+  # Claiming refreshes the heartbeat, so nobody else takes them over.
+  assert claim_stale(db, stale_before) == []
+  assert _load(fresh_id).heartbeat_at is None
+  assert claim_requeued(db) == [handed_off_id]
+  assert claim_stale(db, stale_before) == []
+  db.close()
+
+
+def test_shutdown_hands_off_unfinished_and_resume_completes_it(monkeypatch, capsys) -> None:
+  old_worker = threading.Event()
+  calls = []
+
+  def llm(system_prompt: str, user_prompt: str) -> str:
+    calls.append(1)
+    if len(calls) == 1:
+      # The generation that outlives the drain deadline.
+      old_worker.wait(5)
+      return '{"summary": "旧进程结果", "chartPoints": []}'
+    return '{"summary": "交接后完成", "chartPoints": []}'
+
+  monkeypatch.setattr(main, "call_llm", llm)
+  monkeypatch.setattr(main, "warm_up_worker", _noop)
+  monkeypatch.setattr(main, "_start_background_jobs", lambda: None)
+  monkeypatch.setattr(main, "mark_process_dead", lambda: None)
+  monkeypatch.setattr(main.settings, "run_migrations_on_startup", False)
+  monkeypatch.setattr(main.settings, "shutdown_drain_seconds", 0.2)
+
+  user_id, analysis_id = _create_pending_analysis("13600000002")
+  with TestClient(main.app):
+    main.analysis_runner.submit(analysis_id)
+
+  out = capsys.readouterr().out
+  assert "[SHUTDOWN] Drained 0/1 analyses" in out
+  assert f"handed off 1 [{analysis_id}]" in out
+  assert _load(analysis_id).requeued_at is not None
+
+  # A stopped worker refuses new analyses without spending quota.
+  headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+  resp = TestClient(main.app).post("/analysis", json=ANALYSIS_INPUT, headers=headers)
+  assert resp.status_code == 503
+  assert resp.headers["retry-after"]
+
+  # The next worker to start (here: the same runner, restarted) resumes it.
+  main.analysis_runner.start()
+  main._resume_handed_off_analyses()
+  deadline = time.monotonic() + 5
+  while _load(analysis_id).status == "pending" and time.monotonic() < deadline:
+    time.sleep(0.02)
+
+  # The stale generation finishing late must not overwrite the result.
+  old_worker.set()
+  assert main.analysis_runner.drain(timeout=5) == []
+  analysis = _load(analysis_id)
+  assert analysis.status == "done"
+  assert analysis.requeued_at is None
+  db = SessionLocal()
+  assert db.get(Analysis, analysis_id).output_json["summary"] == "交接后完成"
+  db.close()
+
+
+def test_refused_job_is_handed_off_and_leaves_the_queue_depth() -> None:
+  _, analysis_id = _create_pending_analysis("13600000003")
+  before = REGISTRY.get_sample_value("analysis_queue_depth")
+  main.analysis_runner.stop_accepting()
+  try:
+    # As _enqueue_analysis does, right before the background task runs.
+    main.ANALYSIS_QUEUE_DEPTH.inc()
+    asyncio.run(main._run_analysis_job(analysis_id))
+  finally:
+    main.analysis_runner.start()
+
+  assert REGISTRY.get_sample_value("analysis_queue_depth") == before
+  assert _load(analysis_id).requeued_at is not None
+
+
+def test_logged_id_lists_are_capped() -> None:
+  assert main._format_ids([3, 1]) == "[3, 1]"
+  assert main._format_ids(list(range(25))) == "[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ... (+15 more)]"
+
+
+async def _noop() -> None:
+  return None
@@ -1,9 +1,16 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
 from datetime import date
+from pathlib import Path
 
 from fastapi.testclient import TestClient
 
 from backend.main import app, Base, engine
-from backend.auth import get_otp_store_snapshot
+from backend import auth
+from backend.auth import clear_auth_cache, create_access_token, get_claims_from_token, get_otp_store_snapshot
 from backend.models import User, Invite
 from backend.db import SessionLocal
 from backend.invite_codes import get_initial_invite_codes
@@ -78,6 +85,7 @@ def test_signup_and_invite_flow() -> None:
   assert resp.status_code == 200
   me_data = resp.json()
   assert me_data["totalInvited"] == 1
+  assert me_data["invitedToday"] == 1
 
   # Ensure invite record exists in DB
   db = _get_db_session()
@@ -96,3 +104,161 @@ def test_signup_and_invite_flow() -> None:
     assert len(invites) == 1
   finally:
     db.close()
+
+
+def test_signup_retries_on_referral_code_collision(monkeypatch) -> None:
+  """
+  A referral code collision is resolved by the unique index and a retry,
+  and the invite from the colliding path is still recorded exactly once.
+  """
+  db = _get_db_session()
+  try:
+    taken = db.query(User).filter(User.phone == "13800000001").first().referral_code
+  finally:
+    db.close()
+
+  candidates = iter([taken, taken, "ZZ9ZZ9"])
+  monkeypatch.setattr("backend.referral_codes.random_referral_code", lambda: next(candidates))
+
+  phone = "13800000003"
+  client.post("/auth/send-code", json={"phone": phone})
+  code, _ = get_otp_store_snapshot()[phone]
+  resp = client.post("/auth/verify-code", json={"phone": phone, "code": code, "inviterCode": taken})
+  assert resp.status_code == 200
+
+  db = _get_db_session()
+  try:
+    user = db.query(User).filter(User.phone == phone).first()
+    inviter = db.query(User).filter(User.referral_code == taken).first()
+    assert user.referral_code == "ZZ9ZZ9"
+    assert db.query(Invite).filter(Invite.invited_user_id == user.id).count() == 1
+    assert inviter.invite_count == 2
+  finally:
+    db.close()
+
+
+def test_rejected_invite_code_keeps_the_verification_code() -> None:
+  phone = "13800000004"
+  client.post("/auth/send-code", json={"phone": phone})
+  code, _ = get_otp_store_snapshot()[phone]
+
+  resp = client.post("/auth/verify-code", json={"phone": phone, "code": code, "inviterCode": "NOPE00"})
+  assert resp.status_code == 400
+  assert resp.json()["detail"] == "邀请码无效，请确认后再试"
+
+  valid_code = sorted(get_initial_invite_codes())[0]
+  resp = client.post("/auth/verify-code", json={"phone": phone, "code": code, "inviterCode": valid_code})
+  assert resp.status_code == 200
+
+  # Consumed by the successful login.
+  resp = client.post("/auth/verify-code", json={"phone": phone, "code": code})
+  assert resp.status_code == 400
+
+
+def test_claims_cache_skips_db_and_is_invalidated_on_update(monkeypatch) -> None:
+  db = _get_db_session()
+  try:
+    user = db.query(User).filter(User.phone == "13800000001").first()
+    user_id = user.id
+  finally:
+    db.close()
+  token = create_access_token(user_id)
+  clear_auth_cache()
+
+  claims = asyncio.run(get_claims_from_token(token))
+  assert claims.id == user_id
+
+  def no_db():
+    raise AssertionError("cached claims must not open a session")
+
+  real_session_factory = auth.AsyncSessionLocal
+  monkeypatch.setattr(auth, "AsyncSessionLocal", no_db)
+  assert asyncio.run(get_claims_from_token(token)) == claims
+
+  db = _get_db_session()
+  try:
+    db.get(User, user_id).referral_code = "RENAMED1"
+    db.commit()
+  finally:
+    db.close()
+
+  monkeypatch.setattr(auth, "AsyncSessionLocal", real_session_factory)
+  assert asyncio.run(get_claims_from_token(token)).referral_code == "RENAMED1"
+
+
+def test_claims_cached_between_flush_and_commit_are_evicted_on_commit() -> None:
+  db = _get_db_session()
+  try:
+    user = db.query(User).filter(User.phone == "13800000001").first()
+    user_id = user.id
+    token = create_access_token(user_id)
+    clear_auth_cache()
+
+    user.referral_code = "FLUSHED1"
+    db.flush()
+    # A concurrent request still sees (and caches) the committed row.
+    assert asyncio.run(get_claims_from_token(token)).referral_code != "FLUSHED1"
+    db.commit()
+  finally:
+    db.close()
+
+  assert asyncio.run(get_claims_from_token(token)).referral_code == "FLUSHED1"
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# Signs up a new user and logs in again, in a fresh interpreter so the APP_*
+# environment (database URL, shared stores) is picked up at import time.
+_SIGNUP_PROBE = """
+import json, sys
+from fastapi.testclient import TestClient
+from backend.auth import get_otp_store_snapshot
+from backend.invite_codes import get_initial_invite_codes
+from backend.main import app
+from backend.migrate import upgrade_database
+
+upgrade_database()
+client = TestClient(app)
+statuses = []
+for invite_code in (sorted(get_initial_invite_codes())[0], None):
+  client.post("/auth/send-code", json={"phone": "13800000009"})
+  code, _ = get_otp_store_snapshot()["13800000009"]
+  resp = client.post("/auth/verify-code", json={"phone": "13800000009", "code": code, "inviterCode": invite_code})
+  statuses.append([resp.status_code, resp.text[:200]])
+# To a file: the SMS outbox thread may still be printing to stdout.
+with open(sys.argv[1], "w") as out:
+  json.dump({"statuses": statuses, "otp_codes": len(get_otp_store_snapshot())}, out)
+"""
+
+
+def run_signup_probe(tmp_path: Path, extra_env: dict) -> dict:
+  env = {
+    **os.environ,
+    "APP_DATABASE_URL": f"sqlite:///{tmp_path / 'signup.db'}",
+    "APP_SMS_PROVIDER": "stub",
+    # Fail fast instead of waiting 5 s if a second connection needs the write lock.
+    "APP_SQLITE_BUSY_TIMEOUT_MS": "500",
+    **extra_env,
+  }
+  result_path = tmp_path / "signup.json"
+  subprocess.run(
+    [sys.executable, "-c", _SIGNUP_PROBE, str(result_path)], cwd=REPO_ROOT, env=env, capture_output=True, check=True
+  )
+  return json.loads(result_path.read_text())
+
+
+def test_new_user_signs_up_with_database_otp_store_on_sqlite(tmp_path) -> None:
+  result = run_signup_probe(tmp_path, {"APP_OTP_STORE": "database"})
+
+  # Sign-up, then a login of the existing user; both codes are consumed.
+  assert [status for status, _ in result["statuses"]] == [200, 200], result
+  assert result["otp_codes"] == 0
+
+
+def test_new_user_signs_up_through_the_multi_worker_shared_backends(tmp_path) -> None:
+  from backend.serve import _SHARED_BACKENDS
+
+  # What `python -m backend.serve --workers N` switches on, on the default SQLite database.
+  result = run_signup_probe(tmp_path, _SHARED_BACKENDS)
+
+  assert [status for status, _ in result["statuses"]] == [200, 200], result
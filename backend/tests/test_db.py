@@ -0,0 +1,46 @@
+import asyncio
+from dataclasses import replace
+
+from backend.config import get_settings
+from backend.db import async_database_url, build_async_engine, build_engine
+
+
+def test_sqlite_engine_applies_tuning_pragmas(tmp_path) -> None:
+  settings = replace(get_settings(), sqlite_busy_timeout_ms=1234, sqlite_cache_size_kib=2048)
+  engine = build_engine(f"sqlite:///{tmp_path / 'tuned.db'}", settings)
+  try:
+    with engine.connect() as conn:
+      assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+      assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+      assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+      assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -2048
+    assert engine.pool.size() == settings.db_pool_size
+  finally:
+    engine.dispose()
+
+
+def test_in_memory_sqlite_skips_wal_and_pool_sizing() -> None:
+  engine = build_engine("sqlite://", get_settings())
+  try:
+    with engine.connect() as conn:
+      assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "memory"
+  finally:
+    engine.dispose()
+
+
+def test_async_database_url_maps_sync_drivers() -> None:
+  assert async_database_url("sqlite:///./backend.db") == "sqlite+aiosqlite:///./backend.db"
+  assert async_database_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+  assert async_database_url("postgresql+asyncpg://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+
+def test_async_engine_applies_tuning_pragmas(tmp_path) -> None:
+  async def _journal_mode(engine) -> str:
+    try:
+      async with engine.connect() as conn:
+        return (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+    finally:
+      await engine.dispose()
+
+  engine = build_async_engine(f"sqlite:///{tmp_path / 'tuned.db'}", get_settings())
+  assert asyncio.run(_journal_mode(engine)) == "wal"
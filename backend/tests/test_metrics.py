@@ -0,0 +1,59 @@
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.main import app, Base, engine
+from backend.auth import create_access_token
+from backend.db import SessionLocal
+from backend.models import User
+
+
+client = TestClient(app)
+
+
+def setup_module() -> None:
+  Base.metadata.drop_all(bind=engine)
+  Base.metadata.create_all(bind=engine)
+
+
+def _sample(text: str, prefix: str) -> float:
+  for line in text.splitlines():
+    if line.startswith(prefix):
+      return float(line.rsplit(" ", 1)[1])
+  return 0.0
+
+
+def test_metrics_expose_http_db_and_cache_samples() -> None:
+  db = SessionLocal()
+  user = User(phone="13900000001", referral_code="MTRC01")
+  db.add(user)
+  db.commit()
+  token = create_access_token(user.id)
+  db.close()
+
+  before = client.get("/metrics").text
+  for _ in range(3):
+    assert client.get("/analysis", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+  assert client.get("/no/such/path").status_code == 404
+  after = client.get("/metrics")
+
+  assert after.status_code == 200
+  assert after.headers["content-type"].startswith("text/plain")
+  text = after.text
+
+  route = 'http_request_duration_seconds_count{method="GET",route="/analysis",status="200"}'
+  assert _sample(text, route) - _sample(before, route) == 3
+  # Raw paths never become label values.
+  assert 'route="unmatched",status="404"' in text
+  assert "/no/such/path" not in text
+
+  select = 'db_query_duration_seconds_count{operation="SELECT"}'
+  assert _sample(text, select) > _sample(before, select)
+  # The first request decodes the token, the next two hit the cache.
+  hits = 'cache_requests_total{cache="auth_token",result="hit"}'
+  assert _sample(text, hits) - _sample(before, hits) >= 2
+
+
+def test_metrics_token_is_enforced(monkeypatch) -> None:
+  monkeypatch.setattr(main.settings, "metrics_token", "s3cret")
+  assert client.get("/metrics").status_code == 401
+  assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,124 @@
+import json
+
+from sqlalchemy import create_engine, inspect, text
+
+from backend.analysis_store import decode_document
+from backend.db import Base
+from backend.migrate import current_revision, downgrade_database, head_revision, upgrade_database
+
+
+def _index_names(engine, table: str) -> set:
+  return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_fresh_database_creates_hot_path_indexes(tmp_path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+
+  upgrade_database(engine=engine)
+
+  assert current_revision(engine) == head_revision()
+  assert {"ix_analyses_user_status_created", "ix_analyses_user_created_id"} <= _index_names(engine, "analyses")
+  assert "ix_invites_inviter_created" in _index_names(engine, "invites")
+  engine.dispose()
+
+
+def test_upgrade_adopts_legacy_create_all_database(tmp_path) -> None:
+  """
+  A database created by the old create_all call (no alembic_version) is
+  stamped at the baseline and only the newer revisions are applied.
+  """
+  engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+  upgrade_database("0001", engine=engine)
+  with engine.begin() as conn:
+    conn.execute(text("DROP TABLE alembic_version"))
+    conn.execute(
+      text(
+        "INSERT INTO users (phone, referral_code, created_at, last_login_at) "
+        "VALUES ('13800000000', 'ABC123', '2026-01-01', '2026-01-01')"
+      )
+    )
+
+  upgrade_database(engine=engine)
+
+  assert current_revision(engine) == head_revision()
+  assert "ix_analyses_user_created_id" in _index_names(engine, "analyses")
+  with engine.connect() as conn:
+    assert conn.execute(text("SELECT count(*) FROM users")).scalar() == 1
+
+  # Models and migrations must describe the same indexes.
+  model_indexes = {index.name for index in Base.metadata.tables["analyses"].indexes}
+  assert model_indexes <= _index_names(engine, "analyses")
+  engine.dispose()
+
+
+def test_upgrade_moves_analysis_output_to_compressed_table(tmp_path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'outputs.db'}")
+  upgrade_database("0003", engine=engine)
+  document = {"summaryScore": 8, "summary": "总评" * 50, "chartPoints": [{"age": 1, "score": 60}]}
+  with engine.begin() as conn:
+    conn.execute(
+      text(
+        "INSERT INTO users (id, phone, referral_code, created_at, last_login_at) "
+        "VALUES (1, '13800000001', 'OUT123', '2026-01-01', '2026-01-01')"
+      )
+    )
+    conn.execute(
+      text(
+        "INSERT INTO analyses (id, user_id, input_json, output_json, status, created_at) "
+        "VALUES (1, 1, '{}', :doc, 'done', '2026-01-01'), (2, 1, '{}', NULL, 'pending', '2026-01-01')"
+      ),
+      {"doc": json.dumps(document, ensure_ascii=False)},
+    )
+
+  upgrade_database(engine=engine)
+
+  assert "output_json" not in {c["name"] for c in inspect(engine).get_columns("analyses")}
+  with engine.connect() as conn:
+    codec, data = conn.execute(text("SELECT codec, data FROM analysis_outputs WHERE analysis_id = 1")).one()
+    assert decode_document(codec, data) == document
+    assert conn.execute(text("SELECT count(*) FROM analysis_outputs")).scalar() == 1
+    assert json.loads(conn.execute(text("SELECT summary_json FROM analyses WHERE id = 1")).scalar()) == {"summaryScore": 8}
+
+  downgrade_database("0003", engine=engine)
+
+  with engine.connect() as conn:
+    assert json.loads(conn.execute(text("SELECT output_json FROM analyses WHERE id = 1")).scalar()) == document
+  engine.dispose()
+
+
+def test_analysis_ids_are_not_reused_after_archiving_the_newest(tmp_path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'ids.db'}")
+  upgrade_database("0008", engine=engine)
+  with engine.begin() as conn:
+    conn.execute(
+      text(
+        "INSERT INTO users (id, phone, referral_code, created_at, last_login_at) "
+        "VALUES (1, '13800000002', 'IDS123', '2026-01-01', '2026-01-01')"
+      )
+    )
+    conn.execute(
+      text(
+        "INSERT INTO analyses (id, user_id, input_json, status, created_at) "
+        "VALUES (1, 1, '{}', 'done', '2026-01-01'), (2, 1, '{}', 'done', '2026-01-02')"
+      )
+    )
+    # The newest analysis was archived: only its stub keeps id 2.
+    conn.execute(text("DELETE FROM analyses WHERE id = 2"))
+    conn.execute(
+      text(
+        "INSERT INTO archived_analyses (id, user_id, status, created_at, partition, archived_at) "
+        "VALUES (2, 1, 'done', '2026-01-02', '2026-01', '2026-02-01')"
+      )
+    )
+
+  upgrade_database(engine=engine)
+
+  assert "ix_analyses_requeued_at" in _index_names(engine, "analyses")
+  with engine.begin() as conn:
+    for expected_id in (3, 4):
+      conn.execute(
+        text("INSERT INTO analyses (user_id, input_json, status, created_at) VALUES (1, '{}', 'pending', '2026-03-01')")
+      )
+      assert conn.execute(text("SELECT max(id) FROM analyses")).scalar() == expected_id
+      conn.execute(text("DELETE FROM analyses WHERE id = :id"), {"id": expected_id})
+  engine.dispose()
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.migrate import upgrade_database
+from backend.otp_store import DatabaseOTPStore, MemoryOTPStore
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request, tmp_path):
+  if request.param == "memory":
+    yield MemoryOTPStore(max_entries=100)
+    return
+  engine = create_engine(f"sqlite:///{tmp_path / 'otp.db'}", connect_args={"check_same_thread": False})
+  upgrade_database(engine=engine)
+  yield DatabaseOTPStore(engine)
+  engine.dispose()
+
+
+def test_code_is_consumed_once(store) -> None:
+  store.put("13700000001", "123456", datetime.utcnow() + timedelta(minutes=5))
+
+  assert not store.consume("13700000001", "000000")
+  assert store.consume("13700000001", "123456")
+  assert not store.consume("13700000001", "123456")
+
+
+def test_check_does_not_consume(store) -> None:
+  store.put("13700000005", "555555", datetime.utcnow() + timedelta(minutes=5))
+
+  assert not store.check("13700000005", "000000")
+  assert store.check("13700000005", "555555")
+  assert store.check("13700000005", "555555")
+  assert store.consume("13700000005", "555555")
+  assert not store.check("13700000005", "555555")
+
+
+def test_database_consume_follows_the_session_transaction(tmp_path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'otp.db'}")
+  upgrade_database(engine=engine)
+  store = DatabaseOTPStore(engine)
+  store.put("13700000006", "666666", datetime.utcnow() + timedelta(minutes=5))
+
+  with Session(engine) as db:
+    assert store.consume("13700000006", "666666", db)
+    db.rollback()
+  assert store.check("13700000006", "666666")
+
+  with Session(engine) as db:
+    assert store.consume("13700000006", "666666", db)
+    db.commit()
+  assert not store.check("13700000006", "666666")
+  engine.dispose()
+
+
+def test_expired_codes_are_rejected_and_purged(store) -> None:
+  store.put("13700000002", "111111", datetime.utcnow() - timedelta(seconds=1))
+  store.put("13700000003", "222222", datetime.utcnow() + timedelta(minutes=5))
+
+  assert not store.consume("13700000002", "111111")
+  store.put("13700000002", "111111", datetime.utcnow() - timedelta(seconds=1))
+  assert store.purge_expired() == 1
+  assert set(store.snapshot()) == {"13700000003"}
+
+
+def test_concurrent_verification_succeeds_exactly_once(store) -> None:
+  store.put("13700000004", "333333", datetime.utcnow() + timedelta(minutes=5))
+
+  with ThreadPoolExecutor(max_workers=8) as pool:
+    results = list(pool.map(lambda _: store.consume("13700000004", "333333"), range(8)))
+
+  assert results.count(True) == 1
+
+
+def test_memory_store_is_bounded() -> None:
+  store = MemoryOTPStore(max_entries=3)
+  for i in range(5):
+    store.put(f"1370000001{i}", "444444", datetime.utcnow() + timedelta(minutes=5))
+
+  assert set(store.snapshot()) == {"13700000012", "13700000013", "13700000014"}
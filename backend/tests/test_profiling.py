@@ -0,0 +1,59 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.profiling import ProfileStore, ProfilingMiddleware
+
+
+def _slow_handler() -> dict:
+  time.sleep(0.05)
+  return {"ok": True}
+
+
+def _profiled_app(store: ProfileStore) -> FastAPI:
+  app = FastAPI()
+  app.get("/slow")(_slow_handler)
+  app.add_middleware(ProfilingMiddleware, store=store, token="admin", interval_ms=1)
+  return app
+
+
+def test_only_opted_in_requests_are_profiled_into_a_bounded_ring(tmp_path) -> None:
+  store = ProfileStore(str(tmp_path), max_files=2)
+  client = TestClient(_profiled_app(store))
+
+  assert client.get("/slow").status_code == 200
+  assert client.get("/slow", headers={"X-Profile": "wrong"}).status_code == 200
+  assert store.list() == []
+
+  assert client.get("/slow", headers={"X-Profile": "admin"}).status_code == 200
+  [item] = store.list()
+  assert "-GET-slow-200-" in item["name"]
+  folded = store.path(item["name"]).read_text()
+  # The sync handler runs in a threadpool thread and is still sampled.
+  assert "_slow_handler (test_profiling.py:" in folded
+
+  client.get("/slow?__profile=admin")
+  client.get("/slow", headers={"X-Profile": "admin"})
+  assert len(store.list()) == 2
+  assert store.path("../etc/passwd") is None
+
+
+def test_profile_endpoints_require_the_admin_token(monkeypatch, tmp_path) -> None:
+  store = ProfileStore(str(tmp_path), max_files=5)
+  name = store.save("GET", "/analysis", 200, 0.012, "MainThread;handler 3\n")
+  monkeypatch.setattr(main, "profile_store", store)
+  client = TestClient(main.app)
+
+  monkeypatch.setattr(main.settings, "profiling_token", "")
+  assert client.get("/debug/profiles").status_code == 404
+
+  monkeypatch.setattr(main.settings, "profiling_token", "admin")
+  assert client.get("/debug/profiles").status_code == 401
+  auth = {"Authorization": "Bearer admin"}
+  listing = client.get("/debug/profiles", headers=auth)
+  assert [item["name"] for item in listing.json()["items"]] == [name]
+  download = client.get(f"/debug/profiles/{name}", headers=auth)
+  assert download.text == "MainThread;handler 3\n"
+  assert client.get("/debug/profiles/missing.folded", headers=auth).status_code == 404
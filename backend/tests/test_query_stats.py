@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from backend.main import app, Base, engine
+from backend.auth import clear_auth_cache, create_access_token
+from backend.db import SessionLocal
+from backend.models import Analysis, User
+from backend.query_stats import QueryStatsMiddleware, assert_max_queries, instrument_engine
+
+
+client = TestClient(app)
+
+
+def setup_module() -> None:
+  Base.metadata.drop_all(bind=engine)
+  Base.metadata.create_all(bind=engine)
+
+
+ANALYSIS_INPUT = {
+  "gender": "Male",
+  "birth_year": 1990,
+  "year_pillar": "庚午",
+  "month_pillar": "辛巳",
+  "day_pillar": "甲子",
+  "hour_pillar": "丙寅",
+  "start_age": 3,
+  "first_da_yun": "壬午",
+}
+
+
+def _seed_user_with_analyses(count: int) -> tuple:
+  db = SessionLocal()
+  user = User(phone="13700000001", referral_code="QRYB01")
+  db.add(user)
+  db.flush()
+  for _ in range(count):
+    db.add(
+      Analysis(
+        user_id=user.id,
+        input_json=ANALYSIS_INPUT,
+        output_json={"summary": "ok", "summaryScore": 7, "chartPoints": []},
+        status="done",
+        created_at=datetime.utcnow(),
+        completed_at=datetime.utcnow(),
+      )
+    )
+  db.commit()
+  analysis_id = db.query(Analysis.id).filter(Analysis.user_id == user.id).first()[0]
+  token = create_access_token(user.id)
+  db.close()
+  return {"Authorization": f"Bearer {token}"}, analysis_id
+
+
+# Cold auth cache: one users lookup plus the endpoint's own queries. Raising
+# a budget should be a deliberate change, not a side effect.
+QUERY_BUDGETS = [
+  ("/user/me", 2),
+  ("/analysis", 2),
+  ("/analysis/latest", 2),
+  ("/analysis/{id}", 3),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded() -> tuple:
+  return _seed_user_with_analyses(5)
+
+
+@pytest.mark.parametrize("path,budget", QUERY_BUDGETS)
+def test_endpoint_query_budgets(seeded, path: str, budget: int) -> None:
+  headers, analysis_id = seeded
+  clear_auth_cache()
+  with assert_max_queries(budget):
+    resp = client.get(path.format(id=analysis_id), headers=headers)
+  assert resp.status_code == 200
+
+
+def test_assert_max_queries_reports_the_statements() -> None:
+  with pytest.raises(AssertionError, match=r"at most 1 queries, got 2"):
+    with assert_max_queries(1):
+      with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 1"))
+
+
+def test_server_timing_and_repeated_statement_warning(capsys) -> None:
+  demo = FastAPI()
+
+  @demo.get("/n-plus-one")
+  def n_plus_one() -> dict:
+    with engine.connect() as conn:
+      for i in range(4):
+        conn.execute(text("SELECT :i"), {"i": i})
+    return {}
+
+  demo.add_middleware(QueryStatsMiddleware, server_timing=True, repeat_warn=3)
+  resp = TestClient(demo).get("/n-plus-one")
+
+  assert resp.headers["server-timing"].endswith('desc="4 queries"')
+  assert "ran one statement 4 times" in capsys.readouterr().out
+
+
+def test_slow_queries_are_logged_without_parameter_values(capsys) -> None:
+  slow_engine = create_engine("sqlite://")
+  instrument_engine(slow_engine, slow_query_ms=1)
+  with slow_engine.connect() as conn:
+    conn.execute(
+      text(
+        "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 100000) "
+        "SELECT count(*) FROM n WHERE :phone IS NOT NULL"
+      ),
+      {"phone": "13700000009"},
+    )
+  out = capsys.readouterr().out
+  assert "[DB] Slow query" in out
+  assert "params=['str']" in out
+  assert "13700000009" not in out
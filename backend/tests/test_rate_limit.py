@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from backend import main
+from backend.migrate import upgrade_database
+from backend.rate_limit import DatabaseTokenBuckets, MemoryTokenBuckets, RateLimit, RateLimiter
+
+
+@pytest.fixture(params=["memory", "database"])
+def buckets(request, tmp_path):
+  if request.param == "memory":
+    yield MemoryTokenBuckets(max_keys=100)
+    return
+  engine = create_engine(f"sqlite:///{tmp_path / 'buckets.db'}")
+  upgrade_database(engine=engine)
+  yield DatabaseTokenBuckets(engine)
+  engine.dispose()
+
+
+def test_bucket_allows_burst_then_refills(buckets) -> None:
+  limit = RateLimit.parse("2/10")  # burst 2, one token every 5 s
+
+  assert buckets.take("k", limit, now=100.0) == 0
+  assert buckets.take("k", limit, now=100.0) == 0
+  assert buckets.take("k", limit, now=100.0) == pytest.approx(5.0)
+  assert buckets.take("k", limit, now=103.0) == pytest.approx(2.0)
+  assert buckets.take("k", limit, now=105.0) == 0
+  # Other keys are independent.
+  assert buckets.take("other", limit, now=105.0) == 0
+
+
+def test_purge_drops_only_refilled_buckets(buckets) -> None:
+  limit = RateLimit.parse("2/10")
+
+  buckets.take("send:a", limit, now=100.0)
+  buckets.take("send:b", limit, now=100.0)
+  buckets.take("send:b", limit, now=100.0)
+  buckets.take("send_ip:a", limit, now=100.0)
+
+  assert buckets.purge_full("send:", limit, now=104.0) == 0
+  # a is full again after 5 s, b needs 10 s.
+  assert buckets.purge_full("send:", limit, now=105.0) == 1
+  assert buckets.take("send:b", limit, now=105.0) == 0
+  assert buckets.take("send:b", limit, now=105.0) == pytest.approx(5.0)
+  assert buckets.purge_full("send:", limit, now=200.0) == 1
+  # Other limits' buckets are left alone.
+  assert buckets.purge_full("send_ip:", limit, now=200.0) == 1
+
+
+def test_send_code_returns_429_with_retry_after(monkeypatch) -> None:
+  limiter = RateLimiter(
+    {"send_code_phone": RateLimit.parse("1/60"), "send_code_ip": None},
+    MemoryTokenBuckets(max_keys=100),
+  )
+  monkeypatch.setattr(main, "rate_limiter", limiter)
+  client = TestClient(main.app)
+
+  assert client.post("/auth/send-code", json={"phone": "13600000001"}).status_code == 200
+  resp = client.post("/auth/send-code", json={"phone": "13600000001"})
+  assert resp.status_code == 429
+  assert 1 <= int(resp.headers["retry-after"]) <= 60
+  assert limiter.rejections["send_code_phone"] == 1
+  assert client.post("/auth/send-code", json={"phone": "13600000002"}).status_code == 200
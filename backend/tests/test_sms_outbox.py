@@ -0,0 +1,93 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.auth import get_otp_store_snapshot
+from backend.sms_client import SmsDeliveryError
+from backend.sms_outbox import SmsOutbox
+
+
+def test_outbox_retries_then_records_delivery() -> None:
+  calls = []
+
+  def flaky_send(phone: str, code: str) -> bool:
+    calls.append((phone, code))
+    if len(calls) < 3:
+      raise RuntimeError("provider timeout")
+    return True
+
+  outbox = SmsOutbox(flaky_send, workers=1, max_size=10, max_attempts=3, retry_backoff_seconds=0)
+  assert outbox.enqueue("13500000001", "123456")
+  assert outbox.drain(timeout=5)
+
+  assert calls == [("13500000001", "123456")] * 3
+  assert outbox.stats["retried"] == 2
+  assert outbox.stats["delivered"] == 1
+  assert len(outbox.latencies) == 1
+  outbox.stop()
+
+
+def test_outbox_retries_throttling_but_not_permanent_rejections() -> None:
+  calls = []
+
+  def provider(phone: str, code: str) -> bool:
+    calls.append(phone)
+    if phone == "13500000004":
+      raise SmsDeliveryError("isv.MOBILE_NUMBER_ILLEGAL", "invalid number")
+    if calls.count(phone) < 2:
+      raise SmsDeliveryError("Throttling.User", "too many requests")
+    return True
+
+  outbox = SmsOutbox(provider, workers=1, max_size=10, max_attempts=3, retry_backoff_seconds=0)
+  outbox.enqueue("13500000004", "111111")
+  assert outbox.drain(timeout=5)
+  # A permanent rejection is sent once and fails immediately.
+  assert calls == ["13500000004"]
+  assert outbox.stats["failed"] == 1 and outbox.stats["retried"] == 0
+
+  outbox.enqueue("13500000005", "222222")
+  assert outbox.drain(timeout=5)
+  assert calls.count("13500000005") == 2
+  assert outbox.stats["retried"] == 1 and outbox.stats["delivered"] == 1
+  outbox.stop()
+
+
+def test_outbox_gives_up_and_drops_when_full() -> None:
+  def failing_send(phone: str, code: str) -> bool:
+    raise RuntimeError("boom")
+
+  outbox = SmsOutbox(failing_send, workers=1, max_size=1, max_attempts=2, retry_backoff_seconds=0.2)
+  results = [outbox.enqueue("13500000002", str(i)) for i in range(3)]
+  assert outbox.drain(timeout=5)
+
+  assert False in results
+  assert outbox.stats["dropped"] == results.count(False)
+  assert outbox.stats["failed"] == results.count(True)
+  outbox.stop()
+
+
+def test_send_code_does_not_wait_for_provider_and_verify_skips_remote(monkeypatch) -> None:
+  def slow_send(phone: str, code: str) -> bool:
+    time.sleep(1)
+    return True
+
+  def remote_verify(phone: str, code: str) -> bool:
+    raise AssertionError("remote verification must be skipped when the local code matches")
+
+  outbox = SmsOutbox(slow_send, workers=1, max_size=10, max_attempts=1, retry_backoff_seconds=0)
+  monkeypatch.setattr(main, "sms_outbox", outbox)
+  monkeypatch.setattr(main, "verify_sms_code", remote_verify)
+  client = TestClient(main.app)
+
+  started = time.monotonic()
+  resp = client.post("/auth/send-code", json={"phone": "13500000003"})
+  assert resp.status_code == 200
+  assert time.monotonic() - started < 0.5
+
+  code, _ = get_otp_store_snapshot()["13500000003"]
+  resp = client.post("/auth/verify-code", json={"phone": "13500000003", "code": code, "inviterCode": "bogus"})
+  # Local OTP matched (no remote call); the unknown invite code is what fails.
+  assert resp.status_code == 400
+  assert resp.json()["detail"] == "邀请码无效，请确认后再试"
+  outbox.stop()
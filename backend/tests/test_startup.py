@@ -0,0 +1,125 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# Cold `import backend.main` in a fresh interpreter, best of three. Measured
+# at ~1.15 s on the reference 1-CPU box (2.2 s before heavy SDKs became lazy);
+# override with BACKEND_IMPORT_BUDGET_MS on slower CI machines.
+IMPORT_BUDGET_MS = int(os.environ.get("BACKEND_IMPORT_BUDGET_MS", "1600"))
+
+# Imported on first use only; pulling one back into import time fails here.
+LAZY_MODULES = ("openai", "alembic", "alibabacloud_dypnsapi20170525")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import backend.main
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def _probe() -> dict:
+  out = subprocess.run(
+    [sys.executable, "-c", _PROBE], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+  ).stdout
+  return json.loads(out.strip().splitlines()[-1])
+
+
+def test_cold_import_stays_within_budget_and_lazy() -> None:
+  runs = [_probe() for _ in range(3)]
+  assert runs[0]["loaded"] == []
+  best = min(run["ms"] for run in runs)
+  assert best <= IMPORT_BUDGET_MS, f"import backend.main took {best:.0f} ms (budget {IMPORT_BUDGET_MS} ms)"
+
+
+def test_lifespan_runs_startup_and_shutdown(monkeypatch) -> None:
+  from backend import main
+
+  calls = []
+
+  async def fake_warm_up() -> None:
+    calls.append("warm")
+
+  monkeypatch.setattr(main.settings, "run_migrations_on_startup", False)
+  monkeypatch.setattr(main, "warm_up_worker", fake_warm_up)
+  monkeypatch.setattr(main, "_start_background_jobs", lambda: calls.append("jobs"))
+  monkeypatch.setattr(main, "mark_process_dead", lambda: calls.append("stopped"))
+
+  with TestClient(app) as client:
+    assert calls == ["warm", "jobs"]
+    assert client.get("/metrics").status_code == 200
+  assert calls == ["warm", "jobs", "stopped"]
+
+
+@pytest.fixture
+def fresh_readiness(monkeypatch):
+  from backend import main, warmup
+
+  state = warmup.Readiness()
+  monkeypatch.setattr(warmup, "readiness", state)
+  monkeypatch.setattr(main.settings, "run_migrations_on_startup", False)
+  monkeypatch.setattr(main.settings, "sms_provider", "stub")
+  monkeypatch.setattr(main.settings, "llm_api_key", "demo")
+  monkeypatch.setattr(main, "_start_background_jobs", lambda: None)
+  monkeypatch.setattr(main, "mark_process_dead", lambda: None)
+  return state
+
+
+def test_not_ready_until_warmed_up(fresh_readiness) -> None:
+  client = TestClient(app)
+  assert client.get("/healthz").json() == {"status": "ok"}
+  resp = client.get("/readyz")
+  assert resp.status_code == 503
+  assert resp.json()["status"] == "starting"
+
+
+def test_warm_up_reports_each_dependency(fresh_readiness) -> None:
+  with TestClient(app) as client:
+    resp = client.get("/readyz")
+
+  assert resp.status_code == 200
+  body = resp.json()
+  assert body["status"] == "ready"
+  assert set(body["checks"]) == {"calendar", "database", "llm", "sms"}
+  assert all(check["ok"] and check["latency_ms"] >= 0 for check in body["checks"].values())
+  assert body["checks"]["calendar"]["detail"] == "sample chart 庚午辛巳乙酉庚辰"
+
+
+def test_optional_dependency_failure_degrades_but_stays_ready(fresh_readiness, monkeypatch) -> None:
+  from backend import main
+
+  # Nothing listens on port 9: the LLM pre-connect fails fast.
+  monkeypatch.setattr(main.settings, "llm_api_key", "test-key")
+  monkeypatch.setattr(main.settings, "llm_api_base", "http://127.0.0.1:9/v1")
+  with TestClient(app) as client:
+    resp = client.get("/readyz")
+
+  assert resp.status_code == 200
+  llm = resp.json()["checks"]["llm"]
+  assert llm["ok"] is False and llm["required"] is False
+
+
+def test_required_dependency_failure_is_not_ready(fresh_readiness, monkeypatch) -> None:
+  from backend import warmup
+
+  async def broken_ping() -> str:
+    raise RuntimeError("database is gone")
+
+  monkeypatch.setattr(warmup, "_ping_database", broken_ping)
+  with TestClient(app) as client:
+    resp = client.get("/readyz")
+
+  assert resp.status_code == 503
+  assert resp.json()["status"] == "unavailable"
+  assert resp.json()["checks"]["database"]["detail"] == "RuntimeError: database is gone"
@@ -0,0 +1,113 @@
+import gzip
+import os
+
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from backend.static_files import HASHED_ASSET_CACHE_CONTROL, SpaIndex, StaticAssets
+
+
+def _build_app(dist) -> FastAPI:
+  assets = StaticAssets(dist)
+  assets.scan(precompress=True)
+  index = SpaIndex(dist / "index.html")
+  app = FastAPI()
+
+  @app.get("/assets/{path:path}")
+  def serve_asset(path: str, request: Request) -> Response:
+    return assets.response(request, f"assets/{path}") or Response(status_code=404)
+
+  @app.get("/")
+  def serve_index(request: Request) -> Response:
+    return index.response(request) or Response(status_code=404)
+
+  return app
+
+
+def test_assets_are_precompressed_and_immutable(tmp_path) -> None:
+  (tmp_path / "assets").mkdir()
+  script = b"console.log('hello');\n" * 200
+  (tmp_path / "assets" / "index-3f2a1b.js").write_bytes(script)
+  (tmp_path / "assets" / "logo-9c8d7e.png").write_bytes(os.urandom(256))
+  (tmp_path / "index.html").write_text("<html></html>")
+
+  client = TestClient(_build_app(tmp_path))
+  assert (tmp_path / "assets" / "index-3f2a1b.js.gz").exists()
+
+  resp = client.get("/assets/index-3f2a1b.js", headers={"Accept-Encoding": "gzip"})
+  assert resp.status_code == 200
+  assert resp.headers["content-encoding"] == "gzip"
+  assert resp.headers["cache-control"] == HASHED_ASSET_CACHE_CONTROL
+  assert resp.headers["vary"] == "Accept-Encoding"
+  assert resp.content == script  # httpx decodes the precompressed body
+
+  plain = client.get("/assets/index-3f2a1b.js", headers={"Accept-Encoding": "identity"})
+  assert "content-encoding" not in plain.headers
+  assert plain.headers["etag"] != resp.headers["etag"]
+
+  again = client.get(
+    "/assets/index-3f2a1b.js",
+    headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["etag"]},
+  )
+  assert again.status_code == 304
+
+  image = client.get("/assets/logo-9c8d7e.png", headers={"Accept-Encoding": "gzip"})
+  assert "content-encoding" not in image.headers
+  assert not (tmp_path / "assets" / "logo-9c8d7e.png.gz").exists()
+
+  assert client.get("/assets/missing.js").status_code == 404
+
+
+def test_index_is_cached_and_reloaded_on_change(tmp_path) -> None:
+  index_file = tmp_path / "index.html"
+  index_file.write_text("<html>v1</html>")
+  client = TestClient(_build_app(tmp_path))
+
+  first = client.get("/", headers={"Accept-Encoding": "gzip"})
+  assert first.text == "<html>v1</html>"
+  assert first.headers["cache-control"] == "no-cache"
+  assert client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]}).status_code == 304
+
+  index_file.write_text("<html>v2</html>")
+  stat = index_file.stat()
+  os.utime(index_file, (stat.st_atime, stat.st_mtime + 5))
+
+  second = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+  assert second.status_code == 200
+  assert second.text == "<html>v2</html>"
+
+
+def test_assets_added_after_the_scan_are_served(tmp_path) -> None:
+  (tmp_path / "assets").mkdir()
+  (tmp_path / "assets" / "index-aaaa11.js").write_text("old();")
+  (tmp_path / "index.html").write_text("<html></html>")
+  client = TestClient(_build_app(tmp_path))
+
+  # Front-end redeployed without restarting the API.
+  script = b"console.log('new build');\n" * 200
+  (tmp_path / "assets" / "index-bbbb22.js").write_bytes(script)
+  (tmp_path / "assets" / "index-bbbb22.js.gz").write_bytes(gzip.compress(script))
+
+  resp = client.get("/assets/index-bbbb22.js", headers={"Accept-Encoding": "gzip"})
+  assert resp.status_code == 200
+  assert resp.headers["content-encoding"] == "gzip"
+  assert resp.content == script
+
+  (tmp_path / "assets" / "index-aaaa11.js").unlink()
+  assert client.get("/assets/index-aaaa11.js").status_code == 404
+  # Lookups never leave the root directory.
+  assert StaticAssets(tmp_path / "assets").lookup("../index.html") is None
+
+
+def test_workers_do_not_compress_and_writes_leave_no_temp_files(tmp_path) -> None:
+  style = b"body { color: red; }\n" * 200
+  (tmp_path / "app.css").write_bytes(style)
+
+  assert StaticAssets(tmp_path).scan() == 1
+  assert sorted(p.name for p in tmp_path.iterdir()) == ["app.css"]
+
+  assert StaticAssets(tmp_path).scan(precompress=True) == 1
+  names = sorted(p.name for p in tmp_path.iterdir())
+  assert "app.css.gz" in names
+  assert not [name for name in names if name.endswith(".tmp")]
+  assert gzip.decompress((tmp_path / "app.css.gz").read_bytes()) == style
@@ -0,0 +1,89 @@
+"""
+Small in-process cache with per-entry TTL and an LRU size bound.
+
+Thread-safe (sync endpoints run in the threadpool). Used for the
+authenticated-user cache in auth.py; ``hits`` / ``misses`` are kept for
+cache-efficiency stats and, for named caches, also exported to /metrics.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+from .metrics import CACHE_REQUESTS
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+  def __init__(self, maxsize: int, ttl: float, name: Optional[str] = None) -> None:
+    """
+    ``ttl <= 0`` or ``maxsize <= 0`` disables the cache (every get misses).
+    """
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.hits = 0
+    self.misses = 0
+    self._hit_metric = CACHE_REQUESTS.labels(name, "hit") if name else None
+    self._miss_metric = CACHE_REQUESTS.labels(name, "miss") if name else None
+    self._lock = threading.Lock()
+    self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+  @property
+  def enabled(self) -> bool:
+    return self.ttl > 0 and self.maxsize > 0
+
+  def get(self, key: K) -> Optional[V]:
+    with self._lock:
+      item = self._data.get(key)
+      if item is not None and item[0] <= time.monotonic():
+        del self._data[key]
+        item = None
+      if item is None:
+        self.misses += 1
+      else:
+        self._data.move_to_end(key)
+        self.hits += 1
+    metric = self._miss_metric if item is None else self._hit_metric
+    if metric is not None:
+      metric.inc()
+    return None if item is None else item[1]
+
+  def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+    ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+    if not self.enabled or ttl <= 0:
+      return
+    with self._lock:
+      self._data[key] = (time.monotonic() + ttl, value)
+      self._data.move_to_end(key)
+      while len(self._data) > self.maxsize:
+        self._data.popitem(last=False)
+
+  def pop(self, key: K) -> Optional[V]:
+    with self._lock:
+      item = self._data.pop(key, None)
+    return None if item is None else item[1]
+
+  def purge_expired(self) -> int:
+    """
+    Drop every expired entry; returns how many were removed.
+    """
+    now = time.monotonic()
+    with self._lock:
+      expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+      for key in expired:
+        del self._data[key]
+    return len(expired)
+
+  def clear(self) -> None:
+    with self._lock:
+      self._data.clear()
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._data)
@@ -0,0 +1,154 @@
+"""
+Materialized usage counters (quota and invite statistics).
+
+Instead of COUNT-ing analyses / invites on every /user/me and POST /analysis,
+we keep one ``UserDailyUsage`` row per user per UTC day plus a running
+``User.invite_count``. Counters are changed with single UPDATE statements
+(``col = col + 1``), so concurrent requests never lose increments, and the
+quota reservation is a conditional UPDATE that only succeeds while the user
+still has quota left.
+
+注意：计数以 UTC 日期为准，与 Analysis.created_at（datetime.utcnow）一致。
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import User, UserDailyUsage
+
+
+def usage_day(moment: Optional[datetime] = None) -> date:
+  return (moment or datetime.utcnow()).date()
+
+
+def invite_bonus(invite_count: int, cap: int) -> int:
+  """
+  Extra daily quota from invites: +1 per 5 successful invites, capped.
+  """
+  return min(invite_count // 5, cap)
+
+
+def _upsert_stmt(dialect: str, user_id: int, day: date):
+  """
+  INSERT ... ON CONFLICT DO NOTHING for the (user_id, day) row, or None when
+  the dialect has no such construct (callers then fall back to a savepoint).
+  """
+  values = {"user_id": user_id, "day": day}
+  if dialect == "sqlite":
+    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+  elif dialect == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+  else:
+    return None
+  return dialect_insert(UserDailyUsage).values(**values).on_conflict_do_nothing(index_elements=["user_id", "day"])
+
+
+def _ensure_row(db: Session, user_id: int, day: date) -> None:
+  stmt = _upsert_stmt(db.get_bind().dialect.name, user_id, day)
+  if stmt is not None:
+    db.execute(stmt)
+    return
+
+  if db.get(UserDailyUsage, (user_id, day)) is not None:
+    return
+  try:
+    with db.begin_nested():
+      db.execute(insert(UserDailyUsage).values(user_id=user_id, day=day))
+  except IntegrityError:
+    # Another transaction created the row first.
+    pass
+
+
+async def _ensure_row_async(db: AsyncSession, user_id: int, day: date) -> None:
+  stmt = _upsert_stmt(db.get_bind().dialect.name, user_id, day)
+  if stmt is not None:
+    await db.execute(stmt)
+    return
+
+  if await db.get(UserDailyUsage, (user_id, day)) is not None:
+    return
+  try:
+    async with db.begin_nested():
+      await db.execute(insert(UserDailyUsage).values(user_id=user_id, day=day))
+  except IntegrityError:
+    pass
+
+
+def _reserve_stmt(user_id: int, day: date, limit: int):
+  return (
+    update(UserDailyUsage)
+    .where(
+      UserDailyUsage.user_id == user_id,
+      UserDailyUsage.day == day,
+      UserDailyUsage.analyses_reserved - UserDailyUsage.analyses_failed < limit,
+    )
+    .values(analyses_reserved=UserDailyUsage.analyses_reserved + 1)
+  )
+
+
+def _increment(db: Session, user_id: int, day: date, **deltas: int) -> None:
+  _ensure_row(db, user_id, day)
+  db.execute(
+    update(UserDailyUsage)
+    .where(UserDailyUsage.user_id == user_id, UserDailyUsage.day == day)
+    .values({getattr(UserDailyUsage, name): getattr(UserDailyUsage, name) + delta for name, delta in deltas.items()})
+  )
+
+
+def get_daily_usage(db: Session, user_id: int, day: Optional[date] = None) -> Optional[UserDailyUsage]:
+  return db.get(UserDailyUsage, (user_id, day or usage_day()))
+
+
+def used_today(usage: Optional[UserDailyUsage]) -> int:
+  if usage is None:
+    return 0
+  return usage.analyses_reserved - usage.analyses_failed
+
+
+def reserve_analysis(db: Session, user_id: int, limit: int, day: Optional[date] = None) -> bool:
+  """
+  Atomically consume one analysis from today's quota.
+
+  Returns False (and changes nothing) when ``limit`` is already reached.
+  The caller commits together with the new Analysis row.
+  """
+  day = day or usage_day()
+  _ensure_row(db, user_id, day)
+  return db.execute(_reserve_stmt(user_id, day, limit)).rowcount == 1
+
+
+async def get_daily_usage_async(db: AsyncSession, user_id: int, day: Optional[date] = None) -> Optional[UserDailyUsage]:
+  return await db.get(UserDailyUsage, (user_id, day or usage_day()))
+
+
+async def reserve_analysis_async(db: AsyncSession, user_id: int, limit: int, day: Optional[date] = None) -> bool:
+  day = day or usage_day()
+  await _ensure_row_async(db, user_id, day)
+  result = await db.execute(_reserve_stmt(user_id, day, limit))
+  return result.rowcount == 1
+
+
+def record_analysis_result(db: Session, user_id: int, reserved_at: datetime, succeeded: bool) -> None:
+  """
+  Count a finished analysis against the day it was reserved on.
+
+  Failed analyses are refunded to the user's quota.
+  """
+  if succeeded:
+    _increment(db, user_id, usage_day(reserved_at), analyses_done=1)
+  else:
+    _increment(db, user_id, usage_day(reserved_at), analyses_failed=1)
+
+
+def record_invite(db: Session, inviter_user_id: int, invited_at: Optional[datetime] = None) -> None:
+  db.execute(
+    update(User).where(User.id == inviter_user_id).values(invite_count=User.invite_count + 1)
+  )
+  _increment(db, inviter_user_id, usage_day(invited_at), invites=1)
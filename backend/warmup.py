@@ -0,0 +1,172 @@
+"""
+Worker warm-up and the /healthz (liveness) and /readyz (readiness) checks.
+
+``warm_up_worker`` runs in the lifespan startup phase, before uvicorn lets
+the worker accept connections, so the first users do not pay for:
+
+- calendar: parsing the lunar tables and one sample chart computation;
+- database: opening warmup_db_connections pooled connections on the sync
+  and the async engine;
+- llm: importing the SDK, building the shared client and opening a
+  keep-alive connection to llm_api_base (backend/llm_client.py);
+- sms: creating the provider client (backend/sms_client.py).
+
+Every check is timed and its result kept in ``readiness``. Calendar and
+database are required; llm and sms are reported but do not hold back
+readiness, since analyses and logins degrade gracefully without them.
+/readyz re-checks the database on every probe.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict
+
+from sqlalchemy import text
+
+from .bazi_algo import calculate_bazi_from_basic_profile
+from .config import get_settings
+from .db import async_engine, engine
+from .llm_client import preconnect as preconnect_llm
+from .sms_client import warm_up as warm_up_sms_client
+
+settings = get_settings()
+
+
+_SAMPLE_PROFILE = {
+  "gender": "Male",
+  "birthDate": "1990-05-20",
+  "birthTime": "08:30",
+  "birthLocation": "北京",
+}
+
+
+@dataclass
+class CheckResult:
+  ok: bool
+  latency_ms: float
+  detail: str = ""
+  required: bool = True
+
+
+class Readiness:
+  """
+  Results of the last warm-up / probe, per dependency.
+  """
+
+  def __init__(self) -> None:
+    self.warmed = False
+    # Set by start_draining in the lifespan shutdown phase (see main.py).
+    self.draining = False
+    self.checks: Dict[str, CheckResult] = {}
+
+  @property
+  def ready(self) -> bool:
+    if self.draining:
+      return False
+    return self.warmed and all(check.ok for check in self.checks.values() if check.required)
+
+  def snapshot(self) -> Dict[str, Any]:
+    if self.draining:
+      state = "draining"
+    elif not self.warmed:
+      state = "starting"
+    else:
+      state = "ready" if self.ready else "unavailable"
+    return {"status": state, "checks": {name: asdict(check) for name, check in self.checks.items()}}
+
+
+readiness = Readiness()
+
+
+async def _timed(run: Callable[[], Awaitable[str]], required: bool, timeout: float) -> CheckResult:
+  started = time.perf_counter()
+  try:
+    detail = await asyncio.wait_for(run(), timeout)
+    ok = True
+  except asyncio.TimeoutError:
+    detail, ok = f"timed out after {timeout:g} s", False
+  except Exception as exc:  # noqa: BLE001
+    detail, ok = f"{type(exc).__name__}: {exc}", False
+  return CheckResult(ok, round((time.perf_counter() - started) * 1000, 1), detail or "", required)
+
+
+def _warm_calendar() -> str:
+  result = calculate_bazi_from_basic_profile(_SAMPLE_PROFILE)
+  return "sample chart " + "".join(pillar["gan"] + pillar["zhi"] for pillar in result["bazi"].values())
+
+
+def _open_sync_connections(count: int) -> None:
+  # Check out `count` connections at once so the pool really holds that many.
+  connections = [engine.connect() for _ in range(count)]
+  try:
+    for conn in connections:
+      conn.execute(text("SELECT 1"))
+  finally:
+    for conn in connections:
+      conn.close()
+
+
+async def _warm_database() -> str:
+  count = max(1, min(settings.warmup_db_connections, settings.db_pool_size))
+  await asyncio.to_thread(_open_sync_connections, count)
+  connections = [await async_engine.connect() for _ in range(count)]
+  try:
+    for conn in connections:
+      await conn.execute(text("SELECT 1"))
+  finally:
+    for conn in connections:
+      await conn.close()
+  return f"{count} connections per engine"
+
+
+async def _ping_database() -> str:
+  async with async_engine.connect() as conn:
+    await conn.execute(text("SELECT 1"))
+  return "SELECT 1"
+
+
+async def _warm_sms() -> str:
+  # On the event loop thread on purpose, see sms_client.warm_up.
+  if not warm_up_sms_client():
+    raise RuntimeError("SMS provider not available, codes stay in the local OTP store")
+  return settings.sms_provider
+
+
+async def warm_up_worker() -> Readiness:
+  """
+  Warm every dependency concurrently and record the results in ``readiness``.
+  """
+  timeout = settings.warmup_timeout_seconds
+  readiness.draining = False
+  checks = {
+    "calendar": _timed(lambda: asyncio.to_thread(_warm_calendar), True, timeout),
+    "database": _timed(_warm_database, True, timeout),
+    "llm": _timed(lambda: asyncio.to_thread(preconnect_llm, timeout), False, timeout),
+    "sms": _timed(_warm_sms, False, timeout),
+  }
+  results = await asyncio.gather(*checks.values())
+  for name, result in zip(checks, results):
+    readiness.checks[name] = result
+    state = "ok" if result.ok else ("FAILED" if result.required else "degraded")
+    print(f"[STARTUP] {name}: {state} in {result.latency_ms:.0f} ms ({result.detail})")
+  readiness.warmed = True
+  return readiness
+
+
+def start_draining() -> None:
+  """
+  Report the worker as not ready from now on (shutdown has begun).
+  """
+  readiness.draining = True
+
+
+async def probe_readiness() -> Dict[str, Any]:
+  """
+  Re-check the database and return the /readyz payload.
+  """
+  if readiness.warmed and not readiness.draining:
+    readiness.checks["database"] = await _timed(_ping_database, True, settings.warmup_timeout_seconds)
+  return readiness.snapshot()
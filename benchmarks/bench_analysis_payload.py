@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+对比 GET /analysis/{id} 在优化前后的序列化 CPU 耗时与传输字节数。
+
+用法（在项目根目录执行）：
+
+  python -m benchmarks.bench_analysis_payload
+
+- before: pydantic 校验 AnalysisDetail -> jsonable_encoder -> 标准库 JSONResponse，不压缩；
+- after:  直接拼装 dict -> FastJSONResponse（orjson），再按阈值做 gzip / brotli 压缩。
+"""
+
+from __future__ import annotations
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from backend import schemas
+from backend.encoding import FastJSONResponse, brotli, compress, orjson
+
+from .common import sample_analysis_input, sample_analysis_output, sample_created_at, time_per_call
+
+
+def main() -> None:
+  row = {
+    "id": 1,
+    "status": "done",
+    "input": sample_analysis_input(),
+    "output": sample_analysis_output(),
+    "error_message": None,
+    "created_at": sample_created_at(),
+    "completed_at": sample_created_at(),
+  }
+
+  def before() -> bytes:
+    detail = schemas.AnalysisDetail(**row)
+    return JSONResponse(jsonable_encoder(detail)).body
+
+  def after() -> bytes:
+    return FastJSONResponse(dict(row)).body
+
+  before_body = before()
+  after_body = after()
+
+  print(f"orjson available: {orjson is not None}, brotli available: {brotli is not None}")
+  print(f"before: {time_per_call(before):8.1f} us/response  {len(before_body):6d} bytes on the wire")
+  print(f"after:  {time_per_call(after):8.1f} us/response  {len(after_body):6d} bytes uncompressed")
+
+  gzip_body = compress(after_body, "gzip")
+  print(f"  + gzip:   {time_per_call(lambda: compress(after_body, 'gzip'), 500):8.1f} us  {len(gzip_body):6d} bytes")
+  if brotli is not None:
+    br_body = compress(after_body, "br")
+    print(f"  + brotli: {time_per_call(lambda: compress(after_body, 'br'), 500):8.1f} us  {len(br_body):6d} bytes")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+对比迁移 0004（LLM 输出拆到压缩副表）前后 analyses 表的行大小、表大小与热点查询延迟。
+
+用法（在项目根目录执行）：
+
+  python -m benchmarks.bench_analysis_storage --analyses 200000 --users 5000
+
+脚本会：
+  - 在临时目录新建数据库并迁移到 0003（output_json 仍在 analyses 行内）；
+  - 灌入指定数量、形如线上结果（100 个 chartPoints）的 analyses；
+  - 打印 analyses / analysis_outputs 的页占用、平均行大小与查询中位延迟；
+  - upgrade 到 head 并 VACUUM 后再测一遍。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from backend.migrate import upgrade_database
+
+from .common import sample_analysis_input, sample_analysis_output
+
+
+TODAY = datetime(2026, 10, 19)
+
+# (label, sql) — status polling, /analysis/latest, history-style scans and a
+# query that has to walk the whole table (no index on status alone).
+QUERIES: List[Tuple[str, str]] = [
+  ("status by id (poll)", "SELECT status FROM analyses WHERE id = :aid"),
+  (
+    "latest non-error (input only)",
+    "SELECT id, status, input_json, created_at FROM analyses WHERE user_id = :uid AND status != 'error' "
+    "ORDER BY created_at DESC LIMIT 1",
+  ),
+  ("full scan: pending count", "SELECT count(*) FROM analyses WHERE status = 'pending'"),
+]
+
+
+def _seed(engine: Engine, users: int, analyses: int, batch: int = 20_000) -> None:
+  rng = random.Random(42)
+  input_json = json.dumps(sample_analysis_input(), ensure_ascii=False)
+  output_json = json.dumps(sample_analysis_output(), ensure_ascii=False)
+
+  with engine.begin() as conn:
+    conn.exec_driver_sql(
+      "INSERT INTO users (id, phone, referral_code, created_at, last_login_at) VALUES (?, ?, ?, ?, ?)",
+      [(i, f"1{i:010d}", f"R{i:07d}", TODAY, TODAY) for i in range(1, users + 1)],
+    )
+
+  for start in range(1, analyses + 1, batch):
+    rows = []
+    for i in range(start, min(start + batch, analyses + 1)):
+      created = TODAY - timedelta(minutes=rng.randrange(0, 60 * 24 * 365))
+      status = rng.choices(("done", "error", "pending"), weights=(90, 8, 2))[0]
+      rows.append(
+        (i, rng.randrange(1, users + 1), input_json, output_json if status == "done" else None, status, created)
+      )
+    with engine.begin() as conn:
+      conn.exec_driver_sql(
+        "INSERT INTO analyses (id, user_id, input_json, output_json, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+      )
+
+  with engine.begin() as conn:
+    conn.exec_driver_sql("ANALYZE")
+
+
+def _report_sizes(engine: Engine, path: Path, analyses: int) -> None:
+  with engine.connect() as conn:
+    for table in ("analyses", "analysis_outputs"):
+      size = conn.execute(text("SELECT sum(pgsize) FROM dbstat WHERE name = :t"), {"t": table}).scalar()
+      if size is None:
+        continue
+      print(f"  {table:20s} {size / 1024 / 1024:9.1f} MiB   {size / analyses:8.0f} B/analysis")
+  print(f"  {'database file':20s} {path.stat().st_size / 1024 / 1024:9.1f} MiB")
+
+
+def _measure(engine: Engine, users: int, analyses: int, samples: int) -> None:
+  rng = random.Random(7)
+  with engine.connect() as conn:
+    for label, sql in QUERIES:
+      timings = []
+      for _ in range(samples):
+        params = {"uid": rng.randrange(1, users + 1), "aid": rng.randrange(1, analyses + 1)}
+        t0 = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        timings.append((time.perf_counter() - t0) * 1000)
+      print(f"  {label:30s} median {statistics.median(timings):9.3f} ms")
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--users", type=int, default=5_000)
+  parser.add_argument("--analyses", type=int, default=200_000)
+  parser.add_argument("--samples", type=int, default=20)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    path = Path(tmp) / "bench.db"
+    engine = create_engine(f"sqlite:///{path}")
+    upgrade_database("0003", engine=engine)
+
+    t0 = time.perf_counter()
+    _seed(engine, args.users, args.analyses)
+    print(f"Seeded {args.users} users / {args.analyses} analyses in {time.perf_counter() - t0:.1f}s")
+
+    print("\nBefore (revision 0003, output_json inline):")
+    _report_sizes(engine, path, args.analyses)
+    _measure(engine, args.users, args.analyses, args.samples)
+
+    t0 = time.perf_counter()
+    upgrade_database("head", engine=engine)
+    with engine.begin() as conn:
+      conn.exec_driver_sql("ANALYZE")
+    with engine.connect() as conn:
+      conn.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql("VACUUM")
+    print(f"\nMigrated to head (+VACUUM) in {time.perf_counter() - t0:.1f}s")
+
+    print("\nAfter (revision head, compressed analysis_outputs):")
+    _report_sizes(engine, path, args.analyses)
+    _measure(engine, args.users, args.analyses, args.samples)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+在大数据量 SQLite 库上对比热点查询在迁移 0002（组合索引）前后的查询计划与延迟。
+
+用法（在项目根目录执行）：
+
+  python -m benchmarks.bench_query_indexes --analyses 2000000 --users 20000
+
+脚本会：
+  - 在临时目录新建数据库并迁移到 0001（无组合索引）；
+  - 灌入指定数量的 users / invites / analyses；
+  - 打印每条热点查询的 EXPLAIN QUERY PLAN 与中位延迟；
+  - 执行 upgrade 到 head 后再测一遍。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from backend.migrate import upgrade_database
+
+
+TODAY = datetime(2026, 10, 19)
+
+# (label, sql, params) — the query shapes issued by /user/me, POST /analysis,
+# /analysis/latest and GET /analysis.
+QUERIES: List[Tuple[str, str, Dict[str, object]]] = [
+  (
+    "quota: done analyses today",
+    "SELECT count(*) FROM analyses WHERE user_id = :uid AND status = 'done' AND created_at >= :today",
+    {},
+  ),
+  (
+    "latest non-error analysis",
+    "SELECT id, status, created_at FROM analyses WHERE user_id = :uid AND status != 'error' "
+    "ORDER BY created_at DESC LIMIT 1",
+    {},
+  ),
+  (
+    "history page (keyset)",
+    "SELECT id, status, created_at FROM analyses WHERE user_id = :uid AND "
+    "(created_at < :cursor OR (created_at = :cursor AND id < 1000000000)) "
+    "ORDER BY created_at DESC, id DESC LIMIT 21",
+    {},
+  ),
+  ("invites: total", "SELECT count(*) FROM invites WHERE inviter_user_id = :uid", {}),
+  (
+    "invites: today",
+    "SELECT count(*) FROM invites WHERE inviter_user_id = :uid AND created_at >= :today",
+    {},
+  ),
+]
+
+
+def _seed(engine: Engine, users: int, analyses: int, invites: int, batch: int = 50_000) -> None:
+  rng = random.Random(42)
+  input_json = json.dumps({"gender": "Male", "birth_year": 1990, "year_pillar": "庚午"}, ensure_ascii=False)
+  output_json = json.dumps({"summaryScore": 7, "summary": "示例总评" * 20}, ensure_ascii=False)
+
+  with engine.begin() as conn:
+    conn.exec_driver_sql(
+      "INSERT INTO users (id, phone, referral_code, created_at, last_login_at) VALUES (?, ?, ?, ?, ?)",
+      [(i, f"1{i:010d}", f"R{i:07d}", TODAY, TODAY) for i in range(1, users + 1)],
+    )
+
+  def rows_analyses(start: int, stop: int):
+    for i in range(start, stop):
+      created = TODAY - timedelta(minutes=rng.randrange(0, 60 * 24 * 365))
+      status = rng.choices(("done", "error", "pending"), weights=(90, 8, 2))[0]
+      yield (
+        i,
+        rng.randrange(1, users + 1),
+        input_json,
+        output_json if status == "done" else None,
+        status,
+        created,
+        created if status != "pending" else None,
+      )
+
+  for start in range(1, analyses + 1, batch):
+    with engine.begin() as conn:
+      conn.exec_driver_sql(
+        "INSERT INTO analyses (id, user_id, input_json, output_json, status, created_at, completed_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        list(rows_analyses(start, min(start + batch, analyses + 1))),
+      )
+
+  for start in range(1, invites + 1, batch):
+    with engine.begin() as conn:
+      conn.exec_driver_sql(
+        "INSERT INTO invites (id, inviter_user_id, invited_user_id, created_at) VALUES (?, ?, ?, ?)",
+        [
+          (i, rng.randrange(1, users + 1), rng.randrange(1, users + 1), TODAY - timedelta(minutes=rng.randrange(0, 525_600)))
+          for i in range(start, min(start + batch, invites + 1))
+        ],
+      )
+
+  with engine.begin() as conn:
+    conn.exec_driver_sql("ANALYZE")
+
+
+def _measure(engine: Engine, users: int, samples: int) -> None:
+  rng = random.Random(7)
+  with engine.connect() as conn:
+    for label, sql, extra in QUERIES:
+      params = {"uid": 1, "today": TODAY - timedelta(days=1), "cursor": TODAY, **extra}
+      plan = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+      timings = []
+      for _ in range(samples):
+        params["uid"] = rng.randrange(1, users + 1)
+        t0 = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        timings.append((time.perf_counter() - t0) * 1000)
+      print(f"  {label:28s} median {statistics.median(timings):9.3f} ms   p95 {sorted(timings)[int(samples * 0.95) - 1]:9.3f} ms")
+      for row in plan:
+        print(f"      plan: {row[-1]}")
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--users", type=int, default=20_000)
+  parser.add_argument("--analyses", type=int, default=2_000_000)
+  parser.add_argument("--invites", type=int, default=500_000)
+  parser.add_argument("--samples", type=int, default=50)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+    upgrade_database("0001", engine=engine)
+
+    t0 = time.perf_counter()
+    _seed(engine, args.users, args.analyses, args.invites)
+    print(f"Seeded {args.users} users / {args.analyses} analyses / {args.invites} invites in {time.perf_counter() - t0:.1f}s")
+
+    print("\nBefore (revision 0001, no composite indexes):")
+    _measure(engine, args.users, args.samples)
+
+    t0 = time.perf_counter()
+    upgrade_database("head", engine=engine)
+    with engine.begin() as conn:
+      conn.exec_driver_sql("ANALYZE")
+    print(f"\nMigrated to head in {time.perf_counter() - t0:.1f}s")
+
+    print("\nAfter (revision head):")
+    _measure(engine, args.users, args.samples)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+在百万级 users 表上对比注册时分配 referral_code 的吞吐：
+
+  - legacy：每次调用重建初始邀请码集合，并对每个候选码执行一次 SELECT；
+  - current：referral_codes.insert_user_with_referral_code（唯一索引 + 冲突重试）。
+
+用法（在项目根目录执行）：
+
+  python -m benchmarks.bench_referral_codes --users 1000000 --signups 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import secrets
+import string
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.invite_codes import get_initial_invite_codes
+from backend.migrate import upgrade_database
+from backend.models import User
+from backend.referral_codes import insert_user_with_referral_code, random_referral_code
+
+
+NOW = datetime(2026, 10, 19)
+
+
+def _legacy_code(db: Session) -> str:
+  # Copy of the allocator this benchmark replaced.
+  alphabet = string.ascii_uppercase + string.digits
+  initial_codes = {code.upper() for code in get_initial_invite_codes()}
+  while True:
+    code = "".join(secrets.choice(alphabet) for _ in range(6))
+    existing = db.query(User).filter(User.referral_code == code).first()
+    if not existing and code.upper() not in initial_codes:
+      return code
+
+
+def _seed(engine, users: int, batch: int = 100_000) -> None:
+  seen = set()
+  for start in range(1, users + 1, batch):
+    rows = []
+    for i in range(start, min(start + batch, users + 1)):
+      code = random_referral_code()
+      while code in seen:
+        code = random_referral_code()
+      seen.add(code)
+      rows.append((i, f"1{i:010d}", code, NOW, NOW))
+    with engine.begin() as conn:
+      conn.exec_driver_sql(
+        "INSERT INTO users (id, phone, referral_code, created_at, last_login_at) VALUES (?, ?, ?, ?, ?)",
+        rows,
+      )
+
+
+def _signup_legacy(db: Session, phone: str) -> None:
+  user = User(phone=phone, referral_code=_legacy_code(db), created_at=NOW, last_login_at=NOW)
+  db.add(user)
+  db.flush()
+  db.commit()
+
+
+def _signup_current(db: Session, phone: str) -> None:
+  user = User(phone=phone, created_at=NOW, last_login_at=NOW)
+  insert_user_with_referral_code(db, user)
+  db.commit()
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--users", type=int, default=1_000_000)
+  parser.add_argument("--signups", type=int, default=5_000)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+    upgrade_database(engine=engine)
+    t0 = time.perf_counter()
+    _seed(engine, args.users)
+    print(f"Seeded {args.users} users in {time.perf_counter() - t0:.1f}s")
+
+    make_session = sessionmaker(bind=engine, autoflush=False)
+    for label, signup, offset in (("legacy", _signup_legacy, 2_000_000_000), ("current", _signup_current, 3_000_000_000)):
+      db = make_session()
+      try:
+        t0 = time.perf_counter()
+        for i in range(args.signups):
+          signup(db, f"{offset + i}")
+        elapsed = time.perf_counter() - t0
+      finally:
+        db.close()
+      print(f"  {label:8s} {args.signups / elapsed:9.0f} signups/s   {elapsed / args.signups * 1e6:8.1f} us/signup")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+测量 backend.serve 在不同 worker 数下读接口的吞吐（GET /analysis/latest 与 GET /analysis/{id}）。
+
+用法（在项目根目录执行）：
+
+  python -m benchmarks.bench_workers --workers 1 2 4 --seconds 10 --concurrency 64
+
+脚本在临时目录建库、写入一个用户和一条已完成的分析，然后对每个 worker 数启动
+`python -m backend.serve`，用 httpx 异步客户端压测并打印 req/s。
+注意：压测客户端与服务端在同一台机器上，核数不足时结果会被客户端挤占。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from .common import free_port, wait_until_ready
+
+
+def _seed(database_url: str) -> tuple:
+  from sqlalchemy import create_engine
+  from sqlalchemy.orm import Session
+
+  from backend.auth import create_access_token
+  from backend.migrate import upgrade_database
+  from backend.models import Analysis, User
+
+  from .common import sample_analysis_input, sample_analysis_output
+
+  engine = create_engine(database_url)
+  upgrade_database(engine=engine)
+  with Session(engine) as db:
+    user = User(phone="13000000000", referral_code="BENCH1", created_at=datetime.utcnow(), last_login_at=datetime.utcnow())
+    db.add(user)
+    db.flush()
+    analysis = Analysis(
+      user_id=user.id,
+      input_json=sample_analysis_input(),
+      output_json=sample_analysis_output(),
+      status="done",
+      created_at=datetime.utcnow(),
+      completed_at=datetime.utcnow(),
+    )
+    db.add(analysis)
+    db.commit()
+    ids = (user.id, analysis.id)
+  engine.dispose()
+  return create_access_token(ids[0]), ids[1]
+
+
+async def _load(base_url: str, token: str, analysis_id: int, seconds: float, concurrency: int) -> int:
+  headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": "gzip"}
+  paths = ["/analysis/latest", f"/analysis/{analysis_id}"]
+  done = 0
+  deadline = time.monotonic() + seconds
+
+  async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=httpx.Limits(max_connections=concurrency)) as client:
+
+    async def worker(i: int) -> None:
+      nonlocal done
+      while time.monotonic() < deadline:
+        resp = await client.get(paths[i % 2])
+        resp.raise_for_status()
+        done += 1
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+  return done
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+  parser.add_argument("--seconds", type=float, default=10)
+  parser.add_argument("--concurrency", type=int, default=64)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    env = dict(
+      os.environ,
+      APP_DATABASE_URL=f"sqlite:///{Path(tmp) / 'bench.db'}",
+      APP_JOBS_LOCK_FILE=str(Path(tmp) / "jobs.lock"),
+      APP_RATE_LIMIT_BACKEND="memory",
+      APP_OTP_STORE="memory",
+    )
+    os.environ.update(env)
+    token, analysis_id = _seed(env["APP_DATABASE_URL"])
+
+    print(f"CPU cores: {os.cpu_count()}")
+    for workers in args.workers:
+      port = free_port()
+      base_url = f"http://127.0.0.1:{port}"
+      proc = subprocess.Popen(
+        [sys.executable, "-m", "backend.serve", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+      )
+      try:
+        wait_until_ready(base_url)
+        asyncio.run(_load(base_url, token, analysis_id, 1, args.concurrency))  # warm-up
+        count = asyncio.run(_load(base_url, token, analysis_id, args.seconds, args.concurrency))
+        print(f"  workers={workers:2d}  {count / args.seconds:8.0f} req/s")
+      finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,121 @@
+"""
+Shared fixtures for the benchmark scripts.
+"""
+
+from __future__ import annotations
+
+import socket
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+
+_REASONS = [
+  "开局平稳，家庭呵护，学业渐入佳境",
+  "流年逢冲，宜守不宜攻，注意口舌是非",
+  "贵人相助，事业上升，财运稳步增长",
+  "压力增大，需调整节奏，防范健康隐患",
+  "转折之年，宜把握机遇，大胆迈出一步",
+]
+
+
+def sample_analysis_input() -> Dict[str, Any]:
+  return {
+    "name": "测试用户",
+    "gender": "Male",
+    "birth_year": 1990,
+    "year_pillar": "庚午",
+    "month_pillar": "辛巳",
+    "day_pillar": "丙子",
+    "hour_pillar": "壬辰",
+    "start_age": 8,
+    "first_da_yun": "壬午",
+    "birthDate": "1990-05-20",
+    "birthTime": "08:30",
+    "birthLocation": "北京",
+  }
+
+
+def sample_analysis_output() -> Dict[str, Any]:
+  """
+  A finished LLM document shaped like production output (100 chartPoints).
+  """
+  chart_points: List[Dict[str, Any]] = []
+  for age in range(1, 101):
+    score = 50 + ((age * 37) % 41) - 20
+    chart_points.append(
+      {
+        "age": age,
+        "year": 1989 + age,
+        "daYun": "童限" if age < 8 else "壬午",
+        "ganZhi": "庚午",
+        "open": score - 4,
+        "close": score + 3,
+        "high": score + 8,
+        "low": score - 7,
+        "score": score,
+        "reason": _REASONS[age % len(_REASONS)],
+      }
+    )
+
+  return {
+    "bazi": ["庚午", "辛巳", "丙子", "壬辰"],
+    "summary": "命局火旺，日主得令，格局清奇。早年平稳，中年发力，晚景安康。宜把握大运转折之机，稳中求进，厚积薄发，终成大器。" * 2,
+    "summaryScore": 8,
+    "personality": "性格外向热情，行动力强，做事果断，但偶有急躁，宜修身养性，学会倾听他人意见。",
+    "personalityScore": 8,
+    "industry": "适合科技、文化传媒、教育培训等行业，利于发挥创造力与表达能力，宜长期深耕。",
+    "industryScore": 7,
+    "fengShui": "宜居东南方向，办公位背靠实墙，多接触山水之气，家中保持采光通风。",
+    "fengShuiScore": 8,
+    "wealth": "财富呈阶梯式上升，中年后机会明显增多，宜稳健理财，注意分散风险。",
+    "wealthScore": 8,
+    "marriage": "感情务实稳定，宜多沟通表达内心需求，避免因忙碌忽略陪伴。",
+    "marriageScore": 7,
+    "health": "注意心血管与睡眠质量，保持规律作息与适量运动。",
+    "healthScore": 6,
+    "family": "与父母缘深，兄弟姐妹互助，关键年份需多承担家庭责任。",
+    "familyScore": 7,
+    "crypto": "偏火象星座风格，行动迅速，宜在大运交接年份保持耐心与节奏。",
+    "cryptoScore": 7,
+    "cryptoYear": "2032年 (壬子)",
+    "cryptoStyle": "冲劲火象",
+    "chartPoints": chart_points,
+  }
+
+
+def sample_created_at() -> datetime:
+  return datetime(2026, 1, 1, 12, 0, 0, 123456)
+
+
+def time_per_call(fn: Callable[[], Any], repeat: int = 2000) -> float:
+  """
+  Return the mean wall time of ``fn`` in microseconds.
+  """
+  fn()  # warm-up
+  t0 = time.perf_counter()
+  for _ in range(repeat):
+    fn()
+  return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def free_port() -> int:
+  with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url: str, timeout: float = 30) -> None:
+  """
+  Poll ``base_url``/docs until the server answers (used after spawning backend.serve).
+  """
+  import httpx
+
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    try:
+      httpx.get(f"{base_url}/docs", timeout=1)
+      return
+    except httpx.HTTPError:
+      time.sleep(0.2)
+  raise RuntimeError("server did not start")
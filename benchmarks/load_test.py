@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+端到端压测：在本机完整跑通用户旅程，不依赖真实大模型与短信服务。
+
+  send-code → 取验证码 → verify-code → /bazi/calc → POST /analysis
+  → GET /analysis/{id}?wait= 轮询直到完成 → GET /analysis/{id} 查看结果
+
+用法（在项目根目录执行）：
+
+  python -m benchmarks.load_test --rate 2 --duration 60                 # 与基线对比
+  python -m benchmarks.load_test --rate 2 --duration 60 --save-baseline # 记录新基线
+
+脚本会：
+- 启动 mock_llm（OpenAI 兼容，--llm-latency 秒返回一份线上同构的结果）；
+- 在临时目录建库，以 APP_SMS_PROVIDER=stub 启动 `python -m backend.serve`
+  （--workers 个进程；登录限流调到足够大，所有请求都来自 127.0.0.1）；
+- 按泊松到达（平均 --rate 个旅程/秒，开环）持续 --duration 秒发起旅程，
+  验证码通过 /debug/otp-store 读取；
+- 输出每个接口的请求数、吞吐、p50/p90/p95/p99/max 延迟与错误率，
+  以及整条旅程和“提交到出结果”的耗时。
+
+基线保存在 --baseline（默认 benchmarks/load_baseline.json）。对比时某接口
+p95 比基线慢超过 --tolerance（且至少 5 ms），或错误率高出 1 个百分点，
+即判为回归，脚本以退出码 1 结束。基线与机器相关，请在同一台机器上比较。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from .common import free_port, wait_until_ready
+from .mock_llm import MockLLMServer
+
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "load_baseline.json"
+PERCENTILES = (50, 90, 95, 99)
+# Absolute noise floor for p95 regressions, in seconds.
+MIN_REGRESSION_SECONDS = 0.005
+
+PROFILES = [
+  {"name": "张三", "gender": "Male", "birthDate": "1990-05-20", "birthTime": "08:30", "birthLocation": "北京"},
+  {"name": "李四", "gender": "Female", "birthDate": "1985-11-03", "birthTime": "22:10", "birthLocation": "上海"},
+  {"name": "王五", "gender": "Male", "birthDate": "2001-02-14", "birthTime": "13:45", "birthLocation": "广州"},
+]
+
+
+class Recorder:
+  def __init__(self) -> None:
+    self.latencies: Dict[str, List[float]] = defaultdict(list)
+    self.errors: Dict[str, int] = defaultdict(int)
+
+  def add(self, name: str, seconds: float, ok: bool = True) -> None:
+    self.latencies[name].append(seconds)
+    if not ok:
+      self.errors[name] += 1
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+  if not sorted_values:
+    return 0.0
+  index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+  return sorted_values[index]
+
+
+def summarize(recorder: Recorder, wall_seconds: float) -> Dict[str, Dict[str, float]]:
+  summary = {}
+  for name, values in recorder.latencies.items():
+    ordered = sorted(values)
+    row = {
+      "count": len(ordered),
+      "rps": len(ordered) / wall_seconds if wall_seconds else 0.0,
+      "error_rate": recorder.errors[name] / len(ordered),
+      "max": ordered[-1],
+    }
+    for pct in PERCENTILES:
+      row[f"p{pct}"] = _percentile(ordered, pct)
+    summary[name] = row
+  return summary
+
+
+def print_report(summary: Dict[str, Dict[str, float]]) -> None:
+  header = f"{'endpoint':<30}{'count':>7}{'req/s':>8}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTILES) + f"{'max':>9}{'errors':>8}"
+  print(header)
+  print("-" * len(header))
+  for name in sorted(summary):
+    row = summary[name]
+    cells = "".join(f"{row[f'p{p}'] * 1000:>7.0f}ms" for p in PERCENTILES)
+    print(f"{name:<30}{row['count']:>7}{row['rps']:>8.2f}{cells}{row['max'] * 1000:>7.0f}ms{row['error_rate'] * 100:>7.1f}%")
+
+
+def compare_with_baseline(summary: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+  regressions = []
+  for name, row in sorted(summary.items()):
+    base = baseline.get(name)
+    if base is None:
+      continue
+    if row["p95"] > base["p95"] * (1 + tolerance) and row["p95"] - base["p95"] > MIN_REGRESSION_SECONDS:
+      regressions.append(f"{name}: p95 {base['p95'] * 1000:.0f} ms -> {row['p95'] * 1000:.0f} ms")
+    if row["error_rate"] > base["error_rate"] + 0.01:
+      regressions.append(f"{name}: error rate {base['error_rate'] * 100:.1f}% -> {row['error_rate'] * 100:.1f}%")
+  return regressions
+
+
+class Journey:
+  def __init__(self, client: httpx.AsyncClient, recorder: Recorder, invite_code: str, poll_wait: int, timeout: float) -> None:
+    self.client = client
+    self.recorder = recorder
+    self.invite_code = invite_code
+    self.poll_wait = poll_wait
+    self.timeout = timeout
+
+  async def _call(self, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+      resp = await self.client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+      self.recorder.add(name, time.perf_counter() - started, ok=False)
+      return None
+    ok = resp.status_code < 400
+    self.recorder.add(name, time.perf_counter() - started, ok=ok)
+    return resp if ok else None
+
+  async def run(self, phone: str) -> None:
+    started = time.perf_counter()
+    ok = await self._run(phone)
+    self.recorder.add("journey", time.perf_counter() - started, ok=ok)
+
+  async def _run(self, phone: str) -> bool:
+    if not await self._call("POST /auth/send-code", "POST", "/auth/send-code", json={"phone": phone}):
+      return False
+    store = await self._call("GET /debug/otp-store", "GET", "/debug/otp-store")
+    code = store.json().get(phone, {}).get("code") if store else None
+    if not code:
+      return False
+    resp = await self._call(
+      "POST /auth/verify-code", "POST", "/auth/verify-code", json={"phone": phone, "code": code, "inviterCode": self.invite_code}
+    )
+    if not resp:
+      return False
+    auth = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    profile = random.choice(PROFILES)
+    resp = await self._call("POST /bazi/calc", "POST", "/bazi/calc", json=profile, headers=auth)
+    if not resp:
+      return False
+    bazi = resp.json()
+    chart = bazi["bazi"]
+    analysis_input = {
+      "name": profile["name"],
+      "gender": profile["gender"],
+      "birth_year": int(profile["birthDate"][:4]),
+      "year_pillar": chart["year"]["gan"] + chart["year"]["zhi"],
+      "month_pillar": chart["month"]["gan"] + chart["month"]["zhi"],
+      "day_pillar": chart["day"]["gan"] + chart["day"]["zhi"],
+      "hour_pillar": chart["hour"]["gan"] + chart["hour"]["zhi"],
+      "start_age": bazi["startAge"],
+      "first_da_yun": bazi["daYun"][0] if bazi["daYun"] else "",
+    }
+    resp = await self._call("POST /analysis", "POST", "/analysis", json=analysis_input, headers=auth)
+    if not resp:
+      return False
+    analysis_id = resp.json()["id"]
+
+    submitted = time.perf_counter()
+    status = "pending"
+    while status == "pending" and time.perf_counter() - submitted < self.timeout:
+      resp = await self._call(
+        "GET /analysis/{id}?wait", "GET", f"/analysis/{analysis_id}", params={"wait": self.poll_wait}, headers=auth
+      )
+      if not resp:
+        return False
+      status = resp.json()["status"]
+    self.recorder.add("analysis result", time.perf_counter() - submitted, ok=status == "done")
+    if status != "done":
+      return False
+
+    return bool(await self._call("GET /analysis/{id}", "GET", f"/analysis/{analysis_id}", headers=auth))
+
+
+async def drive(base_url: str, rate: float, duration: float, invite_code: str, poll_wait: int, timeout: float) -> tuple:
+  recorder = Recorder()
+  limits = httpx.Limits(max_connections=200, max_keepalive_connections=50)
+  async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+    journey = Journey(client, recorder, invite_code, poll_wait, timeout)
+    tasks = []
+    started = time.perf_counter()
+    seq = 0
+    while time.perf_counter() - started < duration:
+      seq += 1
+      phone = f"19{os.getpid() % 1000:03d}{seq:06d}"
+      tasks.append(asyncio.create_task(journey.run(phone)))
+      await asyncio.sleep(random.expovariate(rate))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+  return recorder, wall
+
+
+def _server_env(tmp: str, llm_base_url: str, sms_latency_ms: int) -> Dict[str, str]:
+  return dict(
+    os.environ,
+    APP_DATABASE_URL=f"sqlite:///{Path(tmp) / 'load.db'}",
+    APP_JOBS_LOCK_FILE=str(Path(tmp) / "jobs.lock"),
+    APP_LLM_API_BASE=llm_base_url,
+    APP_LLM_API_KEY="loadtest",
+    APP_LLM_MODEL="mock-model",
+    APP_SMS_PROVIDER="stub",
+    APP_SMS_STUB_LATENCY_MS=str(sms_latency_ms),
+    APP_RATE_LIMIT_SEND_CODE_PHONE="1000000/1",
+    APP_RATE_LIMIT_SEND_CODE_IP="1000000/1",
+    APP_RATE_LIMIT_VERIFY_CODE_PHONE="1000000/1",
+    APP_RATE_LIMIT_VERIFY_CODE_IP="1000000/1",
+  )
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--rate", type=float, default=2.0, help="journeys started per second (Poisson arrivals)")
+  parser.add_argument("--duration", type=float, default=60)
+  parser.add_argument("--workers", type=int, default=1, help="backend.serve worker processes")
+  parser.add_argument("--llm-latency", type=float, default=2.0)
+  parser.add_argument("--sms-latency-ms", type=int, default=50)
+  parser.add_argument("--poll-wait", type=int, default=10, help="?wait= seconds per status poll")
+  parser.add_argument("--timeout", type=float, default=120, help="per-request and per-analysis timeout")
+  parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+  parser.add_argument("--save-baseline", action="store_true")
+  parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95 slowdown")
+  args = parser.parse_args()
+
+  from backend.invite_codes import get_initial_invite_codes
+
+  invite_code = sorted(get_initial_invite_codes())[0]
+  llm = MockLLMServer(latency=args.llm_latency, jitter=args.llm_latency / 4)
+  llm.start_in_thread()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    log_path = Path(tmp) / "server.log"
+    with open(log_path, "wb") as log:
+      proc = subprocess.Popen(
+        [sys.executable, "-m", "backend.serve", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers)],
+        env=_server_env(tmp, llm.base_url, args.sms_latency_ms),
+        stdout=log,
+        stderr=subprocess.STDOUT,
+      )
+      try:
+        wait_until_ready(base_url)
+        print(f"rate={args.rate}/s duration={args.duration}s workers={args.workers} llm_latency={args.llm_latency}s cpu={os.cpu_count()}")
+        recorder, wall = asyncio.run(drive(base_url, args.rate, args.duration, invite_code, args.poll_wait, args.timeout))
+      finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        llm.shutdown()
+
+  summary = summarize(recorder, wall)
+  print_report(summary)
+  print(f"LLM completions served: {llm.requests}")
+
+  if args.save_baseline:
+    args.baseline.write_text(json.dumps(summary, indent=2, sort_keys=True))
+    print(f"Baseline saved to {args.baseline}")
+    return
+  if not args.baseline.exists():
+    print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+    return
+  regressions = compare_with_baseline(summary, json.loads(args.baseline.read_text()), args.tolerance)
+  if regressions:
+    print("Regressions against baseline:")
+    for line in regressions:
+      print(f"  {line}")
+    sys.exit(1)
+  print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+  main()
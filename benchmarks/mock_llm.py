@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+本地 OpenAI 兼容的 chat completions 模拟服务，供压测使用（不访问真实大模型）。
+
+  python -m benchmarks.mock_llm --port 18080 --latency 2.0 --jitter 0.5
+
+任意以 /chat/completions 结尾的 POST 都会在 latency ± jitter 秒后返回
+common.sample_analysis_output() 的 JSON（与线上输出同构），并附带 usage。
+后端指向它：APP_LLM_API_BASE=http://127.0.0.1:18080/v1 APP_LLM_API_KEY=任意非 demo 值。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .common import sample_analysis_output
+
+
+class _Handler(BaseHTTPRequestHandler):
+  server: "MockLLMServer"
+  protocol_version = "HTTP/1.1"
+
+  def do_POST(self) -> None:  # noqa: N802
+    body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+    if not self.path.rstrip("/").endswith("/chat/completions"):
+      self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+      return
+    request = json.loads(body or b"{}")
+    time.sleep(max(0.0, self.server.latency + random.uniform(-self.server.jitter, self.server.jitter)))
+    self.server.count_request()
+    self._reply(
+      200,
+      {
+        "id": f"chatcmpl-mock-{self.server.requests}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [
+          {
+            "index": 0,
+            "message": {"role": "assistant", "content": self.server.content},
+            "finish_reason": "stop",
+          }
+        ],
+        "usage": {"prompt_tokens": 1200, "completion_tokens": 6000, "total_tokens": 7200},
+      },
+    )
+
+  def _reply(self, status: int, payload: dict) -> None:
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def log_message(self, format: str, *args) -> None:  # noqa: A002
+    pass
+
+
+class MockLLMServer(ThreadingHTTPServer):
+  daemon_threads = True
+
+  def __init__(self, port: int = 0, latency: float = 2.0, jitter: float = 0.5) -> None:
+    super().__init__(("127.0.0.1", port), _Handler)
+    self.latency = latency
+    self.jitter = min(jitter, latency)
+    self.content = json.dumps(sample_analysis_output(), ensure_ascii=False)
+    self.requests = 0
+    self._lock = threading.Lock()
+
+  @property
+  def base_url(self) -> str:
+    return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+  def count_request(self) -> None:
+    with self._lock:
+      self.requests += 1
+
+  def start_in_thread(self) -> threading.Thread:
+    thread = threading.Thread(target=self.serve_forever, name="mock-llm", daemon=True)
+    thread.start()
+    return thread
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--port", type=int, default=18080)
+  parser.add_argument("--latency", type=float, default=2.0, help="seconds per completion")
+  parser.add_argument("--jitter", type=float, default=0.5)
+  args = parser.parse_args()
+
+  server = MockLLMServer(args.port, args.latency, args.jitter)
+  print(f"Mock LLM listening on {server.base_url}")
+  server.serve_forever()
+
+
+if __name__ == "__main__":
+  main()
@@ -88,6 +88,32 @@ export async function createAnalysis(token: string, input: AnalysisInput): Promi
   return resp.json();
 }
 
+export interface AnalysisFromProfileResponse {
+  id: number;
+  status: string;
+  bazi: BaziResult;
+}
+
+// 一次请求完成排盘 + 创建分析任务，四柱与大运由后端推导。
+export async function createAnalysisFromProfile(
+  token: string,
+  input: BasicProfileInput
+): Promise<AnalysisFromProfileResponse> {
+  const resp = await fetch(`${API_BASE}/analysis/from-profile`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Authorization: `Bearer ${token}`
+    },
+    body: JSON.stringify(input)
+  });
+  if (!resp.ok) {
+    const text = await resp.text();
+    throw new Error(text || "创建分析任务失败");
+  }
+  return resp.json();
+}
+
 export async function calculateBazi(token: string, input: BasicProfileInput): Promise<BaziResult> {
   const resp = await fetch(`${API_BASE}/bazi/calc`, {
     method: "POST",
@@ -114,8 +140,10 @@ export interface AnalysisDetail {
   completed_at?: string | null;
 }
 
-export async function getAnalysis(token: string, id: number): Promise<AnalysisDetail> {
-  const resp = await fetch(`${API_BASE}/analysis/${id}`, {
+// waitSeconds > 0 时使用长轮询：任务仍为 pending 时，后端会挂起请求直到状态变化或超时。
+export async function getAnalysis(token: string, id: number, waitSeconds = 0): Promise<AnalysisDetail> {
+  const query = waitSeconds > 0 ? `?wait=${waitSeconds}` : "";
+  const resp = await fetch(`${API_BASE}/analysis/${id}${query}`, {
     headers: {
       Authorization: `Bearer ${token}`
     }
@@ -1,8 +1,8 @@
 import React, { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
-import { calculateBazi, createAnalysis, getMe } from "../api";
+import { createAnalysisFromProfile, getMe } from "../api";
 import { useAuthToken } from "../hooks";
-import type { AnalysisInput, BasicProfileInput, BaziResult } from "../types";
+import type { BasicProfileInput, BaziResult } from "../types";
 import logo from "../assets/logo.svg";
 import copyIcon from "../assets/copy-alt.svg";
 import menuIcon from "../assets/menu.svg";
@@ -70,32 +70,9 @@ export const ProfilePage: React.FC = () => {
     setError(null);
     try {
       setSubmitting(true);
-      // 第一步：调用后端 BaZi 预计算接口，将出生日期/时间/地点转换为四柱与大运信息
-      const baziResult: BaziResult = await calculateBazi(token, form);
-
-      const birthYear = (() => {
-        if (!form.birthDate) return new Date().getFullYear();
-        const yearStr = form.birthDate.split("-")[0];
-        const n = Number(yearStr);
-        return Number.isFinite(n) && n > 0 ? n : new Date().getFullYear();
-      })();
-
-      const analysisPayload: AnalysisInput = {
-        name: form.name,
-        gender: form.gender,
-        birth_year: birthYear,
-        year_pillar: `${baziResult.bazi.year.gan}${baziResult.bazi.year.zhi}`,
-        month_pillar: `${baziResult.bazi.month.gan}${baziResult.bazi.month.zhi}`,
-        day_pillar: `${baziResult.bazi.day.gan}${baziResult.bazi.day.zhi}`,
-        hour_pillar: `${baziResult.bazi.hour.gan}${baziResult.bazi.hour.zhi}`,
-        start_age: baziResult.startAge,
-        first_da_yun: baziResult.daYun && baziResult.daYun.length > 0 ? baziResult.daYun[0] : "",
-        birthDate: form.birthDate,
-        birthTime: form.birthTime,
-        birthLocation: form.birthLocation
-      };
-
-      const created = await createAnalysis(token, analysisPayload);
+      // 后端一次性完成排盘（四柱、起运、大运）与分析任务创建，排盘结果随响应返回
+      const created = await createAnalysisFromProfile(token, form);
+      const baziResult: BaziResult = created.bazi;
 
       if (typeof window !== "undefined") {
         try {
@@ -38,9 +38,12 @@ export const ResultPage: React.FC = () => {
     }
 
     let timer: number | undefined;
-    const fetchAnalysis = async () => {
+    let cancelled = false;
+    // 首次请求立即返回当前状态；pending 时改用长轮询，由后端在状态变化时才响应。
+    const fetchAnalysis = async (waitSeconds = 0) => {
       try {
-        const detail = await getAnalysis(token, analysisId);
+        const detail = await getAnalysis(token, analysisId, waitSeconds);
+        if (cancelled) return;
         setAnalysis(detail);
         if (detail.status === "done" && detail.output) {
           const raw = detail.output as any;
@@ -72,9 +75,10 @@ export const ResultPage: React.FC = () => {
           };
           setLifeResult(result);
         } else if (detail.status === "pending") {
-          timer = window.setTimeout(fetchAnalysis, 3000);
+          timer = window.setTimeout(() => fetchAnalysis(30), 0);
         }
       } catch (e: any) {
+        if (cancelled) return;
         setError(e.message || "获取分析任务失败");
       }
     };
@@ -99,6 +103,7 @@ export const ResultPage: React.FC = () => {
     fetchMe();
 
     return () => {
+      cancelled = true;
       if (timer) {
         window.clearTimeout(timer);
       }